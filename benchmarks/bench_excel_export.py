@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк экспорта в Excel: обычный режим openpyxl против потокового write-only
+Запуск: python benchmarks/bench_excel_export.py [1000 10000 100000]
+"""
+
+import sys
+import time
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.excel_exporter import ExcelExporter
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+def make_rows(count: int):
+    return [
+        {
+            'seller_id': str(100000 + i),
+            'seller_name': f"Продавец {i}",
+            'company_name': f'ООО "Компания {i}"',
+            'inn': str(7700000000 + i),
+            'orders_count': f"{i % 900} K",
+            'reviews_count': f"{i % 5000}",
+            'average_rating': "4,8",
+            'working_time': "2021",
+            'seller_link': f"https://ozon.ru/seller/{100000 + i}",
+        }
+        for i in range(count)
+    ]
+
+
+def run_once(rows, streaming: bool, output_dir: Path, trace_memory: bool = False):
+    exporter = ExcelExporter(output_dir, f"bench_{'stream' if streaming else 'normal'}_{len(rows)}", streaming=streaming)
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    ok = exporter.export_results({'sellers': rows})
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    if not ok:
+        raise RuntimeError("Экспорт завершился с ошибкой")
+    return elapsed, peak, exporter.filepath.stat().st_size
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    print(f"{'строк':>8} | {'режим':>8} | {'время, с':>9} | {'пик памяти, МБ':>15} | {'файл, МБ':>9}")
+    print("-" * 62)
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp)
+        for size in sizes:
+            rows = make_rows(size)
+            for streaming in (False, True):
+                # Время и память меряются раздельно: tracemalloc заметно замедляет запись
+                elapsed, _, file_size = run_once(rows, streaming, output_dir)
+                _, peak, _ = run_once(rows, streaming, output_dir, trace_memory=True)
+                mode = "stream" if streaming else "normal"
+                print(f"{size:>8} | {mode:>8} | {elapsed:>9.2f} | {peak / 1024 / 1024:>15.1f} | {file_size / 1024 / 1024:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
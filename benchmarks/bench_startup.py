@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк холодного старта точек входа: время до готовности app.py, bot.py и main.py
+Запуск: python benchmarks/bench_startup.py [app bot main] [--runs 5] [--importtime]
+
+Каждый замер — новый процесс Python: импорт модуля точки входа (без вызова main()),
+Settings() и AppManager(), для main.py еще и MainWindow() без запуска окна.
+"Готов" — время от старта процесса до конца этих шагов; отдельно показан импорт.
+С --importtime печатаются самые медленные импорты каждой точки входа (python -X importtime).
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Что считается готовностью для каждой точки входа
+READY_STEPS = {
+    'app': "",
+    'bot': "",
+    'main': "from src.gui.main_window import MainWindow; MainWindow(manager)",
+}
+HEAVY_MODULES = ['selenium', 'selenium_stealth', 'openpyxl', 'aiogram', 'aiohttp', 'tkinter']
+TOP_IMPORTS = 15
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {entry}
+imported = time.perf_counter()
+from src.config.settings import Settings
+from src.core.app_manager import AppManager
+manager = AppManager(Settings())
+{extra}
+ready = time.perf_counter()
+print(json.dumps({{
+    'import': imported - started,
+    'ready': ready - started,
+    'heavy': [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def run_probe(entry: str):
+    code = PROBE.format(entry=entry, extra=READY_STEPS[entry], heavy=HEAVY_MODULES)
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    wall = time.perf_counter() - started
+    result = json.loads(output.strip().splitlines()[-1])
+    result['wall'] = wall
+    return result
+
+
+def print_slowest_imports(entry: str):
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {entry}"], cwd=ROOT, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        rows.append((int(cumulative), name.strip()))
+    print(f"\n{entry}.py — самые медленные импорты (накопительно, мс):")
+    for cumulative, name in sorted(rows, reverse=True)[:TOP_IMPORTS]:
+        print(f"  {cumulative / 1000:>8.1f}  {name}")
+
+
+def main():
+    args = sys.argv[1:]
+    runs = 5
+    if "--runs" in args:
+        index = args.index("--runs")
+        runs = int(args[index + 1])
+        del args[index:index + 2]
+    show_imports = "--importtime" in args
+    entries = [arg for arg in args if arg != "--importtime"] or list(READY_STEPS)
+
+    print(f"{'точка входа':>12} | {'импорт, с':>9} | {'готов, с':>9} | {'процесс, с':>10} | тяжелые модули")
+    print("-" * 80)
+    for entry in entries:
+        # Первый запуск прогревает кэш .pyc и файловой системы и в медиану не входит
+        run_probe(entry)
+        results = [run_probe(entry) for _ in range(runs)]
+        imported = statistics.median(r['import'] for r in results)
+        ready = statistics.median(r['ready'] for r in results)
+        wall = statistics.median(r['wall'] for r in results)
+        heavy = ", ".join(results[-1]['heavy']) or "—"
+        print(f"{entry + '.py':>12} | {imported:>9.3f} | {ready:>9.3f} | {wall:>10.3f} | {heavy}")
+
+    if show_imports:
+        for entry in entries:
+            print_slowest_imports(entry)
+
+
+if __name__ == "__main__":
+    main()
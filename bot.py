@@ -11,7 +11,8 @@ from src.config.settings import Settings
 from src.core.app_manager import AppManager
 from src.telegram.bot_manager import TelegramBotManager
 from src.utils.logger import setup_logging
-from src.utils.config_loader import load_telegram_config_multi
+from src.utils.config_loader import load_metrics_config, load_telegram_config_multi, load_webhook_config
+from src.utils.metrics import start_metrics_server
 
 def main():
     setup_logging()
@@ -30,8 +31,9 @@ def main():
         
         settings = Settings()
         app_manager = AppManager(settings)
+        start_metrics_server(load_metrics_config())
         
-        bot_manager = TelegramBotManager(bot_token, chat_ids, app_manager)
+        bot_manager = TelegramBotManager(bot_token, chat_ids, app_manager, webhook=load_webhook_config())
         
         print("🤖 Запуск Telegram бота...")
         
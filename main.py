@@ -16,6 +16,8 @@ from src.config.settings import Settings
 from src.core.app_manager import AppManager
 from src.gui.main_window import MainWindow
 from src.utils.logger import setup_logging
+from src.utils.config_loader import load_metrics_config
+from src.utils.metrics import start_metrics_server
 
 def main():
     """Запуск GUI для управления Telegram ботом"""
@@ -30,6 +32,7 @@ def main():
         
         # Создание менеджера приложения
         app_manager = AppManager(settings)
+        start_metrics_server(load_metrics_config())
         
         # Создание и запуск GUI
         gui = MainWindow(app_manager)
@@ -5,6 +5,7 @@ class Settings:
     BASE_DIR = Path(__file__).parent.parent.parent
     OUTPUT_DIR = BASE_DIR / "output"
     LOGS_DIR = BASE_DIR / "logs"
+    TRACES_DIR = LOGS_DIR / "traces"
 
     MAX_PRODUCTS = 50
     MAX_WORKERS = 10
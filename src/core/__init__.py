@@ -1,3 +1,5 @@
-from .app_manager import AppManager
+from ..utils.lazy_import import lazy_exports
+
+__getattr__ = lazy_exports(__name__, {'AppManager': '.app_manager'})
 
 __all__ = ['AppManager']
\ No newline at end of file
@@ -1,19 +1,41 @@
+import html
 import logging
-import re
 import threading
-import asyncio
 import time
-from typing import Dict, Any, List, Optional
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
 from ..config.settings import Settings
-from ..parsers.link_parser import OzonLinkParser
-from ..parsers.product_parser import OzonProductParser
-from ..parsers.seller_parser import OzonSellerParser
-from ..utils.excel_exporter import ExcelExporter
-from ..telegram.bot_manager import TelegramBotManager
-from ..utils.resource_manager import resource_manager
+from ..utils.export import ExportWriter, DEFAULT_EXPORT_FORMATS, create_sink
+from ..utils.normalize import seller_metric, sort_sellers, top_sellers
+from ..utils import tracing
+from ..utils.profiling import RunProfiler
+from ..utils.metrics import RUNS
+from ..telegram.delivery import get_delivery_service, get_default_recipients
+from ..telegram.progress import ProgressReporter
+from ..utils.resource_manager import get_resource_manager
+from ..utils.config_loader import load_flag, load_webhook_config
+from ..utils.warehouse import get_warehouse
+from ..utils.delta import SellerDelta
+from ..utils.watch_store import Watch
+from .status import StatusBoard
+from .watch_scheduler import WatchScheduler
+
+# Парсеры (selenium) и бот (aiogram) импортируются при первом использовании, чтобы не замедлять старт
+if TYPE_CHECKING:
+    from ..telegram.bot_manager import TelegramBotManager
 
 logger = logging.getLogger(__name__)
 
+
+class _StopSignal:
+    """Объединяет несколько событий остановки для воркеров: сработало любое — пора останавливаться"""
+    
+    def __init__(self, *events: threading.Event):
+        self.events = events
+    
+    def is_set(self) -> bool:
+        return any(event.is_set() for event in self.events)
+
+
 class AppManager:
     
     def __init__(self, settings: Settings):
@@ -24,7 +46,17 @@ class AppManager:
         self.stop_event = threading.Event()
         self.last_results = {}  # Глобальные результаты для совместимости
         self.user_results = {}  # Результаты по пользователям: {user_id: results}
-        self.telegram_bot: Optional[TelegramBotManager] = None
+        self.telegram_bot: Optional['TelegramBotManager'] = None
+        self.watch_scheduler = WatchScheduler(self)
+        # Компактный статус для GUI и бота: обновляется при изменениях состояния, а не при опросе
+        self.status = StatusBoard(
+            is_running=False,
+            active_users_count=0,
+            active_users=[],
+            telegram_bot_active=False,
+        )
+        self._on_resources_changed(get_resource_manager().state())
+        get_resource_manager().add_listener(self._on_resources_changed)
     
     def start_parsing(
         self,
@@ -33,6 +65,12 @@ class AppManager:
         user_id: str = None,
         min_seller_orders: int = 0,
         max_seller_orders: int = 0,
+        export_formats: list = None,
+        export_compression: str = 'none',
+        target_sellers: int = 0,
+        delta_mode: bool = False,
+        watch_id: int = None,
+        max_products: int = 0,
     ) -> bool:
         with self.parsing_lock:
             # Проверяем, не парсит ли уже этот пользователь
@@ -48,12 +86,21 @@ class AppManager:
             if not self.is_running:
                 self.stop_event.clear()
                 self.is_running = True
+            self._publish_parsing_state()
         
         try:
             # Запускаем парсинг в отдельном потоке
             parsing_thread = threading.Thread(
                 target=self._parsing_task_wrapper,
                 args=(category_url, selected_fields, user_id, int(min_seller_orders or 0), int(max_seller_orders or 0)),
+                kwargs={
+                    'export_formats': export_formats,
+                    'export_compression': export_compression,
+                    'target_sellers': int(target_sellers or 0),
+                    'delta_mode': bool(delta_mode),
+                    'watch_id': watch_id,
+                    'max_products': int(max_products or 0),
+                },
                 daemon=True
             )
             parsing_thread.start()
@@ -67,6 +114,7 @@ class AppManager:
                 # Если это был последний пользователь, сбрасываем глобальный флаг
                 if not self.active_parsing_users:
                     self.is_running = False
+                self._publish_parsing_state()
             return False
     
     def _parsing_task_wrapper(
@@ -76,13 +124,34 @@ class AppManager:
         user_id: str = None,
         min_seller_orders: int = 0,
         max_seller_orders: int = 0,
+        export_formats: list = None,
+        export_compression: str = 'none',
+        target_sellers: int = 0,
+        delta_mode: bool = False,
+        watch_id: int = None,
+        max_products: int = 0,
     ):
         """Wrapper для парсинга с правильной очисткой ресурсов"""
+        # Все спаны запуска (включая потоки воркеров) собираются в один RunTrace
+        trace = tracing.RunTrace(f"{user_id}:{category_url}")
+        # PROFILE_RUN=true: CPU-профиль всех потоков запуска и tracemalloc на границах этапов
+        trace.profiler = RunProfiler.acquire(trace.label) if load_flag('PROFILE_RUN') else None
+        parsing_task = trace.profiler.wrap(self._parsing_task) if trace.profiler else self._parsing_task
         try:
-            self._parsing_task(category_url, selected_fields, user_id, int(min_seller_orders or 0), int(max_seller_orders or 0))
+            with tracing.bind_run(trace):
+                parsing_task(
+                    category_url, selected_fields, user_id, int(min_seller_orders or 0), int(max_seller_orders or 0),
+                    export_formats=export_formats, export_compression=export_compression,
+                    target_sellers=int(target_sellers or 0), delta_mode=bool(delta_mode),
+                    watch_id=watch_id, max_products=int(max_products or 0),
+                )
         except Exception as e:
             logger.error(f"Ошибка в парсинге для пользователя {user_id}: {e}")
         finally:
+            self._write_run_trace(trace, user_id)
+            if trace.profiler is not None:
+                stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(trace.started_wall))
+                trace.profiler.finish(self.settings.LOGS_DIR / "profiles" / f"{user_id or 'local'}_{stamp}")
             # Убираем пользователя из активных
             with self.parsing_lock:
                 if user_id and user_id in self.active_parsing_users:
@@ -93,6 +162,7 @@ class AppManager:
                 if not self.active_parsing_users:
                     self.is_running = False
                     logger.info("Все пользователи завершили парсинг")
+                self._publish_parsing_state()
     
     def stop_parsing(self, user_id: str = None):
         """Останавливает парсинг для конкретного пользователя или всех"""
@@ -111,6 +181,21 @@ class AppManager:
             if not self.active_parsing_users:
                 self.stop_event.set()
                 self.is_running = False
+            self._publish_parsing_state()
+    
+    def _publish_parsing_state(self):
+        """Переносит флаги парсинга в статус; вызывается под parsing_lock"""
+        self.status.update(
+            is_running=self.is_running,
+            active_users_count=len(self.active_parsing_users),
+            active_users=sorted(self.active_parsing_users),
+        )
+    
+    def _on_resources_changed(self, state: Dict[str, Any]):
+        self.status.update_ordered('resources', **state)
+    
+    def _on_bot_state_change(self, running: bool):
+        self.status.update(telegram_bot_active=running)
     
     def _parsing_task(
         self,
@@ -119,6 +204,12 @@ class AppManager:
         user_id: str = None,
         min_seller_orders: int = 0,
         max_seller_orders: int = 0,
+        export_formats: list = None,
+        export_compression: str = 'none',
+        target_sellers: int = 0,
+        delta_mode: bool = False,
+        watch_id: int = None,
+        max_products: int = 0,
     ):
         # Поля, которые требуют парсинга селлера
         SELLER_FIELDS = {
@@ -135,15 +226,26 @@ class AppManager:
             needs_seller_parsing = True
         
         start_time = time.time()
+        export_writer: Optional[ExportWriter] = None
+        progress = self._create_progress_reporter(user_id, start_time)
+        finished = False
+        trace = tracing.current_run()
+        profiler = trace.profiler if trace is not None else None
         
         try:
+            from ..parsers.link_parser import OzonLinkParser
+            from ..parsers.product_parser import OzonProductParser
+            from ..parsers.seller_parser import OzonSellerParser
+            
             # Начинаем сессию парсинга для пользователя
             if user_id:
-                resource_manager.start_parsing_session(user_id, 'full_parsing', 0)
+                get_resource_manager().start_parsing_session(user_id, 'full_parsing', 0)
             
-            link_parser = OzonLinkParser(category_url, self.settings.MAX_PRODUCTS, user_id)
+            progress.set_stage('links')
+            link_parser = OzonLinkParser(category_url, max_products or self.settings.MAX_PRODUCTS, user_id)
             
-            success, product_links = link_parser.start_parsing()
+            with tracing.span('stage.links'):
+                success, product_links = link_parser.start_parsing()
             
             if self.stop_event.is_set():
                 return
@@ -155,78 +257,137 @@ class AppManager:
             if self.stop_event.is_set():
                 return
             
-            product_parser = OzonProductParser(self.settings.MAX_WORKERS, user_id)
-            product_results = product_parser.parse_products(product_links)
-            
-            # Принудительно закрываем все воркеры продуктов перед началом парсинга продавцов
-            product_parser.cleanup()
-            
-            if self.stop_event.is_set():
-                return
+            # Наблюдение: дальше идут только артикулы, которых не было в прошлых запусках
+            watch_info = None
+            if watch_id is not None:
+                total_links = len(product_links)
+                product_links = self._filter_new_watch_links(watch_id, product_links)
+                watch_info = {'watch_id': watch_id, 'total_links': total_links, 'new_links': len(product_links)}
+                if not product_links:
+                    progress.finish('done')
+                    finished = True
+                    if profiler is None:
+                        self._delete_output_folder(getattr(link_parser, 'output_folder', ''))
+                    self._send_watch_idle_message(user_id, category_url, total_links)
+                    return
             
-            seller_results = []
             # Метаданные селлера (имя/ссылка) можно достать из карточек товаров
             seller_meta: Dict[str, Dict[str, str]] = {}
+            output_folder = getattr(link_parser, 'output_folder', 'unknown')
+            if profiler is not None:
+                # Профиль пишется рядом с экспортом, и папка запуска не удаляется после отправки
+                profiler.output_dir = self.settings.OUTPUT_DIR / output_folder
+            export_writer = self._create_export_writer(
+                output_folder, selected_fields, seller_meta, export_formats, export_compression
+            )
+            export_writer.open(category_url)
+            
+            # Дельта-режим: выгружаются только новые продавцы и продавцы с изменившимися данными
+            delta = self._create_seller_delta(category_url, seller_meta) if delta_mode and needs_seller_parsing else None
+            
+            # Режим цели: парсинг идет пачками и останавливается, как только найдено
+            # target_sellers продавцов, прошедших фильтр по заказам
+            target_sellers = int(target_sellers or 0) if needs_seller_parsing else 0
+            target_reached = threading.Event()
+            stop_signal = _StopSignal(self.stop_event, target_reached)
+            qualified_ids: List[str] = []
+            qualified_lock = threading.Lock()
+            if target_sellers:
+                progress.set_target(target_sellers)
+            
+            def on_product(product):
+                done = progress.advance()
+                if user_id:
+                    get_resource_manager().update_progress(user_id, done)
+            
+            def on_seller(seller):
+                # В режиме цели продавцы парсятся вместе с товарами: счетчик этапа ведут товары,
+                # а найденные продавцы видны в строке цели
+                if not target_sellers:
+                    done = progress.advance()
+                    if user_id:
+                        get_resource_manager().update_progress(user_id, done)
+                if not self._passes_orders_filter(seller, min_seller_orders, max_seller_orders):
+                    return
+                if delta is not None and seller.success and not delta.is_reported(seller):
+                    return
+                if target_sellers and seller.success:
+                    with qualified_lock:
+                        # Параллельные воркеры могут прислать лишних продавцов после достижения цели
+                        if len(qualified_ids) >= target_sellers:
+                            return
+                        qualified_ids.append(seller.seller_id)
+                        if len(qualified_ids) >= target_sellers:
+                            logger.info(f"Цель достигнута: найдено {target_sellers} продавцов, останавливаем воркеры")
+                            target_reached.set()
+                # Строки пишутся в экспорт сразу, как только продавец прошел фильтр
+                export_writer.write_seller(seller)
+                if seller.success:
+                    progress.add_sellers()
             
-            if needs_seller_parsing:
-                seller_ids = []
-                total_products = len(product_results)
-                successful_products = len([p for p in product_results if p.success])
-                products_with_seller_id = 0
+            seller_results = []
+            
+            if target_sellers:
+                product_results, seller_results = self._parse_until_target(
+                    product_links, user_id, seller_meta, on_product, on_seller, stop_signal, progress
+                )
+                logger.info(f"Режим цели: найдено {len(qualified_ids)}/{target_sellers} продавцов, обработано {len(product_results)} товаров")
+            else:
+                progress.set_stage('products', len(product_links))
+                product_parser = OzonProductParser(self.settings.MAX_WORKERS, user_id)
+                with tracing.span('stage.products'):
+                    product_results = product_parser.parse_products(product_links, on_result=on_product, stop_event=self.stop_event)
                 
-                for product in product_results:
-                    if product.success:
-                        if product.seller_id:
-                            seller_ids.append(product.seller_id)
-                            products_with_seller_id += 1
-
-                            if product.seller_id not in seller_meta:
-                                seller_meta[product.seller_id] = {
-                                    'seller_name': product.company_name or '',
-                                    'seller_link': product.seller_link or (f"https://ozon.ru/seller/{product.seller_id}" if product.seller_id else '')
-                                }
-                            else:
-                                # добиваем пустые значения, если появились позже
-                                if not seller_meta[product.seller_id].get('seller_name') and product.company_name:
-                                    seller_meta[product.seller_id]['seller_name'] = product.company_name
-                                if not seller_meta[product.seller_id].get('seller_link') and product.seller_link:
-                                    seller_meta[product.seller_id]['seller_link'] = product.seller_link
-                        else:
-                            logger.warning(f"Товар {product.article} ({product.name[:50]}) не имеет seller_id")
+                # Принудительно закрываем все воркеры продуктов перед началом парсинга продавцов
+                product_parser.cleanup()
                 
-                unique_seller_ids = list(set(seller_ids))
-                logger.info(f"Статистика seller_id: всего товаров={total_products}, успешных={successful_products}, с seller_id={products_with_seller_id}, уникальных селлеров={len(unique_seller_ids)}")
+                if self.stop_event.is_set():
+                    return
                 
-                if unique_seller_ids:
-                    logger.info(f"Начинаем парсинг {len(unique_seller_ids)} продавцов (поля: {selected_fields})")
-                    seller_parser = OzonSellerParser(self.settings.MAX_WORKERS, user_id)
-                    seller_results = seller_parser.parse_sellers(unique_seller_ids)
-                    logger.info(f"✓ Парсинг селлеров завершен. Получено: {len(seller_results)}, успешных: {len([s for s in seller_results if s.success])}")
-                    # Закрываем воркеры продавцов после завершения
-                    seller_parser.cleanup()
+                if needs_seller_parsing:
+                    unique_seller_ids = self._collect_seller_ids(product_results, seller_meta)
+                    
+                    if unique_seller_ids:
+                        logger.info(f"Начинаем парсинг {len(unique_seller_ids)} продавцов (поля: {selected_fields})")
+                        seller_parser = OzonSellerParser(self.settings.MAX_WORKERS, user_id)
+                        progress.set_stage('sellers', len(unique_seller_ids))
+                        with tracing.span('stage.sellers'):
+                            seller_results = seller_parser.parse_sellers(unique_seller_ids, on_result=on_seller, stop_event=self.stop_event)
+                        logger.info(f"✓ Парсинг селлеров завершен. Получено: {len(seller_results)}, успешных: {len([s for s in seller_results if s.success])}")
+                        # Закрываем воркеры продавцов после завершения
+                        seller_parser.cleanup()
+                    else:
+                        logger.info("Нет ID селлеров для парсинга")
                 else:
-                    logger.info("Нет ID селлеров для парсинга")
-            else:
-                logger.info(f"Парсинг селлеров пропущен: в selected_fields ({selected_fields}) нет полей селлера")
+                    logger.info(f"Парсинг селлеров пропущен: в selected_fields ({selected_fields}) нет полей селлера")
             
             if self.stop_event.is_set():
                 return
 
+            # В склад попадает всё, что увидели, до фильтров по заказам и цели
+            with tracing.span('stage.warehouse'):
+                warehouse_run_id = self._save_to_warehouse(
+                    category_url, product_results, seller_results, user_id, start_time, seller_meta
+                )
+            if watch_id is not None:
+                self._mark_watch_seen(watch_id, product_results)
+
             # Фильтрация продавцов по диапазону заказов (max=0 => без верхней границы)
             if (min_seller_orders and min_seller_orders > 0) or (max_seller_orders and max_seller_orders > 0):
                 before_count = len(seller_results)
-                filtered = []
-                for s in seller_results:
-                    if not getattr(s, 'success', False):
-                        continue
-                    orders_int = self._parse_orders_count_to_int(getattr(s, 'orders_count', ''))
-                    if min_seller_orders and min_seller_orders > 0 and orders_int < min_seller_orders:
-                        continue
-                    if max_seller_orders and max_seller_orders > 0 and orders_int > max_seller_orders:
-                        continue
-                    filtered.append(s)
-                seller_results = filtered
+                seller_results = [
+                    s for s in seller_results
+                    if getattr(s, 'success', False) and self._passes_orders_filter(s, min_seller_orders, max_seller_orders)
+                ]
                 logger.info(f"Фильтр по заказам: min={min_seller_orders}, max={max_seller_orders}, было={before_count}, стало={len(seller_results)}")
+            if delta is not None:
+                seller_results = [s for s in seller_results if s.success and delta.is_reported(s)]
+                logger.info(f"Дельта-режим: {delta.summary()}")
+            if target_sellers:
+                # В результат попадают только продавцы, засчитанные в цель (и записанные в экспорт)
+                qualified = set(qualified_ids)
+                seller_results = [s for s in seller_results if s.seller_id in qualified]
+            seller_results = sort_sellers(seller_results, 'orders_count')
             
             seller_data = {}
             for seller in seller_results:
@@ -250,12 +411,20 @@ class AppManager:
                 'failed_products': failed_products,
                 'total_sellers': len(seller_results),
                 'successful_sellers': len([s for s in seller_results if s.success]),
-                'output_folder': getattr(link_parser, 'output_folder', 'unknown'),
+                'output_folder': output_folder,
                 'seller_data': seller_data,
                 'selected_fields': selected_fields,
                 'min_seller_orders': int(min_seller_orders or 0),
                 'max_seller_orders': int(max_seller_orders or 0),
+                'target_sellers': target_sellers,
+                'target_reached': target_reached.is_set(),
                 'seller_meta': seller_meta,
+                'warehouse_run_id': warehouse_run_id,
+                'delta_mode': delta is not None,
+                'delta': delta.summary() if delta is not None else None,
+                'delta_has_baseline': delta.has_baseline if delta is not None else False,
+                'watch': watch_info,
+                'profiled': profiler is not None,
                 'parsing_stats': {
                     'total_time': total_time,
                     'successful_products': successful_products,
@@ -271,145 +440,268 @@ class AppManager:
             # Обновляем глобальные результаты для совместимости
             self.last_results = user_results
             
-            self._save_results_to_file(user_id)
-            self._export_to_excel(user_id)
+            progress.set_stage('export')
+            with tracing.span('stage.export'):
+                export_files = export_writer.close()
+            user_results['export_files'] = {name: str(path) for name, path in export_files.items()}
+            user_results['perf'] = self._save_run_perf(warehouse_run_id)
+            progress.finish('done')
+            finished = True
+            self._deliver_export_files(export_files, user_id)
             self._send_report_to_telegram(user_id)
             
         finally:
+            if not finished:
+                progress.finish('stopped' if self.stop_event.is_set() else 'failed')
+            RUNS.inc(status='done' if finished else ('stopped' if self.stop_event.is_set() else 'failed'))
+            # Закрываем приёмники экспорта даже при остановке/ошибке, чтобы не держать файлы открытыми
+            if export_writer is not None:
+                export_writer.close()
             # Завершаем сессию парсинга для пользователя
             if user_id:
-                resource_manager.finish_parsing_session(user_id)
+                get_resource_manager().finish_parsing_session(user_id)
+    
+
+    def _collect_seller_ids(self, product_results: list, seller_meta: Dict[str, Dict[str, str]]) -> List[str]:
+        """Собирает уникальные seller_id из успешных товаров и дополняет метаданные продавцов"""
+        seller_ids = []
+        total_products = len(product_results)
+        successful_products = len([p for p in product_results if p.success])
+        
+        for product in product_results:
+            seller_id = self._remember_seller(product, seller_meta)
+            if seller_id:
+                seller_ids.append(seller_id)
+        products_with_seller_id = len(seller_ids)
+        
+        unique_seller_ids = list(dict.fromkeys(seller_ids))
+        logger.info(f"Статистика seller_id: всего товаров={total_products}, успешных={successful_products}, с seller_id={products_with_seller_id}, уникальных селлеров={len(unique_seller_ids)}")
+        return unique_seller_ids
+
+    def _remember_seller(self, product, seller_meta: Dict[str, Dict[str, str]]) -> Optional[str]:
+        """seller_id успешного товара (None, если его нет); имя и ссылка продавца дописываются в seller_meta"""
+        if not product.success:
+            return None
+        if not product.seller_id:
+            logger.warning(f"Товар {product.article} ({product.name[:50]}) не имеет seller_id")
+            return None
+        
+        if product.seller_id not in seller_meta:
+            seller_meta[product.seller_id] = {
+                'seller_name': product.company_name or '',
+                'seller_link': product.seller_link or f"https://ozon.ru/seller/{product.seller_id}"
+            }
+        else:
+            # добиваем пустые значения, если появились позже
+            if not seller_meta[product.seller_id].get('seller_name') and product.company_name:
+                seller_meta[product.seller_id]['seller_name'] = product.company_name
+            if not seller_meta[product.seller_id].get('seller_link') and product.seller_link:
+                seller_meta[product.seller_id]['seller_link'] = product.seller_link
+        return product.seller_id
     
+    def _filter_new_watch_links(self, watch_id: int, product_links: Dict[str, str]) -> Dict[str, str]:
+        """Оставляет ссылки с артикулами, которых нет в снимке наблюдения (снимок не меняется)"""
+        from ..parsers.product_parser import extract_article
+        articles = {url: extract_article(url) or url for url in product_links}
+        new_articles = self.watch_scheduler.store.diff_articles(watch_id, articles.values())
+        new_links = {url: image for url, image in product_links.items() if articles[url] in new_articles}
+        logger.info(f"Наблюдение {watch_id}: новых товаров {len(new_links)} из {len(product_links)}")
+        return new_links
 
-    def _save_results_to_file(self, user_id: str = None):
-        """Сохраняет в JSON только те же данные, что и в Excel (продавцы), для автоматизации."""
+    def _mark_watch_seen(self, watch_id: int, product_results):
+        """Дописывает в снимок наблюдения успешно обработанные товары завершившегося запуска"""
+        articles = [product.article for product in product_results if product.success and product.article]
         try:
-            import json
-            from datetime import datetime
+            self.watch_scheduler.store.mark_seen(watch_id, articles)
+        except Exception as e:
+            logger.error(f"Наблюдение {watch_id}: не удалось обновить снимок артикулов: {e}")
 
-            results = self.user_results.get(user_id, self.last_results) if user_id else self.last_results
-            folder_name = results.get('output_folder', 'unknown')
-            output_dir = self.settings.OUTPUT_DIR / folder_name
-            filepath = output_dir / f"category_{folder_name}.json"
-            output_dir.mkdir(parents=True, exist_ok=True)
+    def _send_watch_idle_message(self, user_id: str, category_url: str, total_links: int):
+        delivery = get_delivery_service(self.telegram_bot.bot_token if self.telegram_bot else None)
+        if not delivery or not user_id:
+            return
+        delivery.submit_message(
+            user_id,
+            f"👁 Новых товаров нет ({total_links} уже известны)\n{html.escape(category_url)}",
+            parse_mode="HTML",
+        )
 
-            seller_meta = results.get('seller_meta', {}) or {}
-            sellers_list = []
+    def start_watch_scheduler(self):
+        self.watch_scheduler.start()
 
-            for seller in results.get('sellers', []):
-                if not getattr(seller, 'success', False):
-                    continue
-                sid = getattr(seller, 'seller_id', '')
-                meta = seller_meta.get(sid, {}) if sid else {}
-                company_name = (getattr(seller, 'company_name', '') or '').replace('\\"', '"').replace('\"', '"').replace('"', '"')
-                seller_link = meta.get('seller_link') or (f"https://ozon.ru/seller/{sid}" if sid else "")
-                sellers_list.append({
-                    'seller_id': sid,
-                    'seller_name': (meta.get('seller_name') or '').replace('\\"', '"').replace('\"', '"').replace('"', '"'),
-                    'company_name': company_name,
-                    'inn': getattr(seller, 'inn', '') or '',
-                    'orders_count': getattr(seller, 'orders_count', '') or '',
-                    'reviews_count': getattr(seller, 'reviews_count', '') or '',
-                    'average_rating': getattr(seller, 'average_rating', '') or '',
-                    'working_time': getattr(seller, 'working_time', '') or '',
-                    'seller_link': seller_link,
-                })
+    def add_watch(self, user_id: str, category_url: str, interval_minutes: int, max_products: int) -> int:
+        watch_id = self.watch_scheduler.store.add_watch(user_id, category_url, interval_minutes, max_products)
+        self.watch_scheduler.wake()
+        return watch_id
 
-            save_data = {
-                'timestamp': datetime.now().strftime("%d.%m.%Y_%H-%M-%S"),
-                'category_url': results.get('category_url', ''),
-                'total_sellers': len(sellers_list),
-                'sellers': sellers_list,
-            }
+    def remove_watch(self, user_id: str, watch_id: int) -> bool:
+        return self.watch_scheduler.store.remove_watch(user_id, watch_id)
 
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(save_data, f, ensure_ascii=False, indent=2)
+    def list_watches(self, user_id: str) -> List[Watch]:
+        return self.watch_scheduler.store.list_watches(user_id)
+
+    def _save_to_warehouse(self, category_url: str, product_results: list, seller_results: list,
+                           user_id: str = None, started_at: float = None,
+                           seller_meta: Dict[str, Dict[str, str]] = None) -> Optional[int]:
+        """Сохраняет запуск в исторический склад; ошибка склада не ломает парсинг"""
+        try:
+            return get_warehouse().record_run(
+                category_url, product_results, seller_results, user_id, started_at, seller_meta
+            )
         except Exception as e:
-            logger.error(f"Ошибка сохранения результатов: {e}")
-    
-    def _export_to_excel(self, user_id: str = None):
+            logger.error(f"Склад недоступен: {e}")
+            return None
+
+    def _write_run_trace(self, trace: tracing.RunTrace, user_id: str = None):
+        """При TRACE_RUNS=true сохраняет таймлайн запуска в logs/traces (папка запуска удаляется после отправки)"""
         try:
-            # Получаем результаты для конкретного пользователя
-            results = self.user_results.get(user_id, self.last_results) if user_id else self.last_results
-            
-            folder_name = results.get('output_folder', 'unknown')
-            output_dir = self.settings.OUTPUT_DIR / folder_name
-            
-            exporter = ExcelExporter(output_dir, f"category_{folder_name}")
-            selected_fields = results.get('selected_fields', [])
-            
-            # Экспортируем только продавцов
-            export_data = {'sellers': []}
-            seller_meta = results.get('seller_meta', {}) or {}
+            if not load_flag('TRACE_RUNS'):
+                return
+            stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(trace.started_wall))
+            path = trace.write_chrome_trace(self.settings.TRACES_DIR / f"trace_{user_id or 'local'}_{stamp}.json")
+            logger.info(f"Трейс запуска сохранен: {path}")
+        except Exception as e:
+            logger.error(f"Не удалось сохранить трейс запуска: {e}")
 
-            for seller in results.get('sellers', []):
-                if not getattr(seller, 'success', False):
-                    continue
+    def _save_run_perf(self, warehouse_run_id: Optional[int]) -> Dict[str, Dict[str, float]]:
+        """Сворачивает спаны текущего запуска в p50/p95/p99 по фазам и сохраняет сводку в склад"""
+        trace = tracing.current_run()
+        if trace is None:
+            return {}
+        perf = trace.summary()
+        if warehouse_run_id is not None:
+            try:
+                get_warehouse().save_run_perf(warehouse_run_id, perf)
+            except Exception as e:
+                logger.error(f"Не удалось сохранить замеры запуска {warehouse_run_id}: {e}")
+        return perf
 
-                sid = getattr(seller, 'seller_id', '')
-                meta = seller_meta.get(sid, {}) if sid else {}
+    def _create_seller_delta(self, category_url: str, seller_meta: Dict[str, Dict[str, str]]) -> SellerDelta:
+        """Загружает последние отпечатки продавцов категории; без склада все продавцы считаются новыми"""
+        try:
+            previous_hashes = get_warehouse().previous_seller_hashes(category_url)
+        except Exception as e:
+            logger.error(f"Не удалось загрузить прошлый запуск для дельта-режима: {e}")
+            previous_hashes = {}
+        logger.info(f"Дельта-режим: в прошлых запусках категории {len(previous_hashes)} продавцов")
+        return SellerDelta(previous_hashes, seller_meta)
 
-                company_name = (getattr(seller, 'company_name', '') or '').replace('\\"', '"').replace('\"', '"').replace('"', '"')
-                seller_link = meta.get('seller_link') or (f"https://ozon.ru/seller/{sid}" if sid else "")
+    def _parse_until_target(
+        self,
+        product_links: Dict[str, str],
+        user_id: str,
+        seller_meta: Dict[str, Dict[str, str]],
+        on_product,
+        on_seller,
+        stop_signal: '_StopSignal',
+        progress: ProgressReporter,
+    ):
+        """
+        Парсит товары и параллельно — продавцов по мере их появления. Пулы воркеров товаров и
+        продавцов создаются один раз на запуск и останавливаются вместе, как только stop_signal
+        выставлен (цель достигнута или парсинг остановлен)
+        """
+        from ..parsers.product_parser import OzonProductParser
+        from ..parsers.seller_parser import OzonSellerParser
+        
+        # Воркеры пользователя делятся между пулами: продавцы идут сразу вслед за товарами
+        if user_id:
+            allocated = get_resource_manager().start_parsing_session(user_id, 'products', len(product_links))
+        else:
+            allocated = min(get_resource_manager().MAX_WORKERS_PER_USER, self.settings.MAX_WORKERS)
+        seller_workers = max(1, allocated // 2)
+        product_workers = max(1, allocated - seller_workers)
+        logger.info(f"Режим цели: {product_workers} воркеров товаров и {seller_workers} воркеров продавцов")
+        
+        seen_sellers = set()
+        seen_lock = threading.Lock()
+        seller_parser = OzonSellerParser(self.settings.MAX_WORKERS, user_id)
+        seller_stream = seller_parser.open_stream(seller_workers, on_result=on_seller, stop_event=stop_signal)
+        
+        def on_target_product(product):
+            on_product(product)
+            with seen_lock:
+                seller_id = self._remember_seller(product, seller_meta)
+                if not seller_id or seller_id in seen_sellers:
+                    return
+                seen_sellers.add(seller_id)
+            seller_stream.submit([seller_id])
+        
+        progress.set_stage('products', len(product_links))
+        product_parser = OzonProductParser(product_workers, user_id)
+        try:
+            with tracing.span('stage.products'):
+                product_results = product_parser.parse_products(product_links, on_result=on_target_product, stop_event=stop_signal)
+        finally:
+            # Пул продавцов дорабатывает поданных продавцов (или останавливается по stop_signal)
+            with tracing.span('stage.sellers'):
+                seller_results = seller_stream.close()
+        product_parser.cleanup()
+        seller_parser.cleanup()
+        
+        logger.info(f"Режим цели: товаров {len(product_results)}, уникальных продавцов {len(seen_sellers)}, обработано продавцов {len(seller_results)}")
+        return product_results, seller_results
 
-                export_data['sellers'].append({
-                    'seller_id': sid,
-                    'seller_name': (meta.get('seller_name') or '').replace('\\"', '"').replace('\"', '"').replace('"', '"'),
-                    'company_name': company_name,
-                    'inn': getattr(seller, 'inn', '') or '',
-                    'orders_count': getattr(seller, 'orders_count', '') or '',
-                    'reviews_count': getattr(seller, 'reviews_count', '') or '',
-                    'average_rating': getattr(seller, 'average_rating', '') or '',
-                    'working_time': getattr(seller, 'working_time', '') or '',
-                    'seller_link': seller_link,
-                })
-            
-            if exporter.export_results(export_data, selected_fields):
-                json_path = output_dir / f"category_{folder_name}.json"
+    def _create_progress_reporter(self, user_id: str = None, start_time: float = None) -> ProgressReporter:
+        """
+        Живое сообщение о прогрессе отправляется только пользователю бота. Ключ включает время
+        запуска: финал прошлого запуска, еще не отправленный сервисом, не подменит новое сообщение
+        """
+        delivery = None
+        if user_id:
+            delivery = get_delivery_service(self.telegram_bot.bot_token if self.telegram_bot else None)
+        run_id = int(start_time if start_time is not None else time.time())
+        return ProgressReporter(delivery, user_id, f"parsing:{user_id}:{run_id}")
+
+    def _create_export_writer(
+        self,
+        folder_name: str,
+        selected_fields: list,
+        seller_meta: Dict[str, Dict[str, str]],
+        export_formats: list = None,
+        export_compression: str = 'none',
+    ) -> ExportWriter:
+        """Создает единый писатель экспорта с приёмниками выбранных форматов в папке запуска"""
+        output_dir = self.settings.OUTPUT_DIR / folder_name
+        output_dir.mkdir(parents=True, exist_ok=True)
+        writer = ExportWriter(seller_meta)
+        for fmt in (export_formats or DEFAULT_EXPORT_FORMATS):
+            sink = create_sink(fmt, output_dir, f"category_{folder_name}", selected_fields, export_compression)
+            if sink is not None:
+                writer.add_sink(fmt, sink)
+        return writer
+
+    def _deliver_export_files(self, export_files: Dict[str, Any], user_id: str = None):
+        """Отправляет готовые файлы экспорта в Telegram"""
+        try:
+            excel_path = export_files.get('excel')
+            json_path = export_files.get('json')
+            extra_paths = [str(path) for name, path in export_files.items() if name not in ('excel', 'json')]
+            if excel_path or json_path or extra_paths:
                 self._send_files_to_telegram(
-                    str(exporter.filepath),
+                    str(excel_path) if excel_path else None,
                     user_id,
-                    json_path=str(json_path) if json_path.exists() else None,
+                    json_path=str(json_path) if json_path else None,
+                    extra_paths=extra_paths,
                 )
-            
         except Exception as e:
-            logger.error(f"Ошибка экспорта в Excel: {e}")
+            logger.error(f"Ошибка отправки файлов экспорта: {e}")
 
-    def _parse_orders_count_to_int(self, value) -> int:
-        """Преобразует строковое значение заказов в int.
-        Поддержка: 897 K, 1,6 M, 40,2 K (запятая — десятичная), 5 972, 1 315 (пробел — тысячи).
-        """
-        try:
-            if value is None:
-                return 0
-            s = str(value).strip()
-            if not s:
-                return 0
-            # Нормализуем неразрывные и тонкие пробелы
-            s = s.replace('\u00a0', ' ').replace('\u202f', ' ').replace('\u2009', ' ')
-            s_lower = s.lower()
-
-            multiplier = 1
-            # Убираем суффикс K/M (или тыс/млн), остаётся только числовая часть
-            if s_lower.endswith('m') or ' m' in s_lower or 'млн' in s_lower:
-                multiplier = 1_000_000
-                num_part = re.sub(r'\s*m\s*$|\s*млн\s*$', '', s_lower, flags=re.I).strip()
-            elif s_lower.endswith('k') or ' k' in s_lower or 'тыс' in s_lower:
-                multiplier = 1_000
-                num_part = re.sub(r'\s*k\s*$|\s*тыс\s*$', '', s_lower, flags=re.I).strip()
-            else:
-                num_part = s_lower
+    def _passes_orders_filter(self, seller, min_seller_orders: int = 0, max_seller_orders: int = 0) -> bool:
+        """Проверяет продавца на диапазон заказов (0 — граница отключена)"""
+        if not (min_seller_orders and min_seller_orders > 0) and not (max_seller_orders and max_seller_orders > 0):
+            return True
+        orders_int = seller_metric(seller, 'orders_count') or 0
+        if min_seller_orders and min_seller_orders > 0 and orders_int < min_seller_orders:
+            return False
+        if max_seller_orders and max_seller_orders > 0 and orders_int > max_seller_orders:
+            return False
+        return True
 
-            # Пробел — разделитель тысяч (5 972 → 5972), запятая — десятичная (1,6 → 1.6)
-            num_part = num_part.replace(' ', '').replace(',', '.')
-            if not num_part:
-                return 0
-            return int(float(num_part) * multiplier)
-        except Exception:
-            return 0
-    
     def start_telegram_bot(self, bot_token: str, user_ids) -> bool:
         try:
+            from ..telegram.bot_manager import TelegramBotManager
+            
             if self.telegram_bot:
                 self.telegram_bot.stop()
             
@@ -419,7 +711,9 @@ class AppManager:
             elif not isinstance(user_ids, list):
                 user_ids = list(user_ids)
             
-            self.telegram_bot = TelegramBotManager(bot_token, user_ids, self)
+            self.telegram_bot = TelegramBotManager(
+                bot_token, user_ids, self, webhook=load_webhook_config(), on_state_change=self._on_bot_state_change
+            )
             return self.telegram_bot.start()
         except Exception as e:
             logger.error(f"Ошибка запуска Telegram бота: {e}")
@@ -437,30 +731,32 @@ class AppManager:
         user_id: str = None,
         min_seller_orders: int = 0,
         max_seller_orders: int = 0,
+        export_formats: list = None,
+        export_compression: str = 'none',
+        target_sellers: int = 0,
+        delta_mode: bool = False,
     ) -> bool:
         self.stop_parsing(user_id)
         time.sleep(1)
-        return self.start_parsing(category_url, selected_fields, user_id, min_seller_orders, max_seller_orders)
+        return self.start_parsing(
+            category_url, selected_fields, user_id, min_seller_orders, max_seller_orders,
+            export_formats=export_formats, export_compression=export_compression,
+            target_sellers=target_sellers, delta_mode=delta_mode,
+        )
     
     def get_status(self):
-        with self.parsing_lock:
-            status = {
-                'is_running': self.is_running,
-                'active_users_count': len(self.active_parsing_users),
-                'active_users': list(self.active_parsing_users),
-                'telegram_bot_active': self.telegram_bot and hasattr(self.telegram_bot, 'is_running') and self.telegram_bot.is_running,
-                'last_results': self.last_results,
-                'settings': {
-                    'max_products': self.settings.MAX_PRODUCTS,
-                    'max_workers': self.settings.MAX_WORKERS
-                }
-            }
-        
-        # Добавляем информацию о ресурсах
-        resource_status = resource_manager.get_status()
-        status.update(resource_status)
-        
-        return status
+        """
+        Готовый снимок статуса без блокировок: флаги парсинга и бота, сессии ResourceManager
+        и 'version', которая растет при каждом изменении. Результаты парсинга сюда не входят —
+        см. get_user_results().
+        """
+        return dict(
+            self.status.snapshot(),
+            settings={
+                'max_products': self.settings.MAX_PRODUCTS,
+                'max_workers': self.settings.MAX_WORKERS
+            },
+        )
     
     def get_user_results(self, user_id: str):
         """Получает результаты парсинга для конкретного пользователя"""
@@ -468,19 +764,18 @@ class AppManager:
             return self.user_results.get(user_id, None)
     
     def _send_report_to_telegram(self, user_id: str = None):
-        self._send_via_temp_bot(report_only=True, target_user_id=user_id)
+        self._send_via_delivery(report_only=True, target_user_id=user_id)
     
-    def _send_files_to_telegram(self, excel_path: str, user_id: str = None, json_path: str = None):
-        self._send_via_temp_bot(excel_path=excel_path, json_path=json_path, target_user_id=user_id)
+    def _send_files_to_telegram(self, excel_path: str, user_id: str = None, json_path: str = None, extra_paths: list = None):
+        self._send_via_delivery(excel_path=excel_path, json_path=json_path, extra_paths=extra_paths, target_user_id=user_id)
 
-    def _send_via_temp_bot(self, excel_path: str = None, json_path: str = None, report_only: bool = False, target_user_id: str = None):
+    def _send_via_delivery(self, excel_path: str = None, json_path: str = None, report_only: bool = False, target_user_id: str = None, extra_paths: list = None):
+        """Ставит отчет и файлы в очередь сервиса доставки и сразу возвращает управление"""
         try:
-            from ..utils.config_loader import load_telegram_config
-            
-            bot_token, config_user_ids = load_telegram_config()
+            import os
             
-            if not bot_token:
-                logger.error("Нет TELEGRAM_BOT_TOKEN в config.txt")
+            delivery = get_delivery_service(self.telegram_bot.bot_token if self.telegram_bot else None)
+            if not delivery:
                 return
             
             # Определяем целевого пользователя
@@ -489,101 +784,113 @@ class AppManager:
                 target_users = [target_user_id]
             else:
                 # Отправляем всем пользователям из конфига (для обратной совместимости)
-                if not config_user_ids:
+                target_users = get_default_recipients()
+                if not target_users:
                     logger.error("Нет TELEGRAM_CHAT_ID в config.txt")
                     return
-                target_users = config_user_ids.split(',') if isinstance(config_user_ids, str) else [config_user_ids]
-            
-            from aiogram import Bot
-            from aiogram.types import FSInputFile
             
-            async def send_files():
-                temp_bot = Bot(token=bot_token)
-                
-                try:
-                    for target_user in target_users:
-                        target_user = target_user.strip()
-                        
-                        if report_only:
-                            # Получаем результаты для конкретного пользователя
-                            results = self.user_results.get(target_user_id, self.last_results) if target_user_id else self.last_results
-                            
-                            stats = results.get('parsing_stats', {})
-                            total_time = stats.get('total_time', 0)
-                            successful = stats.get('successful_products', 0)
-                            failed = stats.get('failed_products', 0)
-                            avg_time = stats.get('average_time_per_product', 0)
-                            
-                            hours = int(total_time // 3600)
-                            minutes = int((total_time % 3600) // 60)
-                            seconds = int(total_time % 60)
-                            
-                            if hours > 0:
-                                time_str = f"{hours}ч {minutes}м {seconds}с"
-                            elif minutes > 0:
-                                time_str = f"{minutes}м {seconds}с"
-                            else:
-                                time_str = f"{seconds}с"
-                            
-                            success_rate = (successful / (successful + failed) * 100) if (successful + failed) > 0 else 0
-                            
-                            report = (
-                                "📈 <b>Отчет о парсинге</b>\n\n"
-                                f"⏱️ <b>Общее время:</b> {time_str}\n"
-                                f"⚡ <b>Среднее время на товар:</b> {avg_time:.1f}с\n\n"
-                                f"📦 <b>Всего товаров:</b> {successful + failed}\n"
-                                f"✅ <b>Успешно:</b> {successful}\n"
-                                f"❌ <b>Неудачно:</b> {failed}\n"
-                                f"📊 <b>Успешность:</b> {success_rate:.1f}%"
-                            )
-                            
-                            await temp_bot.send_message(chat_id=target_user, text=report, parse_mode="HTML")
-                        
-                        if excel_path:
-                            caption = (
-                                "🎉 <b>Парсинг успешно завершен!</b>\n\n"
-                                "📊 <b>Ваш Excel файл готов!</b>\n"
-                                "💎 Данные отформатированы и готовы к использованию\n\n"
-                                "📥 Скачайте файл ниже ⬇️"
-                            )
-                            document = FSInputFile(excel_path)
-                            await temp_bot.send_document(
-                                chat_id=target_user,
-                                document=document,
-                                caption=caption,
-                                parse_mode="HTML"
-                            )
-                        if json_path:
-                            import os
-                            if os.path.isfile(json_path):
-                                caption_json = "📄 <b>JSON</b> — полные данные парсинга"
-                                doc_json = FSInputFile(json_path)
-                                await temp_bot.send_document(
-                                    chat_id=target_user,
-                                    document=doc_json,
-                                    caption=caption_json,
-                                    parse_mode="HTML"
-                                )
-                    
-                    if excel_path or json_path:
-                        await asyncio.sleep(10)
-                        self._delete_output_folder()
-                        
-                finally:
-                    await temp_bot.session.close()
-            
-            asyncio.run(send_files())
+            # Получаем результаты для конкретного пользователя
+            results = self.user_results.get(target_user_id, self.last_results) if target_user_id else self.last_results
+            
+            if report_only:
+                report_text = self._build_report_text(results)
+                for target_user in target_users:
+                    delivery.submit_message(target_user, report_text, parse_mode="HTML")
+            
+            # Каждый файл загружается один раз, остальным получателям уходит по file_id
+            if excel_path:
+                caption = (
+                    "🎉 <b>Парсинг успешно завершен!</b>\n\n"
+                    "📊 <b>Ваш Excel файл готов!</b>\n"
+                    "💎 Данные отформатированы и готовы к использованию\n\n"
+                    "📥 Скачайте файл ниже ⬇️"
+                )
+                delivery.submit_document_to_many(target_users, excel_path, caption=caption, parse_mode="HTML")
+            if json_path and os.path.isfile(json_path):
+                delivery.submit_document_to_many(target_users, json_path, caption="📄 <b>JSON</b> — полные данные парсинга", parse_mode="HTML")
+            for extra_path in extra_paths or []:
+                if os.path.isfile(extra_path):
+                    delivery.submit_document_to_many(target_users, extra_path, caption=f"📦 <b>{os.path.basename(extra_path)}</b>", parse_mode="HTML")
+            
+            if (excel_path or json_path or extra_paths) and not results.get('profiled'):
+                # Очередь выполняется по порядку: папка удалится только после отправки файлов
+                folder_name = results.get('output_folder', '')
+                delivery.submit_callback(lambda: self._delete_output_folder(folder_name))
             
         except Exception as e:
-            logger.error(f"Ошибка отправки через временный бот: {e}")
+            logger.error(f"Ошибка постановки отправки в очередь: {e}")
+    
+    def _build_report_text(self, results: Dict[str, Any]) -> str:
+        stats = results.get('parsing_stats', {})
+        total_time = stats.get('total_time', 0)
+        successful = stats.get('successful_products', 0)
+        failed = stats.get('failed_products', 0)
+        avg_time = stats.get('average_time_per_product', 0)
+        
+        hours = int(total_time // 3600)
+        minutes = int((total_time % 3600) // 60)
+        seconds = int(total_time % 60)
+        
+        if hours > 0:
+            time_str = f"{hours}ч {minutes}м {seconds}с"
+        elif minutes > 0:
+            time_str = f"{minutes}м {seconds}с"
+        else:
+            time_str = f"{seconds}с"
+        
+        success_rate = (successful / (successful + failed) * 100) if (successful + failed) > 0 else 0
+        
+        report = (
+            "📈 <b>Отчет о парсинге</b>\n\n"
+            f"⏱️ <b>Общее время:</b> {time_str}\n"
+            f"⚡ <b>Среднее время на товар:</b> {avg_time:.1f}с\n\n"
+            f"📦 <b>Всего товаров:</b> {successful + failed}\n"
+            f"✅ <b>Успешно:</b> {successful}\n"
+            f"❌ <b>Неудачно:</b> {failed}\n"
+            f"📊 <b>Успешность:</b> {success_rate:.1f}%"
+        )
+        target_sellers = results.get('target_sellers', 0)
+        if target_sellers:
+            status = "достигнута" if results.get('target_reached') else "не достигнута"
+            report += f"\n🎯 <b>Цель:</b> {results.get('total_sellers', 0)}/{target_sellers} продавцов ({status})"
+        watch = results.get('watch')
+        if watch:
+            report += f"\n👁 <b>Наблюдение #{watch['watch_id']}:</b> новых товаров {watch['new_links']} из {watch['total_links']}"
+        delta = results.get('delta')
+        if delta is not None:
+            if results.get('delta_has_baseline'):
+                report += (
+                    f"\n🔁 <b>Дельта:</b> новых {delta['new']}, изменилось {delta['changed']}, "
+                    f"без изменений {delta['unchanged']} (не выгружены)"
+                )
+            else:
+                report += "\n🔁 <b>Дельта:</b> первый запуск категории, выгружены все продавцы"
+        leaders = top_sellers([s for s in results.get('sellers', []) if getattr(s, 'success', False)], 3)
+        if leaders:
+            report += "\n\n🏆 <b>Топ продавцов по заказам:</b>"
+            for place, seller in enumerate(leaders, 1):
+                name = html.escape(seller.company_name or seller.seller_id)
+                orders = f"{seller_metric(seller, 'orders_count'):,}".replace(',', ' ')
+                report += f"\n{place}. {name} — {orders} заказов"
+        if results.get('profiled'):
+            report += f"\n🔬 <b>Профиль запуска:</b> output/{html.escape(str(results.get('output_folder', '')))}"
+        perf = results.get('perf') or {}
+        stages = tracing.format_stages(perf)
+        if stages:
+            report += f"\n\n🧭 <b>Этапы:</b> {html.escape(stages)}"
+        perf_lines = tracing.format_summary(perf, limit=5)
+        if perf_lines:
+            report += "\n⏱ <b>Фазы (p50/p95/p99):</b>\n" + "\n".join(html.escape(line) for line in perf_lines)
+        return report
     
-    def _delete_output_folder(self):
+    def _delete_output_folder(self, folder_name: str = None):
         try:
             import shutil
             import os
             import stat
             
-            folder_name = self.last_results.get('output_folder', '')
+            if folder_name is None:
+                folder_name = self.last_results.get('output_folder', '')
             if folder_name:
                 output_dir = self.settings.OUTPUT_DIR / folder_name
                 if output_dir.exists():
@@ -600,5 +907,9 @@ class AppManager:
         threading.Thread(target=self._do_shutdown, daemon=True).start()
 
     def _do_shutdown(self):
+        from ..telegram.delivery import shutdown_delivery_services
+        self.watch_scheduler.stop()
         self.stop_parsing()
-        self.stop_telegram_bot()
\ No newline at end of file
+        self.stop_telegram_bot()
+        get_resource_manager().remove_listener(self._on_resources_changed)
+        shutdown_delivery_services()
\ No newline at end of file
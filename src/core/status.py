@@ -0,0 +1,93 @@
+"""
+Компактный статус приложения для GUI и бота.
+
+Снимок обновляется при изменении состояния (старт/остановка парсинга, этапы и прогресс
+сессий, запуск бота), а не собирается при каждом опросе. Каждое изменение увеличивает
+версию: GUI сравнивает версию и перерисовывается только при изменениях, бот берет готовый
+снимок без блокировок. Тяжелые результаты парсинга в статус не входят —
+их отдает AppManager.get_user_results().
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+StatusSubscriber = Callable[[Dict[str, Any]], None]
+
+
+class StatusBoard:
+    """Версионированный снимок статуса: снимок не изменяется, при обновлении заменяется целиком"""
+
+    def __init__(self, **initial: Any):
+        self._cond = threading.Condition()
+        self._version = 0
+        self._snapshot: Dict[str, Any] = dict(initial, version=0)
+        self._subscribers: List[StatusSubscriber] = []
+        # Последний примененный номер состояния по каждому источнику (см. update_ordered)
+        self._source_seq: Dict[str, int] = {}
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущий снимок; изменять его нельзя — следующий update() создаст новый"""
+        return self._snapshot
+
+    def update(self, **fields: Any) -> bool:
+        """Меняет поля снимка; если значения не изменились, версия остается прежней"""
+        return self._apply(fields)
+
+    def update_ordered(self, source: str, seq: int, **fields: Any) -> bool:
+        """
+        Как update(), но для источника, нумерующего свои состояния: состояние с seq меньше уже
+        примененного отбрасывается. Потоки публикуют состояния вне своих блокировок и могут
+        прийти не по порядку — устаревшее не должно перетереть более новое
+        """
+        return self._apply(fields, source, seq)
+
+    def _apply(self, fields: Dict[str, Any], source: Optional[str] = None, seq: int = 0) -> bool:
+        with self._cond:
+            if source is not None:
+                if seq < self._source_seq.get(source, seq):
+                    return False
+                self._source_seq[source] = seq
+            current = self._snapshot
+            if all(key in current and current[key] == value for key, value in fields.items()):
+                return False
+            self._version += 1
+            snapshot = dict(current, **fields)
+            snapshot['version'] = self._version
+            self._snapshot = snapshot
+            subscribers = list(self._subscribers)
+            self._cond.notify_all()
+        # Подписчики вызываются вне блокировки и в потоке, изменившем состояние: они должны быть быстрыми
+        for callback in subscribers:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.debug(f"Ошибка подписчика статуса: {e}")
+        return True
+
+    def changed_since(self, version: int) -> Optional[Dict[str, Any]]:
+        """Снимок, если с версии version что-то изменилось, иначе None"""
+        snapshot = self._snapshot
+        return snapshot if snapshot['version'] != version else None
+
+    def wait(self, version: int, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Ждет изменения после версии version (или таймаута) и возвращает текущий снимок"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._version != version, timeout)
+            return self._snapshot
+
+    def subscribe(self, callback: StatusSubscriber) -> Callable[[], None]:
+        """Подписка на изменения; возвращает функцию отписки"""
+        with self._cond:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._cond:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
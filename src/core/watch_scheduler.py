@@ -0,0 +1,99 @@
+"""
+Планировщик наблюдений за категориями: запускает парсинг по расписанию каждого наблюдения
+"""
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from ..utils.database import Database
+from ..utils.watch_store import Watch, WatchStore, get_watch_store
+
+if TYPE_CHECKING:
+    from .app_manager import AppManager
+
+logger = logging.getLogger(__name__)
+
+# Если пользователь в момент запуска уже парсит, наблюдение откладывается на это время
+BUSY_RETRY_SECONDS = 120
+# Как часто планировщик перепроверяет расписание, даже если его не будили
+MAX_SLEEP_SECONDS = 60
+
+
+class WatchScheduler:
+
+    def __init__(self, app_manager: 'AppManager', store: Optional[WatchStore] = None):
+        self.app_manager = app_manager
+        self._store = store
+        self.db = Database()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    @property
+    def store(self) -> WatchStore:
+        if self._store is None:
+            self._store = get_watch_store()
+        return self._store
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="watch-scheduler", daemon=True)
+        self._thread.start()
+        logger.info("Планировщик наблюдений запущен")
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def wake(self):
+        """Пересчитать расписание сейчас (например, после добавления наблюдения)"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                for watch in self.store.due_watches():
+                    if self._stop.is_set():
+                        break
+                    self._run_watch(watch)
+                next_run_at = self.store.next_run_at()
+            except Exception as e:
+                logger.error(f"Ошибка планировщика наблюдений: {e}")
+                next_run_at = None
+
+            sleep_for = MAX_SLEEP_SECONDS
+            if next_run_at is not None:
+                sleep_for = min(MAX_SLEEP_SECONDS, max(0.0, next_run_at - time.time()))
+            self._wake.wait(sleep_for)
+            self._wake.clear()
+
+    def _run_watch(self, watch: Watch):
+        settings = self.db.get_user_settings(watch.user_id)
+        started = self.app_manager.start_parsing(
+            watch.category_url,
+            settings.get('selected_fields'),
+            watch.user_id,
+            settings.get('min_seller_orders', 0),
+            settings.get('max_seller_orders', 0),
+            export_formats=settings.get('export_formats'),
+            export_compression=settings.get('export_compression', 'none'),
+            delta_mode=settings.get('delta_mode', False),
+            watch_id=watch.watch_id,
+            max_products=watch.max_products,
+        )
+        now = time.time()
+        if started:
+            logger.info(f"Наблюдение {watch.watch_id}: запуск для пользователя {watch.user_id} ({watch.category_url})")
+            self.store.schedule(watch.watch_id, now + watch.interval_minutes * 60)
+        else:
+            logger.info(f"Наблюдение {watch.watch_id}: пользователь {watch.user_id} занят, повтор через {BUSY_RETRY_SECONDS} с")
+            self.store.schedule(watch.watch_id, now + BUSY_RETRY_SECONDS, ran=False)
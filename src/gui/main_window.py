@@ -14,6 +14,9 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Опрос статуса дешевый (готовый снимок), виджеты обновляются только при смене версии
+STATUS_POLL_MS = 500
+
 class MainWindow:
     """Главное окно приложения"""
     
@@ -28,6 +31,9 @@ class MainWindow:
         self.logs_tab = None
         self.developer_tab = None
         
+        # Версия последнего примененного снимка статуса
+        self._status_version = -1
+        
         logger.info("GUI инициализирован")
     
     def run(self):
@@ -94,6 +100,9 @@ class MainWindow:
         def update_status():
             try:
                 status = self.app_manager.get_status()
+                if status.get('version') == self._status_version:
+                    return
+                self._status_version = status.get('version')
                 
                 # Обновляем статус в вкладке управления
                 if self.control_tab:
@@ -107,10 +116,10 @@ class MainWindow:
                 
             except Exception as e:
                 logger.debug(f"Ошибка обновления статуса: {e}")
-            
-            # Планируем следующее обновление
-            if self.root:
-                self.root.after(2000, update_status)
+            finally:
+                # Планируем следующее обновление
+                if self.root:
+                    self.root.after(STATUS_POLL_MS, update_status)
         
         # Запускаем первое обновление
         self.root.after(1000, update_status)
@@ -4,10 +4,87 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
 import logging
+from collections import deque
 from datetime import datetime
+from typing import Deque, List, NamedTuple, Optional
+
+from ...utils.logger import attach_handler, detach_handler
 
 logger = logging.getLogger(__name__)
 
+# Сколько записей хранится в памяти и показывается в окне (старые вытесняются)
+MAX_LOG_ENTRIES = 5000
+# Интервал, с которым накопленные записи переносятся в окно
+FLUSH_INTERVAL_MS = 250
+LEVEL_FILTERS = {
+    "Все": logging.NOTSET,
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+}
+
+
+class LogEntry(NamedTuple):
+    levelno: int
+    levelname: str
+    text: str
+    # Текст в нижнем регистре для поиска без пересчета на каждый запрос
+    search_text: str
+
+
+class LogBuffer:
+    """
+    Кольцевой буфер записей лога без привязки к Tk: emit() вызывается из любого потока,
+    drain() — из главного потока по таймеру. Фильтр по уровню и поиск идут по этому
+    буферу, а не по файлам логов.
+    """
+
+    def __init__(self, max_entries: int = MAX_LOG_ENTRIES):
+        self.entries: Deque[LogEntry] = deque(maxlen=max_entries)
+        # deque.append/popleft потокобезопасны, поэтому лок для передачи между потоками не нужен
+        self._pending: Deque[LogEntry] = deque(maxlen=max_entries)
+
+    def emit(self, levelno: int, levelname: str, text: str):
+        self._pending.append(LogEntry(levelno, levelname, text, text.lower()))
+
+    def drain(self) -> List[LogEntry]:
+        """Переносит накопленные записи в буфер и возвращает их"""
+        batch = []
+        while True:
+            try:
+                entry = self._pending.popleft()
+            except IndexError:
+                break
+            batch.append(entry)
+        self.entries.extend(batch)
+        return batch
+
+    def clear(self):
+        self._pending.clear()
+        self.entries.clear()
+
+    @staticmethod
+    def matches(entry: LogEntry, min_level: int = logging.NOTSET, query: str = "") -> bool:
+        return entry.levelno >= min_level and (not query or query in entry.search_text)
+
+    def select(self, min_level: int = logging.NOTSET, query: str = "") -> List[LogEntry]:
+        query = query.lower()
+        return [entry for entry in self.entries if self.matches(entry, min_level, query)]
+
+
+def pop_excess_lines(line_counts: Deque[int], max_entries: int = MAX_LOG_ENTRIES) -> int:
+    """
+    Убирает из line_counts (число строк каждой показанной записи) самые старые записи сверх
+    max_entries и возвращает, сколько строк окна они занимали. Многострочная запись
+    (например, с traceback) удаляется целиком
+    """
+    lines = 0
+    while len(line_counts) > max_entries:
+        lines += line_counts.popleft()
+    return lines
+
+
 class LogsTab:
     """Вкладка логов"""
     
@@ -15,6 +92,10 @@ class LogsTab:
         self.parent = parent
         self.app_manager = app_manager
         self.log_handler = None
+        self.buffer = LogBuffer()
+        # Сколько строк окна занимает каждая показанная запись, в порядке вставки
+        self._shown_lines: Deque[int] = deque()
+        self._flush_job: Optional[str] = None
         
         self.create_widgets()
         self.setup_logging()
@@ -39,7 +120,23 @@ class LogsTab:
         ttk.Button(log_buttons_frame, text="🔄 Обновить", 
                   command=self._refresh_logs).pack(side=tk.LEFT, padx=5)
         
-
+        # Фильтр по уровню и поиск по записям в памяти
+        ttk.Label(log_buttons_frame, text="Уровень:").pack(side=tk.LEFT, padx=(20, 5))
+        self.level_var = tk.StringVar(value="Все")
+        level_combo = ttk.Combobox(log_buttons_frame, textvariable=self.level_var, values=list(LEVEL_FILTERS),
+                                   state="readonly", width=10)
+        level_combo.pack(side=tk.LEFT)
+        level_combo.bind("<<ComboboxSelected>>", lambda event: self._refresh_logs())
+        
+        ttk.Label(log_buttons_frame, text="🔍").pack(side=tk.LEFT, padx=(20, 5))
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(log_buttons_frame, textvariable=self.search_var, width=30)
+        search_entry.pack(side=tk.LEFT)
+        search_entry.bind("<Return>", lambda event: self._refresh_logs())
+        search_entry.bind("<Escape>", lambda event: (self.search_var.set(""), self._refresh_logs()))
+        
+        self.count_var = tk.StringVar(value="")
+        ttk.Label(log_buttons_frame, textvariable=self.count_var).pack(side=tk.RIGHT, padx=5)
         
         # Текстовое поле для логов
         self.log_text = scrolledtext.ScrolledText(
@@ -67,48 +164,83 @@ class LogsTab:
     def setup_logging(self):
         """Настройка обработчика логов для GUI"""
         class GUILogHandler(logging.Handler):
-            def __init__(self, text_widget, parent_tab):
+            """Только складывает запись в буфер: в окно она попадет при ближайшем сбросе по таймеру"""
+            def __init__(self, buffer):
                 super().__init__()
-                self.text_widget = text_widget
-                self.parent_tab = parent_tab
+                self.buffer = buffer
             
             def emit(self, record):
                 try:
-                    msg = self.format(record)
-                    level_name = record.levelname
-                    
-                    # Обновляем GUI в главном потоке
-                    self.text_widget.after(0, self._update_text, msg, level_name)
-                    
-                except Exception:
-                    pass
-            
-            def _update_text(self, msg, level_name):
-                try:
-                    self.text_widget.config(state=tk.NORMAL)
-                    self.text_widget.insert(tk.END, msg + '\n', level_name)
-                    self.text_widget.see(tk.END)
-                    self.text_widget.config(state=tk.DISABLED)
+                    self.buffer.emit(record.levelno, record.levelname, self.format(record))
                 except Exception:
                     pass
         
         if self.log_text:
-            self.log_handler = GUILogHandler(self.log_text, self)
+            self.log_handler = GUILogHandler(self.buffer)
             self.log_handler.setLevel(logging.DEBUG)
             formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
             self.log_handler.setFormatter(formatter)
             
-            # Добавляем обработчик к корневому логгеру
-            logging.getLogger().addHandler(self.log_handler)
+            # В режиме очереди обработчик подключается к слушателю, иначе — к корневому логгеру
+            attach_handler(self.log_handler)
+            self._flush_job = self.log_text.after(FLUSH_INTERVAL_MS, self._flush)
     
-
+    def _flush(self):
+        """Переносит накопленные записи в окно одной вставкой"""
+        try:
+            batch = self.buffer.drain()
+            if batch:
+                min_level, query = self._current_filter()
+                visible = [entry for entry in batch if LogBuffer.matches(entry, min_level, query)]
+                if visible:
+                    self._insert(visible, replace=False)
+                self._update_count()
+        except Exception:
+            pass
+        finally:
+            self._flush_job = self.log_text.after(FLUSH_INTERVAL_MS, self._flush)
+    
+    def _current_filter(self):
+        return LEVEL_FILTERS.get(self.level_var.get(), logging.NOTSET), self.search_var.get().strip().lower()
+    
+    def _insert(self, entries: List[LogEntry], replace: bool):
+        # Автопрокрутка только если пользователь и так смотрел в конец лога
+        follow = replace or self.log_text.yview()[1] >= 0.999
+        self.log_text.config(state=tk.NORMAL)
+        if replace:
+            self.log_text.delete(1.0, tk.END)
+            self._shown_lines.clear()
+        args = []
+        for entry in entries:
+            args.extend((entry.text + '\n', entry.levelname))
+            self._shown_lines.append(entry.text.count('\n') + 1)
+        if args:
+            self.log_text.insert(tk.END, *args)
+        # Окно не растет бесконечно: самые старые записи сверху удаляются целиком
+        excess = pop_excess_lines(self._shown_lines)
+        if excess > 0:
+            self.log_text.delete(1.0, f"{excess + 1}.0")
+        if follow:
+            self.log_text.see(tk.END)
+        self.log_text.config(state=tk.DISABLED)
+    
+    def _update_count(self):
+        min_level, query = self._current_filter()
+        if min_level == logging.NOTSET and not query:
+            self.count_var.set(f"Записей: {len(self.buffer.entries)}")
+        else:
+            shown = len(self.buffer.select(min_level, query))
+            self.count_var.set(f"Показано {shown} из {len(self.buffer.entries)}")
     
     def _clear_logs(self):
         """Очистка логов"""
         if self.log_text:
+            self.buffer.clear()
+            self._shown_lines.clear()
             self.log_text.config(state=tk.NORMAL)
             self.log_text.delete(1.0, tk.END)
             self.log_text.config(state=tk.DISABLED)
+            self._update_count()
             logger.info("Логи очищены")
     
     def _save_logs(self):
@@ -130,16 +262,27 @@ class LogsTab:
                 
                 messagebox.showinfo("Успех", f"Логи сохранены в {filename}")
                 logger.info(f"Логи сохранены в файл: {filename}")
-                
+        
         except Exception as e:
             logger.error(f"Ошибка сохранения логов: {e}")
             messagebox.showerror("Ошибка", f"Ошибка сохранения: {e}")
     
     def _refresh_logs(self):
-        """Обновление логов"""
-        logger.info("Обновление логов...")
+        """Перерисовка окна по текущему фильтру уровня и строке поиска"""
+        if not self.log_text:
+            return
+        self.buffer.drain()
+        min_level, query = self._current_filter()
+        self._insert(self.buffer.select(min_level, query), replace=True)
+        self._update_count()
     
     def cleanup(self):
         """Очистка ресурсов"""
+        if self._flush_job:
+            try:
+                self.log_text.after_cancel(self._flush_job)
+            except Exception:
+                pass
+            self._flush_job = None
         if self.log_handler:
-            logging.getLogger().removeHandler(self.log_handler)
\ No newline at end of file
+            detach_handler(self.log_handler)
@@ -1,4 +1,9 @@
-from .link_parser import OzonLinkParser
-from .product_parser import OzonProductParser, ProductInfo
+from ..utils.lazy_import import lazy_exports
+
+__getattr__ = lazy_exports(__name__, {
+    'OzonLinkParser': '.link_parser',
+    'OzonProductParser': '.product_parser',
+    'ProductInfo': '.product_parser',
+})
 
 __all__ = ['OzonLinkParser', 'OzonProductParser', 'ProductInfo']
\ No newline at end of file
@@ -9,7 +9,7 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from typing import Dict, Tuple
 from ..utils.selenium_manager import SeleniumManager
-from ..utils.resource_manager import resource_manager
+from ..utils.resource_manager import get_resource_manager
 
 logger = logging.getLogger(__name__)
 
@@ -42,7 +42,7 @@ class OzonLinkParser:
         try:
             # Регистрируем сессию парсинга ссылок
             if self.user_id:
-                resource_manager.start_parsing_session(self.user_id, 'links', self.max_products)
+                get_resource_manager().start_parsing_session(self.user_id, 'links', self.max_products)
             
             self._create_output_folder()
             self.driver = self.selenium_manager.create_driver()
@@ -63,7 +63,7 @@ class OzonLinkParser:
             self._cleanup()
             # Завершаем сессию парсинга ссылок
             if self.user_id:
-                resource_manager.finish_parsing_session(self.user_id)
+                get_resource_manager().finish_parsing_session(self.user_id)
     
     def _load_page(self) -> bool:
         max_driver_retries = 3  # Максимум 3 драйвера
@@ -4,13 +4,25 @@ import json
 import re
 import time
 import concurrent.futures
-from typing import List, Dict, Optional, Tuple
+from collections import deque
+from typing import Callable, Deque, Iterable, Iterator, List, Dict, Optional, Tuple
 from dataclasses import dataclass
-from ..utils.selenium_manager import SeleniumManager
-from ..utils.resource_manager import resource_manager
+from ..utils import metrics, tracing
+from ..utils.host_resources import AdmissionCancelled, AdmissionTimeout
+from ..utils.logger import ItemLogAggregator
+from ..utils.selenium_manager import PROFILE_API, SeleniumManager
+from ..utils.resource_manager import get_resource_manager
+from ..utils.single_flight import SharedFetchCache
 
 logger = logging.getLogger(__name__)
 
+NOT_PROCESSED_ERROR = "Не обработан"
+
+# Время жизни карточки товара в общем кэше. Кэш нужен, чтобы параллельные пользователи
+# с пересекающимися категориями не грузили одно и то же; цены из него попадают в хранилище
+# и дельты, поэтому TTL — минуты, а не полчаса
+PRODUCT_CACHE_TTL = 2 * 60
+
 @dataclass
 class ProductInfo:
     article: str
@@ -26,55 +38,113 @@ class ProductInfo:
     success: bool = False
     error: str = ""
 
+
+def _notify_result(on_result: Optional[Callable[[ProductInfo], None]], result: ProductInfo):
+    """Передает результат подписчику, не давая его ошибкам сломать воркер"""
+    if on_result is None:
+        return
+    try:
+        on_result(result)
+    except Exception as e:
+        logger.error(f"Ошибка обработчика результата товара {result.article}: {e}")
+
+
+# Общий для всех пользователей кэш товаров: одинаковые артикулы загружаются одним браузером
+product_cache = SharedFetchCache("Товары", PRODUCT_CACHE_TTL, is_cacheable=lambda result: result.success)
+
+
+def extract_article(url: str) -> str:
+    """Артикул из ссылки на товар вида /product/<slug>-<артикул>/ (пустая строка, если не найден)"""
+    match = re.search(r'/product/[^/]+-(\d+)/', url or '')
+    return match.group(1) if match else ""
+
+
+def _take_from(pending: Deque[str]) -> Iterator[str]:
+    """Забирает артикулы из общей очереди воркеров, пока она не опустеет"""
+    while True:
+        try:
+            yield pending.popleft()
+        except IndexError:
+            return
+
+
+def _find_link_image(article: str, product_links: Dict[str, str]) -> str:
+    """Изображение артикула из собранных ссылок (надежнее, чем из API)"""
+    for url, img_url in product_links.items():
+        if article in url:
+            return img_url
+    return ""
+
+
 class ProductWorker:
     
-    def __init__(self, worker_id: int):
+    def __init__(self, worker_id: int, item_log: Optional[ItemLogAggregator] = None):
         self.worker_id = worker_id
-        self.selenium_manager = SeleniumManager()
+        self.item_log = item_log
+        self.selenium_manager = SeleniumManager(profile=PROFILE_API)
         self.driver = None
         logger.info(f"Воркер {worker_id} инициализирован")
     
-    def initialize(self):
+    def initialize(self, stop_event=None):
         try:
-            self.driver = self.selenium_manager.create_driver()
+            self.driver = self.selenium_manager.create_driver(stop_event)
             logger.info(f"Воркер {self.worker_id} готов к работе")
         except Exception as e:
             logger.error(f"Ошибка инициализации воркера {self.worker_id}: {e}")
             raise
     
-    def parse_products(self, articles: List[str], product_links: Dict[str, str]) -> List[ProductInfo]:
+    def parse_products(self, articles: Iterable[str], product_links: Dict[str, str], on_result: Optional[Callable[[ProductInfo], None]] = None, stop_event=None) -> List[ProductInfo]:
         results = []
         
         for article in articles:
+            # stop_event — любой объект с is_set(): остановка пользователем или достигнута цель
+            if stop_event is not None and stop_event.is_set():
+                logger.info(f"Воркер {self.worker_id}: остановка после {len(results)} товаров")
+                break
+            fetched = True
             try:
-                # Находим ссылку и изображение для артикула
-                product_url = ""
-                image_from_links = ""
-                
-                for url, img_url in product_links.items():
-                    if article in url:
-                        product_url = url
-                        image_from_links = img_url
-                        break
+                image_from_links = _find_link_image(article, product_links)
                 
-                result = self._parse_single_product(article)
+                # Тот же артикул у другого пользователя уже грузится или лежит в кэше — страницу не открываем
+                started = time.perf_counter()
+                with tracing.span('product.fetch', article=article):
+                    result, fetched = product_cache.fetch(article, lambda: self._parse_single_product(article))
+                metrics.record_item('product', result.success, fetched, started)
                 
                 # Используем изображение из ссылок вместо API
                 if result.success and image_from_links:
                     result.image_url = image_from_links
                 
                 results.append(result)
+                _notify_result(on_result, result)
                 
+                if self.item_log is not None:
+                    self.item_log.record(result.success, cached=not fetched)
                 if result.success:
-                    logger.info(f"Воркер {self.worker_id}: Товар {article} обработан успешно")
+                    logger.debug(f"Воркер {self.worker_id}: Товар {article} обработан успешно")
                 else:
                     logger.warning(f"Воркер {self.worker_id}: Ошибка товара {article}: {result.error}")
                     
             except Exception as e:
                 logger.error(f"Воркер {self.worker_id}: Критическая ошибка товара {article}: {e}")
-                results.append(ProductInfo(article=article, error=str(e)))
+                metrics.ITEMS.inc(kind='product', result='error')
+                if self.item_log is not None:
+                    self.item_log.record(False)
+                result = ProductInfo(article=article, error=str(e))
+                results.append(result)
+                _notify_result(on_result, result)
             
-            time.sleep(1.5)
+            if fetched:
+                # Разросшийся Chrome пересоздается между запросами
+                try:
+                    if self.selenium_manager.recycle_if_bloated(stop_event):
+                        self.driver = self.selenium_manager.driver
+                except Exception as e:
+                    # Без драйвера продолжать нельзя: отдаем то, что успели, остальное заберут другие воркеры
+                    logger.error(f"Воркер {self.worker_id}: не удалось пересоздать драйвер: {e}, завершаем после {len(results)} товаров")
+                    self.driver = None
+                    break
+                tracing.sleep(1.5, 'throttle.sleep')
         
         return results
     
@@ -89,7 +159,7 @@ class ProductWorker:
                 # Переходим на страницу API
                 if not self.selenium_manager.navigate_to_url(api_url):
                     if attempt < max_retries - 1:
-                        time.sleep(5)
+                        tracing.sleep(5, 'retry.sleep')
                         continue
                     return ProductInfo(article=article, error="Не удалось загрузить страницу API")
                 
@@ -98,17 +168,18 @@ class ProductWorker:
                 
                 if not json_content:
                     if attempt < max_retries - 1:
-                        time.sleep(5)
+                        tracing.sleep(5, 'retry.sleep')
                         continue
                     return ProductInfo(article=article, error="Не получен JSON ответ")
                 
                 # Парсим JSON
-                product_info = self._parse_json_response(article, json_content)
+                with tracing.span('product.parse'):
+                    product_info = self._parse_json_response(article, json_content)
                 
                 if product_info.success:
                     return product_info
                 elif attempt < max_retries - 1:
-                    time.sleep(5)
+                    tracing.sleep(5, 'retry.sleep')
                     continue
                 else:
                     return product_info
@@ -116,7 +187,7 @@ class ProductWorker:
             except Exception as e:
                 if attempt < max_retries - 1:
                     logger.debug(f"Попытка {attempt + 1} неудачна для товара {article}: {e}")
-                    time.sleep(5)
+                    tracing.sleep(5, 'retry.sleep')
                     continue
                 else:
                     return ProductInfo(article=article, error=f"Ошибка парсинга: {str(e)}")
@@ -227,9 +298,15 @@ class OzonProductParser:
         self.max_workers = max_workers
         self.user_id = user_id
         self.results: List[ProductInfo] = []
+        # Успешные товары логируются на DEBUG, а в INFO идет периодическая сводка
+        self.item_log = ItemLogAggregator(logger, f"Товары пользователя {user_id}" if user_id else "Товары")
         logger.info(f"Парсер товаров инициализирован с макс {max_workers} воркерами для пользователя {user_id}")
     
-    def parse_products(self, product_links: Dict[str, str]) -> List[ProductInfo]:
+    def parse_products(self, product_links: Dict[str, str], on_result: Optional[Callable[[ProductInfo], None]] = None, stop_event=None) -> List[ProductInfo]:
+        """
+        Парсит товары; on_result вызывается из потоков воркеров для каждого результата сразу по готовности.
+        Если stop_event выставлен, воркеры прекращают работу, а необработанные товары не попадают в результат
+        """
         # Сохраняем ссылки для использования в воркерах
         self.product_links = product_links
         
@@ -243,33 +320,67 @@ class OzonProductParser:
             logger.error("Не найдено артикулов для парсинга")
             return []
         
+        cached_results = self._take_cached(articles, on_result)
+        if not cached_results:
+            return self._parse_articles(articles, on_result, stop_event)
+        
+        logger.info(f"Из общего кэша взято {len(cached_results)} товаров из {len(articles)}")
+        cached_articles = {result.article for result in cached_results}
+        remaining = [article for article in articles if article not in cached_articles]
+        parsed = self._parse_articles(remaining, on_result, stop_event) if remaining else []
+        results = self._sort_results_by_original_order(cached_results + parsed, articles)
+        if stop_event is not None and stop_event.is_set():
+            return [result for result in results if result.error != NOT_PROCESSED_ERROR]
+        return results
+    
+    def _take_cached(self, articles: List[str], on_result: Optional[Callable[[ProductInfo], None]] = None) -> List[ProductInfo]:
+        """Отдает товары, уже загруженные этим или другим пользователем, без запуска браузера"""
+        results = []
+        for article in articles:
+            result = product_cache.peek(article)
+            if result is None:
+                continue
+            image_from_links = _find_link_image(article, self.product_links)
+            if image_from_links:
+                result.image_url = image_from_links
+            results.append(result)
+            _notify_result(on_result, result)
+        return results
+    
+    def _parse_articles(self, articles: List[str], on_result: Optional[Callable[[ProductInfo], None]] = None, stop_event=None) -> List[ProductInfo]:
         # Получаем количество воркеров от менеджера ресурсов
         if self.user_id:
-            allocated_workers = resource_manager.start_parsing_session(
+            allocated_workers = get_resource_manager().start_parsing_session(
                 self.user_id, 'products', len(articles)
             )
         else:
             allocated_workers = self._calculate_optimal_workers(len(articles))
+        # В режиме цели часть воркеров пользователя отдана пулу продавцов
+        allocated_workers = max(1, min(allocated_workers, self.max_workers))
         
         logger.info(f"Начало парсинга {len(articles)} товаров с {allocated_workers} воркерами для пользователя {self.user_id}")
         
         if allocated_workers == 1:
-            return self._parse_single_worker(articles)
+            results = self._parse_single_worker(articles, on_result, stop_event)
         else:
-            return self._parse_multiple_workers(articles, allocated_workers)
+            results = self._parse_multiple_workers(articles, allocated_workers, on_result, stop_event)
+        self.item_log.flush()
+        
+        if stop_event is not None and stop_event.is_set():
+            return [result for result in results if result.error != NOT_PROCESSED_ERROR]
+        return results
     
     def _extract_article_from_url(self, url: str) -> str:
-        try:
-            match = re.search(r'/product/[^/]+-(\d+)/', url)
-            return match.group(1) if match else ""
-        except Exception:
-            return ""
+        return extract_article(url)
     
-    def _parse_single_worker(self, articles: List[str]) -> List[ProductInfo]:
-        worker = ProductWorker(1)
+    def _parse_single_worker(self, articles: List[str], on_result: Optional[Callable[[ProductInfo], None]] = None, stop_event=None) -> List[ProductInfo]:
+        worker = ProductWorker(1, self.item_log)
         try:
-            worker.initialize()
-            return worker.parse_products(articles, self.product_links)
+            worker.initialize(stop_event)
+            return worker.parse_products(articles, self.product_links, on_result, stop_event)
+        except AdmissionTimeout as e:
+            logger.error(f"Воркер 1: {e}")
+            return []
         finally:
             worker.close()
     
@@ -283,23 +394,21 @@ class OzonProductParser:
         else:
             return min(5, self.max_workers)  # Максимум 5 воркеров
     
-    def _parse_multiple_workers(self, articles: List[str], num_workers: int) -> List[ProductInfo]:
-        chunks = self._distribute_articles(articles, num_workers)
-        
-        # Логируем распределение
-        for i, chunk in enumerate(chunks):
-            if chunk:
-                logger.info(f"Воркер {i+1}: {len(chunk)} товаров")
+    def _parse_multiple_workers(self, articles: List[str], num_workers: int, on_result: Optional[Callable[[ProductInfo], None]] = None, stop_event=None) -> List[ProductInfo]:
+        # Общая очередь вместо фиксированных чанков: если воркер не получил драйвер или потерял его,
+        # его товары забирают остальные
+        num_workers = max(1, min(num_workers, len(articles)))
+        pending: Deque[str] = deque(articles)
+        logger.info(f"{len(articles)} товаров в общей очереди для {num_workers} воркеров")
         
         all_results = []
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix='product-worker') as executor:
             future_to_worker = {}
             
-            for i, chunk in enumerate(chunks):
-                if chunk:
-                    future = executor.submit(self._worker_task_with_retry, i + 1, chunk)
-                    future_to_worker[future] = i + 1
+            for worker_id in range(1, num_workers + 1):
+                future = executor.submit(tracing.propagate(self._worker_task_with_retry), worker_id, pending, on_result, stop_event)
+                future_to_worker[future] = worker_id
             
             for future in concurrent.futures.as_completed(future_to_worker):
                 worker_id = future_to_worker[future]
@@ -312,29 +421,27 @@ class OzonProductParser:
         
         return self._sort_results_by_original_order(all_results, articles)
     
-    def _distribute_articles(self, articles: List[str], num_workers: int) -> List[List[str]]:
-        chunks = [[] for _ in range(num_workers)]
-        
-        for i, article in enumerate(articles):
-            worker_index = i % num_workers
-            chunks[worker_index].append(article)
-        
-        return chunks
-    
-    def _worker_task_with_retry(self, worker_id: int, articles: List[str]) -> List[ProductInfo]:
+    def _worker_task_with_retry(self, worker_id: int, pending: Deque[str], on_result: Optional[Callable[[ProductInfo], None]] = None, stop_event=None) -> List[ProductInfo]:
         max_worker_retries = 3
         for attempt in range(max_worker_retries):
-            worker = ProductWorker(worker_id)
+            worker = ProductWorker(worker_id, self.item_log)
             try:
-                worker.initialize()
-                results = worker.parse_products(articles, self.product_links)
+                worker.initialize(stop_event)
+                results = worker.parse_products(_take_from(pending), self.product_links, on_result, stop_event)
                 return results
+            except AdmissionCancelled:
+                return []
+            except AdmissionTimeout as e:
+                # Товары остаются в общей очереди и достаются воркерам, у которых драйвер есть
+                logger.warning(f"Воркер {worker_id}: {e}, его товары обработают остальные воркеры")
+                return []
             except Exception as e:
                 if "Access blocked" in str(e) and attempt < max_worker_retries - 1:
                     logger.warning(
                         f"Воркер {worker_id} заблокирован, пересоздаем (попытка {attempt + 1}/3)"
                     )
-                    time.sleep(15)     
+                    metrics.WORKER_RESTARTS.inc(kind='product')
+                    tracing.sleep(15, 'worker.restart_sleep')
                     continue
                 else:
                     raise
@@ -345,7 +452,7 @@ class OzonProductParser:
     
     def _sort_results_by_original_order(self, results: List[ProductInfo], original_articles: List[str]) -> List[ProductInfo]:
         result_dict = {result.article: result for result in results}
-        return [result_dict.get(article, ProductInfo(article=article, error="Не обработан")) 
+        return [result_dict.get(article, ProductInfo(article=article, error=NOT_PROCESSED_ERROR)) 
                 for article in original_articles]
     
     def cleanup(self):
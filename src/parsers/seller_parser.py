@@ -4,13 +4,25 @@ import re
 import time
 import concurrent.futures
 import html
-from typing import List, Dict, Optional, Set, Tuple
+import queue
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Dict, Optional, Set, Tuple
 from dataclasses import dataclass
-from ..utils.selenium_manager import SeleniumManager
-from ..utils.resource_manager import resource_manager
+from ..utils import metrics, tracing
+from ..utils.host_resources import AdmissionCancelled, AdmissionTimeout
+from ..utils.logger import ItemLogAggregator
+from ..utils.normalize import parse_count_value, parse_rating_value
+from ..utils.selenium_manager import PROFILE_API, SeleniumManager
+from ..utils.resource_manager import get_resource_manager
+from ..utils.single_flight import SharedFetchCache
 
 logger = logging.getLogger(__name__)
 
+# Время жизни данных продавца в общем кэше: хватает, чтобы объединить одновременные
+# запуски, но метрики в хранилище и дельтах не отстают от сайта больше чем на несколько минут
+SELLER_CACHE_TTL = 5 * 60
+
 
 @dataclass
 class SellerInfo:
@@ -21,43 +33,98 @@ class SellerInfo:
     reviews_count: str = ""
     working_time: str = ""
     average_rating: str = ""
+    # Те же метрики числами, разобранные один раз при парсинге (None — значения нет)
+    orders_count_value: Optional[int] = None
+    reviews_count_value: Optional[int] = None
+    average_rating_value: Optional[float] = None
     success: bool = False
     error: str = ""
 
 
+def _notify_result(on_result: Optional[Callable[[SellerInfo], None]], result: SellerInfo):
+    """Передает результат подписчику, не давая его ошибкам сломать воркер"""
+    if on_result is None:
+        return
+    try:
+        on_result(result)
+    except Exception as e:
+        logger.error(f"Ошибка обработчика результата продавца {result.seller_id}: {e}")
+
+
+def _take_from(pending: Deque[str]) -> Iterator[str]:
+    """Забирает seller_id из общей очереди воркеров, пока она не опустеет"""
+    while True:
+        try:
+            yield pending.popleft()
+        except IndexError:
+            return
+
+
+# Общий для всех пользователей кэш продавцов: один seller_id загружается одним браузером
+seller_cache = SharedFetchCache("Продавцы", SELLER_CACHE_TTL, is_cacheable=lambda result: result.success)
+
+
 class SellerWorker:
-    def __init__(self, worker_id: int):
+    def __init__(self, worker_id: int, item_log: Optional[ItemLogAggregator] = None):
         self.worker_id = worker_id
-        self.selenium_manager = SeleniumManager()
+        self.item_log = item_log
+        self.selenium_manager = SeleniumManager(profile=PROFILE_API)
         self.driver = None
         logger.info(f"Воркер продавцов {worker_id} инициализирован")
 
-    def initialize(self):
+    def initialize(self, stop_event=None):
         try:
-            self.driver = self.selenium_manager.create_driver()
+            self.driver = self.selenium_manager.create_driver(stop_event)
             logger.info(f"Воркер продавцов {self.worker_id} готов к работе")
         except Exception as e:
             logger.error(f"Ошибка инициализации воркера продавцов {self.worker_id}: {e}")
             raise
 
-    def parse_sellers(self, seller_ids: List[str]) -> List[SellerInfo]:
+    def parse_sellers(self, seller_ids: Iterable[str], on_result: Optional[Callable[[SellerInfo], None]] = None, stop_event=None) -> List[SellerInfo]:
         results = []
 
         for seller_id in seller_ids:
+            # stop_event — любой объект с is_set(): остановка пользователем или достигнута цель
+            if stop_event is not None and stop_event.is_set():
+                logger.info(f"Воркер {self.worker_id}: остановка после {len(results)} продавцов")
+                break
+            fetched = True
             try:
-                result = self._parse_single_seller(seller_id)
+                # Тот же продавец у другого пользователя уже грузится или лежит в кэше — страницу не открываем
+                started = time.perf_counter()
+                with tracing.span('seller.fetch', seller_id=seller_id):
+                    result, fetched = seller_cache.fetch(seller_id, lambda: self._parse_single_seller(seller_id))
+                metrics.record_item('seller', result.success, fetched, started)
                 results.append(result)
+                _notify_result(on_result, result)
 
+                if self.item_log is not None:
+                    self.item_log.record(result.success, cached=not fetched)
                 if result.success:
-                    logger.info(f"Воркер {self.worker_id}: Продавец {seller_id} обработан успешно")
+                    logger.debug(f"Воркер {self.worker_id}: Продавец {seller_id} обработан успешно")
                 else:
                     logger.warning(f"Воркер {self.worker_id}: Ошибка продавца {seller_id}: {result.error}")
 
             except Exception as e:
                 logger.error(f"Воркер {self.worker_id}: Критическая ошибка продавца {seller_id}: {e}")
-                results.append(SellerInfo(seller_id=seller_id, error=str(e)))
+                metrics.ITEMS.inc(kind='seller', result='error')
+                if self.item_log is not None:
+                    self.item_log.record(False)
+                result = SellerInfo(seller_id=seller_id, error=str(e))
+                results.append(result)
+                _notify_result(on_result, result)
 
-            time.sleep(1.5)
+            if fetched:
+                # Разросшийся Chrome пересоздается между запросами
+                try:
+                    if self.selenium_manager.recycle_if_bloated(stop_event):
+                        self.driver = self.selenium_manager.driver
+                except Exception as e:
+                    # Без драйвера продолжать нельзя: отдаем то, что успели, остальное заберут другие воркеры
+                    logger.error(f"Воркер продавцов {self.worker_id}: не удалось пересоздать драйвер: {e}, завершаем после {len(results)} продавцов")
+                    self.driver = None
+                    break
+                tracing.sleep(1.5, 'throttle.sleep')
 
         return results
 
@@ -70,7 +137,7 @@ class SellerWorker:
 
                 if not self.selenium_manager.navigate_to_url(api_url):
                     if attempt < max_retries - 1:
-                        time.sleep(5)
+                        tracing.sleep(5, 'retry.sleep')
                         continue
                     return SellerInfo(seller_id=seller_id, error="Не удалось загрузить страницу API")
 
@@ -78,16 +145,17 @@ class SellerWorker:
 
                 if not json_content:
                     if attempt < max_retries - 1:
-                        time.sleep(5)
+                        tracing.sleep(5, 'retry.sleep')
                         continue
                     return SellerInfo(seller_id=seller_id, error="Не получен JSON ответ")
 
-                seller_info = self._parse_json_response(seller_id, json_content)
+                with tracing.span('seller.parse'):
+                    seller_info = self._parse_json_response(seller_id, json_content)
 
                 if seller_info.success:
                     return seller_info
                 elif attempt < max_retries - 1:
-                    time.sleep(5)
+                    tracing.sleep(5, 'retry.sleep')
                     continue
                 else:
                     return seller_info
@@ -95,7 +163,7 @@ class SellerWorker:
             except Exception as e:
                 if attempt < max_retries - 1:
                     logger.debug(f"Попытка {attempt + 1} неудачна для продавца {seller_id}: {e}")
-                    time.sleep(5)
+                    tracing.sleep(5, 'retry.sleep')
                     continue
                 else:
                     return SellerInfo(seller_id=seller_id, error=f"Ошибка парсинга: {str(e)}")
@@ -124,6 +192,9 @@ class SellerWorker:
                         seller_info.working_time = cell_data.get("working_time", "")
                         seller_info.average_rating = cell_data.get("rating", "")
                         seller_info.reviews_count = cell_data.get("reviews", "")
+                        seller_info.orders_count_value = cell_data.get("orders_value")
+                        seller_info.reviews_count_value = cell_data.get("reviews_value")
+                        seller_info.average_rating_value = cell_data.get("rating_value")
                         break
 
             # 3. Success check
@@ -359,12 +430,16 @@ class SellerWorker:
         
         return company
 
-    def _extract_cell_list_data(self, cell_list_data: str) -> Dict[str, str]:
+    def _extract_cell_list_data(self, cell_list_data: str) -> Dict[str, Any]:
+        """Строки для отображения и рядом числовые значения (*_value) заказов, отзывов и рейтинга"""
         result = {
             "orders": "",
             "working_time": "",
             "rating": "",
-            "reviews": ""
+            "reviews": "",
+            "orders_value": None,
+            "rating_value": None,
+            "reviews_value": None,
         }
 
         try:
@@ -395,6 +470,9 @@ class SellerWorker:
                     elif "количество отзывов" in title:
                         result["reviews"] = value
 
+            result["orders_value"] = parse_count_value(result["orders"], default=None)
+            result["reviews_value"] = parse_count_value(result["reviews"], default=None)
+            result["rating_value"] = parse_rating_value(result["rating"])
             return result
         except Exception:
             return result
@@ -405,22 +483,139 @@ class SellerWorker:
         logger.info(f"Воркер продавцов {self.worker_id} закрыт")
 
 
+class SellerStream:
+    """
+    Пул воркеров продавцов на весь запуск: seller_id подаются через submit() по мере появления,
+    драйверы создаются один раз и закрываются в close(). Нужен режиму цели, где продавцы
+    парсятся параллельно с товарами
+    """
+
+    # Как часто свободный воркер проверяет остановку и закрытие потока
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, num_workers: int, item_log: ItemLogAggregator,
+                 on_result: Optional[Callable[[SellerInfo], None]] = None, stop_event=None):
+        self.num_workers = num_workers
+        self.item_log = item_log
+        self.on_result = on_result
+        self.stop_event = stop_event
+        self._queue: 'queue.Queue[str]' = queue.Queue()
+        self._closed = threading.Event()
+        self._results: List[SellerInfo] = []
+        self._results_lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix='seller-stream')
+        self._futures = {
+            self._executor.submit(tracing.propagate(self._run_worker), worker_id): worker_id
+            for worker_id in range(1, num_workers + 1)
+        }
+        logger.info(f"Пул продавцов запущен: {num_workers} воркеров")
+
+    def submit(self, seller_ids: List[str]):
+        for seller_id in seller_ids:
+            self._queue.put(seller_id)
+
+    def close(self) -> List[SellerInfo]:
+        """Дожидается обработки поданных продавцов (или остановки), закрывает воркеры и возвращает результаты"""
+        self._closed.set()
+        for future in concurrent.futures.as_completed(self._futures):
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Ошибка воркера продавцов {self._futures[future]}: {e}")
+        self._executor.shutdown(wait=True)
+        self.item_log.flush()
+        with self._results_lock:
+            results = list(self._results)
+        logger.info(f"Пул продавцов остановлен: обработано {len(results)} продавцов")
+        return results
+
+    def _next_seller_id(self) -> Optional[str]:
+        """Следующий seller_id; None — пора завершаться (остановка или поток закрыт и пуст)"""
+        while True:
+            if self.stop_event is not None and self.stop_event.is_set():
+                return None
+            try:
+                return self._queue.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                if self._closed.is_set() and self._queue.empty():
+                    return None
+
+    def _run_worker(self, worker_id: int):
+        max_worker_retries = 3
+        for attempt in range(max_worker_retries):
+            worker = SellerWorker(worker_id, self.item_log)
+            try:
+                worker.initialize(self.stop_event)
+                while True:
+                    seller_id = self._next_seller_id()
+                    if seller_id is None:
+                        return
+                    results = worker.parse_sellers([seller_id], self.on_result, self.stop_event)
+                    with self._results_lock:
+                        self._results.extend(results)
+                    if worker.driver is None:
+                        # Драйвер не удалось пересоздать: очередь дорабатывают остальные воркеры
+                        return
+            except AdmissionCancelled:
+                return
+            except AdmissionTimeout as e:
+                logger.warning(f"Воркер продавцов {worker_id}: {e}, очередь дорабатывают остальные воркеры пула")
+                return
+            except Exception as e:
+                if "Access blocked" in str(e) and attempt < max_worker_retries - 1:
+                    logger.warning(
+                        f"Воркер продавцов {worker_id} заблокирован, пересоздаем (попытка {attempt + 1}/3)"
+                    )
+                    metrics.WORKER_RESTARTS.inc(kind='seller')
+                    tracing.sleep(15, 'worker.restart_sleep')
+                    continue
+                raise
+            finally:
+                worker.close()
+
+
 class OzonSellerParser:
     def __init__(self, max_workers: int = 5, user_id: str = None):
         self.max_workers = max_workers
         self.user_id = user_id
+        # Успешные продавцы логируются на DEBUG, а в INFO идет периодическая сводка
+        self.item_log = ItemLogAggregator(logger, f"Продавцы пользователя {user_id}" if user_id else "Продавцы")
         logger.info(f"Парсер продавцов инициализирован с макс {max_workers} воркерами для пользователя {user_id}")
 
-    def parse_sellers(self, seller_ids: List[str]) -> List[SellerInfo]:
+    def parse_sellers(self, seller_ids: List[str], on_result: Optional[Callable[[SellerInfo], None]] = None, stop_event=None) -> List[SellerInfo]:
+        """
+        Парсит продавцов; on_result вызывается из потоков воркеров для каждого результата сразу по готовности.
+        Если stop_event выставлен, воркеры прекращают работу после текущего продавца
+        """
         unique_seller_ids = list(set(seller_ids))
 
         if not unique_seller_ids:
             logger.error("Не найдено ID продавцов для парсинга")
             return []
 
+        cached_results = self._take_cached(unique_seller_ids, on_result)
+        if not cached_results:
+            return self._parse_seller_ids(unique_seller_ids, on_result, stop_event)
+
+        logger.info(f"Из общего кэша взято {len(cached_results)} продавцов из {len(unique_seller_ids)}")
+        cached_ids = {result.seller_id for result in cached_results}
+        remaining = [seller_id for seller_id in unique_seller_ids if seller_id not in cached_ids]
+        return cached_results + (self._parse_seller_ids(remaining, on_result, stop_event) if remaining else [])
+
+    def _take_cached(self, seller_ids: List[str], on_result: Optional[Callable[[SellerInfo], None]] = None) -> List[SellerInfo]:
+        """Отдает продавцов, уже загруженных этим или другим пользователем, без запуска браузера"""
+        results = []
+        for seller_id in seller_ids:
+            result = seller_cache.peek(seller_id)
+            if result is not None:
+                results.append(result)
+                _notify_result(on_result, result)
+        return results
+
+    def _parse_seller_ids(self, unique_seller_ids: List[str], on_result: Optional[Callable[[SellerInfo], None]] = None, stop_event=None) -> List[SellerInfo]:
         # Получаем количество воркеров от менеджера ресурсов
         if self.user_id:
-            allocated_workers = resource_manager.start_parsing_session(
+            allocated_workers = get_resource_manager().start_parsing_session(
                 self.user_id, 'sellers', len(unique_seller_ids)
             )
         else:
@@ -429,15 +624,24 @@ class OzonSellerParser:
         logger.info(f"Начало парсинга {len(unique_seller_ids)} продавцов с {allocated_workers} воркерами для пользователя {self.user_id}")
 
         if allocated_workers == 1:
-            return self._parse_single_worker(unique_seller_ids)
+            results = self._parse_single_worker(unique_seller_ids, on_result, stop_event)
         else:
-            return self._parse_multiple_workers(unique_seller_ids, allocated_workers)
+            results = self._parse_multiple_workers(unique_seller_ids, allocated_workers, on_result, stop_event)
+        self.item_log.flush()
+        return results
 
-    def _parse_single_worker(self, seller_ids: List[str]) -> List[SellerInfo]:
-        worker = SellerWorker(1)
+    def open_stream(self, num_workers: int, on_result: Optional[Callable[[SellerInfo], None]] = None, stop_event=None) -> SellerStream:
+        """Запускает пул воркеров, которому seller_id подаются по мере появления (см. SellerStream)"""
+        return SellerStream(max(1, num_workers), self.item_log, on_result, stop_event)
+
+    def _parse_single_worker(self, seller_ids: List[str], on_result: Optional[Callable[[SellerInfo], None]] = None, stop_event=None) -> List[SellerInfo]:
+        worker = SellerWorker(1, self.item_log)
         try:
-            worker.initialize()
-            return worker.parse_sellers(seller_ids)
+            worker.initialize(stop_event)
+            return worker.parse_sellers(seller_ids, on_result, stop_event)
+        except AdmissionTimeout as e:
+            logger.error(f"Воркер продавцов 1: {e}")
+            return []
         finally:
             worker.close()
 
@@ -451,22 +655,21 @@ class OzonSellerParser:
         else:
             return min(5, self.max_workers)  # Максимум 5 воркеров
 
-    def _parse_multiple_workers(self, seller_ids: List[str], num_workers: int) -> List[SellerInfo]:
-        chunks = self._distribute_seller_ids(seller_ids, num_workers)
-
-        for i, chunk in enumerate(chunks):
-            if chunk:
-                logger.info(f"Воркер продавцов {i + 1}: {len(chunk)} продавцов")
+    def _parse_multiple_workers(self, seller_ids: List[str], num_workers: int, on_result: Optional[Callable[[SellerInfo], None]] = None, stop_event=None) -> List[SellerInfo]:
+        # Общая очередь вместо фиксированных чанков: если воркер не получил драйвер или потерял его,
+        # его продавцов забирают остальные
+        num_workers = max(1, min(num_workers, len(seller_ids)))
+        pending: Deque[str] = deque(seller_ids)
+        logger.info(f"{len(seller_ids)} продавцов в общей очереди для {num_workers} воркеров")
 
         all_results = []
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix='seller-worker') as executor:
             future_to_worker = {}
 
-            for i, chunk in enumerate(chunks):
-                if chunk:
-                    future = executor.submit(self._worker_task_with_retry, i + 1, chunk)
-                    future_to_worker[future] = i + 1
+            for worker_id in range(1, num_workers + 1):
+                future = executor.submit(tracing.propagate(self._worker_task_with_retry), worker_id, pending, on_result, stop_event)
+                future_to_worker[future] = worker_id
 
             for future in concurrent.futures.as_completed(future_to_worker):
                 worker_id = future_to_worker[future]
@@ -479,29 +682,27 @@ class OzonSellerParser:
 
         return all_results
 
-    def _distribute_seller_ids(self, seller_ids: List[str], num_workers: int) -> List[List[str]]:
-        chunks = [[] for _ in range(num_workers)]
-
-        for i, seller_id in enumerate(seller_ids):
-            worker_index = i % num_workers
-            chunks[worker_index].append(seller_id)
-
-        return chunks
-
-    def _worker_task_with_retry(self, worker_id: int, seller_ids: List[str]) -> List[SellerInfo]:
+    def _worker_task_with_retry(self, worker_id: int, pending: Deque[str], on_result: Optional[Callable[[SellerInfo], None]] = None, stop_event=None) -> List[SellerInfo]:
         max_worker_retries = 3
         for attempt in range(max_worker_retries):
-            worker = SellerWorker(worker_id)
+            worker = SellerWorker(worker_id, self.item_log)
             try:
-                worker.initialize()
-                results = worker.parse_sellers(seller_ids)
+                worker.initialize(stop_event)
+                results = worker.parse_sellers(_take_from(pending), on_result, stop_event)
                 return results
+            except AdmissionCancelled:
+                return []
+            except AdmissionTimeout as e:
+                # Продавцы остаются в общей очереди и достаются воркерам, у которых драйвер есть
+                logger.warning(f"Воркер продавцов {worker_id}: {e}, его продавцов обработают остальные воркеры")
+                return []
             except Exception as e:
                 if "Access blocked" in str(e) and attempt < max_worker_retries - 1:
                     logger.warning(
                         f"Воркер продавцов {worker_id} заблокирован, пересоздаем (попытка {attempt + 1}/3)"
                     )
-                    time.sleep(15)
+                    metrics.WORKER_RESTARTS.inc(kind='seller')
+                    tracing.sleep(15, 'worker.restart_sleep')
                     continue
                 else:
                     raise
@@ -1,3 +1,5 @@
-from .bot_manager import TelegramBotManager
+from ..utils.lazy_import import lazy_exports
+
+__getattr__ = lazy_exports(__name__, {'TelegramBotManager': '.bot_manager'})
 
 __all__ = ['TelegramBotManager']
\ No newline at end of file
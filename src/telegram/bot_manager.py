@@ -1,13 +1,20 @@
 import asyncio
+import functools
+import html
 import logging
 import threading
-from typing import Optional, TYPE_CHECKING, Dict
+import time
+from typing import Callable, Optional, TYPE_CHECKING, Dict
 from aiogram import Bot, Dispatcher
 from aiogram.filters import Command, StateFilter
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, ReplyKeyboardMarkup, KeyboardButton, FSInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from ..utils.database import Database
+from ..utils.config_loader import WebhookConfig
+from ..utils.export import EXPORT_FORMATS, EXPORT_COMPRESSIONS, is_parquet_available
+from .delivery import get_delivery_service, set_default_bot
+from .loop_monitor import LoopLagMonitor
 
 if TYPE_CHECKING:
     from ..core.app_manager import AppManager
@@ -21,6 +28,9 @@ class ParsingStates(StatesGroup):
     waiting_for_default_count = State()
     waiting_for_min_orders = State()
     waiting_for_max_orders = State()
+    waiting_for_target_sellers = State()
+    waiting_for_watch_url = State()
+    waiting_for_watch_interval = State()
 
 FIELD_NAMES = {
     'seller_id': 'ID продавца',
@@ -34,34 +44,84 @@ FIELD_NAMES = {
     'seller_link': 'Ссылка на продавца',
 }
 
+FORMAT_NAMES = {
+    'excel': 'Excel (.xlsx)',
+    'json': 'JSON',
+    'csv': 'CSV',
+    'jsonl': 'JSON Lines',
+    'parquet': 'Parquet',
+}
+
+COMPRESSION_NAMES = {
+    'none': 'без сжатия',
+    'gzip': 'gzip',
+    'zstd': 'zstd',
+}
+
 class TelegramBotManager:
     
-    def __init__(self, bot_token: str, user_ids: list, app_manager: 'AppManager'):
+    def __init__(
+        self,
+        bot_token: str,
+        user_ids: list,
+        app_manager: 'AppManager',
+        webhook: Optional[WebhookConfig] = None,
+        on_state_change: Optional[Callable[[bool], None]] = None,
+    ):
         self.bot_token = bot_token
         self.user_ids = user_ids  # Список разрешенных User ID
         self.app_manager = app_manager
         self.bot = Bot(token=bot_token)
         self.dp = Dispatcher()
-        self.is_running = False
+        # Вызывается при смене is_running (в том числе при падении потока бота)
+        self.on_state_change = on_state_change
+        self._is_running = False
         self.bot_thread: Optional[threading.Thread] = None
+        # None — long polling, иначе входящие обновления принимает локальный HTTP-сервер
+        self.webhook = webhook
+        self.webhook_port: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._shutdown_event: Optional[asyncio.Event] = None
+        # Выставляется, когда бот готов принимать обновления или запуск завершился ошибкой
+        self._ready = threading.Event()
         self.db = Database()
         self.user_data: Dict[str, dict] = {}
         self.parsing_user_id = None
+        self.loop_monitor = LoopLagMonitor()
+        set_default_bot(bot_token, user_ids)
         
         self._register_handlers()
 
+    @property
+    def is_running(self) -> bool:
+        return self._is_running
+    
+    @is_running.setter
+    def is_running(self, value: bool):
+        changed = self._is_running != value
+        self._is_running = value
+        if changed and self.on_state_change is not None:
+            try:
+                self.on_state_change(value)
+            except Exception as e:
+                logger.debug(f"Ошибка обработчика состояния бота: {e}")
     
-    def start(self) -> bool:
+    def start(self, timeout: float = 30) -> bool:
         try:
             # Запускаем бот в отдельном потоке
-            self.bot_thread = threading.Thread(target=self._run_bot, daemon=True)
+            self._ready.clear()
+            self.bot_thread = threading.Thread(target=self._run_bot, name="telegram-bot", daemon=True)
             self.bot_thread.start()
             
-            # Даем боту время на инициализацию
-            import time
-            time.sleep(2)
+            # Ждем сигнала готовности вместо фиксированной паузы
+            if not self._ready.wait(timeout):
+                logger.error("Telegram бот не запустился вовремя")
+                return False
             
             if self.is_running:
+                # Наблюдения за категориями запускаются вместе с ботом: результаты уходят в Telegram
+                if self.app_manager is not None:
+                    self.app_manager.start_watch_scheduler()
                 # Создаем отдельный поток для отправки стартового сообщения
                 notification_thread = threading.Thread(
                     target=self._send_startup_notification,
@@ -77,29 +137,14 @@ class TelegramBotManager:
             return False
 
     def _send_startup_notification(self):
-        """Отправляет уведомление о запуске в отдельном потоке"""
+        """Ставит уведомление о запуске в очередь сервиса доставки"""
         try:
-            # Создаем новый бот для отправки сообщения
-            # Это избегает проблем с контекстом asyncio
-            temp_bot = Bot(token=self.bot_token)
-            
-            async def send_and_close():
-                try:
-                    # Отправляем уведомление всем разрешенным пользователям
-                    for user_id in self.user_ids:
-                        await temp_bot.send_message(chat_id=user_id, 
-                                                text="🤖 Ozon Parser бот запущен и готов к работе!")
-                finally:
-                    await temp_bot.session.close()
-            
-            # Запускаем в новом цикле событий
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(send_and_close())
-            finally:
-                loop.close()
-            
+            delivery = get_delivery_service(self.bot_token)
+            if not delivery:
+                return
+            # Отправляем уведомление всем разрешенным пользователям
+            for user_id in self.user_ids:
+                delivery.submit_message(user_id, "🤖 Ozon Parser бот запущен и готов к работе!")
         except Exception as e:
             logger.error(f"Ошибка отправки уведомления о запуске: {e}")
     
@@ -114,17 +159,15 @@ class TelegramBotManager:
             # Создаем и устанавливаем новый event loop для этого потока
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
+            self._loop = loop
             
-            self.is_running = True
-            
-            # Запускаем polling в этом loop с отключенной обработкой сигналов
-            # handle_signals=False критически важен для запуска в отдельном потоке
-            loop.run_until_complete(self.dp.start_polling(self.bot, handle_signals=False))
+            loop.run_until_complete(self._serve())
             
         except Exception as e:
             logger.error(f"Ошибка работы Telegram бота: {e}")
-            self.is_running = False
         finally:
+            self.is_running = False
+            self._ready.set()
             # Закрываем loop при выходе
             if loop and not loop.is_closed():
                 try:
@@ -132,7 +175,77 @@ class TelegramBotManager:
                 except Exception as e:
                     logger.error(f"Ошибка закрытия event loop: {e}")
     
+    async def _serve(self):
+        self._shutdown_event = asyncio.Event()
+        monitor_task = asyncio.create_task(self.loop_monitor.run())
+        try:
+            if self.webhook:
+                await self._serve_webhook()
+            else:
+                # Запускаем polling в этом loop с отключенной обработкой сигналов
+                # handle_signals=False критически важен для запуска в отдельном потоке
+                await self.dp.start_polling(self.bot, handle_signals=False)
+        finally:
+            monitor_task.cancel()
+    
+    async def _on_dispatcher_startup(self):
+        # В webhook-режиме готовность выставляется после старта HTTP-сервера
+        if self.webhook is None:
+            self.is_running = True
+            self._ready.set()
+    
+    async def _serve_webhook(self):
+        """Принимает обновления через локальный aiohttp-сервер до сигнала остановки"""
+        from aiohttp import web
+        from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+        
+        config = self.webhook
+        app = web.Application()
+        SimpleRequestHandler(
+            dispatcher=self.dp, bot=self.bot, secret_token=config.secret or None
+        ).register(app, path=config.path)
+        setup_application(app, self.dp, bot=self.bot)
+        
+        runner = web.AppRunner(app)
+        await runner.setup()
+        try:
+            site = web.TCPSite(runner, config.host, config.port)
+            await site.start()
+            self.webhook_port = runner.addresses[0][1]
+            
+            if config.url:
+                await self.bot.set_webhook(config.url.rstrip('/') + config.path, secret_token=config.secret or None)
+            logger.info(f"Webhook сервер слушает http://{config.host}:{self.webhook_port}{config.path}")
+            
+            self.is_running = True
+            self._ready.set()
+            await self._shutdown_event.wait()
+        finally:
+            if config.url:
+                try:
+                    await self.bot.delete_webhook()
+                except Exception as e:
+                    logger.error(f"Ошибка удаления webhook: {e}")
+            await runner.cleanup()
+            await self.bot.session.close()
+            logger.info("Webhook сервер остановлен")
+    
+    async def _run_blocking(self, func, *args, **kwargs):
+        """Выполняет синхронный вызов (БД, AppManager) в пуле потоков, не блокируя event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+    
+    async def _get_user_settings(self, user_id: str) -> dict:
+        return await self._run_blocking(self.db.get_user_settings, user_id)
+    
+    async def _save_user_settings(self, user_id: str, *args, **kwargs):
+        return await self._run_blocking(self.db.save_user_settings, user_id, *args, **kwargs)
+    
+    def get_loop_lag_stats(self) -> dict:
+        return self.loop_monitor.stats()
+    
     def _register_handlers(self):
+        self.dp.startup.register(self._on_dispatcher_startup)
         self.dp.message.register(self._cmd_start, Command('start'))
         self.dp.message.register(self._cmd_status, Command('status'))
         self.dp.message.register(self._cmd_settings, Command('settings'))
@@ -144,6 +257,9 @@ class TelegramBotManager:
         self.dp.message.register(self._handle_default_count_input, StateFilter(ParsingStates.waiting_for_default_count))
         self.dp.message.register(self._handle_min_orders_input, StateFilter(ParsingStates.waiting_for_min_orders))
         self.dp.message.register(self._handle_max_orders_input, StateFilter(ParsingStates.waiting_for_max_orders))
+        self.dp.message.register(self._handle_target_sellers_input, StateFilter(ParsingStates.waiting_for_target_sellers))
+        self.dp.message.register(self._handle_watch_url_input, StateFilter(ParsingStates.waiting_for_watch_url))
+        self.dp.message.register(self._handle_watch_interval_input, StateFilter(ParsingStates.waiting_for_watch_interval))
         self.dp.message.register(self._handle_message)
     
     async def _cmd_start(self, message: Message, state: FSMContext = None):
@@ -156,7 +272,7 @@ class TelegramBotManager:
         keyboard = ReplyKeyboardMarkup(keyboard=[
             [KeyboardButton(text="🚀 Начать парсинг"), KeyboardButton(text="📊 Статус")],
             [KeyboardButton(text="🔧 Ресурсы"), KeyboardButton(text="⚙️ Настройки")],
-            [KeyboardButton(text="❓ Помощь")]
+            [KeyboardButton(text="👁 Мониторинг"), KeyboardButton(text="❓ Помощь")]
         ], resize_keyboard=True)
         
         welcome_text = (
@@ -173,30 +289,32 @@ class TelegramBotManager:
         if not self._is_authorized_user(message_or_query):
             return
         
-        status = self.app_manager.get_status()
+        status = await self._run_blocking(self.app_manager.get_status)
         
         status_text = f"📊 <b>Статус парсера</b>\n\n"
         status_text += f"🔄 Парсинг: {'🟢 Активен' if status['is_running'] else '🔴 Остановлен'}\n"
         status_text += f"👥 Активных пользователей: {status.get('active_users_count', 0)}\n"
         status_text += f"🤖 Telegram бот: 🟢 Активен\n"
+        lag = self.get_loop_lag_stats()
+        status_text += f"⏱ Задержка бота: {lag['avg_ms']:.0f} мс (p95 {lag['p95_ms']:.0f}, макс {lag['max_ms']:.0f})\n"
         status_text += f"📦 Макс. товаров: {status['settings']['max_products']}\n"
         status_text += f"⚙️ Макс. воркеров: {status['settings']['max_workers']}\n"
         
         # Показываем информацию о ресурсах
         if status.get('total_active_users', 0) > 0:
             status_text += f"\n🔧 <b>Ресурсы:</b>\n"
-            status_text += f"⚙️ Используется воркеров: {status.get('total_allocated_workers', 0)}/10\n"
+            status_text += f"⚙️ Используется воркеров: {status.get('total_allocated_workers', 0)}/{status.get('effective_max_workers', 0)}\n"
         
         # Показываем результаты для текущего пользователя
         user_id = str(message_or_query.from_user.id)
-        user_results = self.app_manager.get_user_results(user_id)
+        user_results = await self._run_blocking(self.app_manager.get_user_results, user_id)
         
         if user_results:
             status_text += f"\n📈 <b>Ваши результаты:</b>\n"
             status_text += f"✅ Успешно: {user_results.get('successful_products', 0)}/{user_results.get('total_products', 0)}"
-        elif status['last_results']:
+        elif self.app_manager.last_results:
             # Fallback для совместимости
-            results = status['last_results']
+            results = self.app_manager.last_results
             status_text += f"\n📈 <b>Последний результат:</b>\n"
             status_text += f"✅ Успешно: {results.get('successful_products', 0)}/{results.get('total_products', 0)}"
         
@@ -212,16 +330,16 @@ class TelegramBotManager:
         
         try:
             from ..utils.resource_manager import resource_manager
-            status = resource_manager.get_status()
+            status = await self._run_blocking(resource_manager.get_status)
             
             status_text = "🔧 <b>Статус ресурсов</b>\n\n"
             
             if status['total_active_users'] == 0:
                 status_text += "😴 Нет активных пользователей\n"
-                status_text += f"📊 Доступно воркеров: {resource_manager.MAX_TOTAL_WORKERS}\n"
+                status_text += f"📊 Доступно воркеров: {status['effective_max_workers']}\n"
             else:
                 status_text += f"👥 Активных пользователей: {status['total_active_users']}\n"
-                status_text += f"⚙️ Используется воркеров: {status['total_allocated_workers']}/{resource_manager.MAX_TOTAL_WORKERS}\n\n"
+                status_text += f"⚙️ Используется воркеров: {status['total_allocated_workers']}/{status['effective_max_workers']}\n\n"
                 
                 for user_id, session_info in status['sessions'].items():
                     user_display = f"User_{user_id[-4:]}" if len(user_id) > 4 else user_id
@@ -232,7 +350,14 @@ class TelegramBotManager:
                     status_text += f"   ⏱ Время: {session_info['duration']}\n\n"
             
             status_text += f"\n📋 <b>Лимиты:</b>\n"
-            status_text += f"• Макс воркеров всего: {resource_manager.MAX_TOTAL_WORKERS}\n"
+            if status['admission'] == 'psutil':
+                status_text += (
+                    f"• Макс воркеров сейчас: {status['effective_max_workers']} "
+                    f"(свободно {status['host_available_mb']} МБ, CPU {status['host_cpu_percent']}%, "
+                    f"Chrome ~{status['driver_rss_mb']} МБ)\n"
+                )
+            else:
+                status_text += f"• Макс воркеров всего: {resource_manager.MAX_TOTAL_WORKERS}\n"
             status_text += f"• Макс на пользователя: {resource_manager.MAX_WORKERS_PER_USER}\n"
             status_text += f"• Мин на пользователя: {resource_manager.MIN_WORKERS_PER_USER}\n"
             
@@ -249,7 +374,7 @@ class TelegramBotManager:
             return
         
         user_id = str(message_or_query.from_user.id)
-        settings = self.db.get_user_settings(user_id)
+        settings = await self._get_user_settings(user_id)
         default_count = settings.get('default_product_count', 500)
         min_orders = settings.get('min_seller_orders', 0)
         max_orders = settings.get('max_seller_orders', 0)
@@ -258,12 +383,23 @@ class TelegramBotManager:
         text += f"📊 Количество товаров по умолчанию: {default_count}\n\n"
         max_orders_text = "∞" if not max_orders else str(max_orders)
         text += f"🧮 Заказы продавца (фильтр): от {min_orders} до {max_orders_text}\n\n"
+        target_sellers = settings.get('target_sellers', 0)
+        target_text = f"{target_sellers} продавцов" if target_sellers else "выключена"
+        text += f"🎯 Цель (остановка после N подходящих продавцов): {target_text}\n\n"
+        delta_text = "только новые и изменившиеся продавцы" if settings.get('delta_mode') else "все продавцы"
+        text += f"🔁 Выгрузка: {delta_text}\n\n"
+        formats_text = ", ".join(FORMAT_NAMES.get(f, f) for f in settings.get('export_formats', []))
+        compression_text = COMPRESSION_NAMES.get(settings.get('export_compression', 'none'), 'без сжатия')
+        text += f"📦 Форматы экспорта: {formats_text} ({compression_text})\n\n"
         
         keyboard = [
             [InlineKeyboardButton(text="🔢 Изменить количество товаров", callback_data="change_default_count")],
             [InlineKeyboardButton(text="🧮 Заказы: ОТ", callback_data="change_min_orders")],
             [InlineKeyboardButton(text="🧮 Заказы: ДО", callback_data="change_max_orders")],
+            [InlineKeyboardButton(text="🎯 Цель по продавцам", callback_data="change_target_sellers")],
+            [InlineKeyboardButton(text="🔁 Дельта-режим: вкл/выкл", callback_data="toggle_delta_mode")],
             [InlineKeyboardButton(text="📝 Настроить поля экспорта", callback_data="configure_fields")],
+            [InlineKeyboardButton(text="📦 Форматы экспорта", callback_data="configure_formats")],
             [InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu")]
         ]
         
@@ -294,6 +430,8 @@ class TelegramBotManager:
             "<code>https://ozon.ru/category/sistemnye-bloki-15704/</code>\n\n"
             "<b>Настройки:</b>\n"
             "В настройках можно выбрать какие поля экспортировать в Excel файл.\n\n"
+            "<b>Мониторинг:</b>\n"
+            "В '👁 Мониторинг' добавьте категорию и интервал — бот будет присылать только новые товары.\n\n"
             "Бот будет уведомлять вас о ходе парсинга 📊"
         )
         
@@ -330,7 +468,7 @@ class TelegramBotManager:
             await query.message.edit_text("❌ Парсинг отменен")
             await query.message.reply("Выберите действие:", reply_markup=keyboard)
         elif data == "stop_parsing":
-            self.app_manager.stop_parsing()
+            await self._run_blocking(self.app_manager.stop_parsing)
             keyboard = ReplyKeyboardMarkup(keyboard=[
                 [KeyboardButton(text="🏠 Главное меню")]
             ], resize_keyboard=True)
@@ -339,11 +477,17 @@ class TelegramBotManager:
         elif data == "skip_count":
             user_id = str(query.from_user.id)
             if user_id in self.user_data and 'url' in self.user_data[user_id]:
-                settings = self.db.get_user_settings(user_id)
+                settings = await self._get_user_settings(user_id)
                 default_count = settings.get('default_product_count', 500)
                 await self._start_parsing_with_count(query, self.user_data[user_id]['url'], default_count)
         elif data.startswith("toggle_field_"):
             await self._toggle_field(query, data.replace("toggle_field_", ""), state)
+        elif data.startswith("toggle_format_"):
+            await self._toggle_format(query, data.replace("toggle_format_", ""), state)
+        elif data == "cycle_compression":
+            await self._cycle_compression(query, state)
+        elif data == "configure_formats":
+            await self._configure_formats(query, state)
         elif data == "save_settings":
             await self._save_settings(query, state)
         elif data == "change_default_count":
@@ -354,6 +498,14 @@ class TelegramBotManager:
             await self._change_min_orders(query, state)
         elif data == "change_max_orders":
             await self._change_max_orders(query, state)
+        elif data == "change_target_sellers":
+            await self._change_target_sellers(query, state)
+        elif data == "toggle_delta_mode":
+            await self._toggle_delta_mode(query, state)
+        elif data == "add_watch":
+            await self._add_watch(query, state)
+        elif data.startswith("remove_watch_"):
+            await self._remove_watch(query, data.replace("remove_watch_", ""))
         elif data == "settings":
             await self._show_settings(query, state)
         
@@ -395,7 +547,7 @@ class TelegramBotManager:
             self.user_data[user_id] = {}
         self.user_data[user_id]['url'] = message.text.strip()
         
-        settings = self.db.get_user_settings(user_id)
+        settings = await self._get_user_settings(user_id)
         default_count = settings.get('default_product_count', 500)
         
         keyboard = ReplyKeyboardMarkup(keyboard=[
@@ -416,7 +568,7 @@ class TelegramBotManager:
             return
         
         user_id = str(message.from_user.id)
-        settings = self.db.get_user_settings(user_id)
+        settings = await self._get_user_settings(user_id)
         default_count = settings.get('default_product_count', 500)
         
         if message.text == f"⏭️ Скип (по умолчанию {default_count})":
@@ -459,13 +611,21 @@ class TelegramBotManager:
         self.parsing_user_id = str(message_or_query.from_user.id)
         
         # Получаем выбранные поля пользователя
-        user_settings = self.db.get_user_settings(self.parsing_user_id)
+        user_settings = await self._get_user_settings(self.parsing_user_id)
         selected_fields = user_settings.get('selected_fields', [])
         min_orders = int(user_settings.get('min_seller_orders', 0) or 0)
         max_orders = int(user_settings.get('max_seller_orders', 0) or 0)
+        export_formats = user_settings.get('export_formats')
+        export_compression = user_settings.get('export_compression', 'none')
+        target_sellers = int(user_settings.get('target_sellers', 0) or 0)
+        delta_mode = bool(user_settings.get('delta_mode', False))
         
         def start_parsing():
-            success = self.app_manager.start_parsing(url, selected_fields, self.parsing_user_id, min_orders, max_orders)
+            success = self.app_manager.start_parsing(
+                url, selected_fields, self.parsing_user_id, min_orders, max_orders,
+                export_formats=export_formats, export_compression=export_compression,
+                target_sellers=target_sellers, delta_mode=delta_mode,
+            )
             if not success:
                 self.send_message_sync("❌ Ошибка запуска парсинга")
         
@@ -473,7 +633,7 @@ class TelegramBotManager:
     
     async def _toggle_field(self, query: CallbackQuery, field_key: str, state: FSMContext):
         user_id = str(query.from_user.id)
-        settings = self.db.get_user_settings(user_id)
+        settings = await self._get_user_settings(user_id)
         selected_fields = settings['selected_fields']
         field_order = settings['field_order']
         default_count = settings.get('default_product_count', 500)
@@ -489,9 +649,77 @@ class TelegramBotManager:
             selected_fields.append(field_key)
             field_order.append(field_key)
         
-        self.db.save_user_settings(user_id, selected_fields, field_order, default_count, min_orders, max_orders)
+        await self._save_user_settings(user_id, selected_fields, field_order, default_count, min_orders, max_orders)
         await self._configure_fields(query, state)
     
+    async def _toggle_format(self, query: CallbackQuery, fmt: str, state: FSMContext):
+        if fmt not in EXPORT_FORMATS:
+            return
+        user_id = str(query.from_user.id)
+        settings = await self._get_user_settings(user_id)
+        export_formats = list(settings.get('export_formats', []))
+        
+        if fmt in export_formats:
+            # Хотя бы один формат должен остаться
+            if len(export_formats) > 1:
+                export_formats.remove(fmt)
+        else:
+            export_formats.append(fmt)
+        
+        await self._save_user_settings(
+            user_id,
+            settings['selected_fields'],
+            settings['field_order'],
+            settings.get('default_product_count', 500),
+            settings.get('min_seller_orders', 0),
+            settings.get('max_seller_orders', 0),
+            export_formats=export_formats,
+        )
+        await self._configure_formats(query, state)
+    
+    async def _cycle_compression(self, query: CallbackQuery, state: FSMContext):
+        user_id = str(query.from_user.id)
+        settings = await self._get_user_settings(user_id)
+        current = settings.get('export_compression', 'none')
+        next_compression = EXPORT_COMPRESSIONS[(EXPORT_COMPRESSIONS.index(current) + 1) % len(EXPORT_COMPRESSIONS)]
+        
+        await self._save_user_settings(
+            user_id,
+            settings['selected_fields'],
+            settings['field_order'],
+            settings.get('default_product_count', 500),
+            settings.get('min_seller_orders', 0),
+            settings.get('max_seller_orders', 0),
+            export_compression=next_compression,
+        )
+        await self._configure_formats(query, state)
+    
+    async def _configure_formats(self, query: CallbackQuery, state: FSMContext):
+        user_id = str(query.from_user.id)
+        settings = await self._get_user_settings(user_id)
+        export_formats = settings.get('export_formats', [])
+        compression = settings.get('export_compression', 'none')
+        
+        text = "📦 <b>Форматы экспорта</b>\n\n"
+        text += "Выберите, в каких форматах присылать результаты.\n"
+        text += "Сжатие применяется к CSV и JSON Lines, для Parquet — как кодек внутри файла.\n"
+        if not is_parquet_available():
+            text += "\n⚠️ Parquet недоступен: не установлен pyarrow.\n"
+        
+        keyboard = []
+        for fmt in EXPORT_FORMATS:
+            mark = "✅" if fmt in export_formats else "⬜"
+            keyboard.append([InlineKeyboardButton(text=f"{mark} {FORMAT_NAMES.get(fmt, fmt)}", callback_data=f"toggle_format_{fmt}")])
+        
+        keyboard.extend([
+            [InlineKeyboardButton(text=f"🗜 Сжатие: {COMPRESSION_NAMES.get(compression, compression)}", callback_data="cycle_compression")],
+            [InlineKeyboardButton(text="💾 Сохранить", callback_data="save_settings")],
+            [InlineKeyboardButton(text="🔙 Назад", callback_data="settings")]
+        ])
+        
+        reply_markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
+        await query.message.edit_text(text, reply_markup=reply_markup, parse_mode="HTML")
+    
     async def _save_settings(self, query: CallbackQuery, state: FSMContext):
         keyboard = ReplyKeyboardMarkup(keyboard=[
             [KeyboardButton(text="🏠 Главное меню")]
@@ -517,12 +745,14 @@ class TelegramBotManager:
             await self._show_settings(message, state)
         elif text == "❓ Помощь":
             await self._show_help(message)
+        elif text == "👁 Мониторинг":
+            await self._show_watches(message)
         elif text == "🏠 Главное меню":
             await self._cmd_start(message)
         elif text == "🔄 Обновить":
             await self._show_status(message)
         elif text == "❌ Завершить":
-            self.app_manager.stop_parsing()
+            await self._run_blocking(self.app_manager.stop_parsing)
             await message.reply("⏹️ Парсинг остановлен")
             await self._cmd_start(message)
         elif self._is_ozon_category_url(text):
@@ -534,7 +764,7 @@ class TelegramBotManager:
             self.user_data[user_id]['waiting_for_count'] = True
             
             user_id = str(message.from_user.id)
-            settings = self.db.get_user_settings(user_id)
+            settings = await self._get_user_settings(user_id)
             default_count = settings.get('default_product_count', 500)
             
             keyboard = ReplyKeyboardMarkup(keyboard=[
@@ -569,7 +799,7 @@ class TelegramBotManager:
                 url = self.user_data[user_id].get('url')
                 if url:
                     self.user_data[user_id]['waiting_for_count'] = False
-                    settings = self.db.get_user_settings(user_id)
+                    settings = await self._get_user_settings(user_id)
                     default_count = settings.get('default_product_count', 500)
                     await self._start_parsing_with_count(message, url, default_count)
                     return
@@ -630,35 +860,15 @@ class TelegramBotManager:
             return False
     
     def send_message_sync(self, text: str) -> bool:
-        """Thread-safe метод для отправки сообщений из других потоков"""
+        """Thread-safe метод для отправки сообщений из других потоков (не ждет доставки)"""
         try:
             if not self.is_running:
                 return False
             
-            # Создаем новый event loop для этого потока
-            import asyncio
-            
-            async def _send():
-                success = True
-                for user_id in self.user_ids:
-                    try:
-                        # Создаем новый бот для отправки сообщения
-                        temp_bot = Bot(token=self.bot_token)
-                        await temp_bot.send_message(chat_id=user_id, text=text)
-                        await temp_bot.session.close()
-                    except Exception as e:
-                        logger.error(f"Ошибка отправки сообщения пользователю {user_id}: {e}")
-                        success = False
-                return success
-            
-            # Запускаем в новом event loop
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                result = loop.run_until_complete(_send())
-                return result
-            finally:
-                loop.close()
+            delivery = get_delivery_service(self.bot_token)
+            if not delivery:
+                return False
+            return all(delivery.submit_message(user_id, text) for user_id in self.user_ids)
                 
         except Exception as e:
             logger.error(f"Ошибка синхронной отправки сообщения: {e}")
@@ -693,6 +903,125 @@ class TelegramBotManager:
         await query.message.reply("Или нажмите кнопку:", reply_markup=keyboard)
         await state.set_state(ParsingStates.waiting_for_max_orders)
     
+    async def _change_target_sellers(self, query: CallbackQuery, state: FSMContext):
+        keyboard = ReplyKeyboardMarkup(keyboard=[
+            [KeyboardButton(text="❌ Отмена")]
+        ], resize_keyboard=True)
+        
+        await query.message.edit_text(
+            "🎯 Введите, сколько продавцов, прошедших фильтр по заказам, нужно найти (0 — отключить).\n"
+            "Парсинг остановится, как только цель будет достигнута; количество товаров станет верхней границей."
+        )
+        await query.message.reply("Или нажмите кнопку:", reply_markup=keyboard)
+        await state.set_state(ParsingStates.waiting_for_target_sellers)
+    
+    async def _show_watches(self, message_or_query):
+        if not self._is_authorized_user(message_or_query):
+            return
+        
+        user_id = str(message_or_query.from_user.id)
+        watches = await self._run_blocking(self.app_manager.list_watches, user_id)
+        
+        text = "👁 <b>Мониторинг категорий</b>\n\n"
+        text += "Категория проверяется по расписанию; парсятся только товары, появившиеся с прошлой проверки.\n\n"
+        keyboard = []
+        if not watches:
+            text += "Наблюдений пока нет."
+        for watch in watches:
+            hours = watch.interval_minutes / 60
+            next_run = time.strftime("%d.%m %H:%M", time.localtime(watch.next_run_at))
+            text += f"#{watch.watch_id} каждые {hours:g} ч, следующая проверка {next_run}\n{html.escape(watch.category_url)}\n\n"
+            keyboard.append([InlineKeyboardButton(text=f"❌ Удалить #{watch.watch_id}", callback_data=f"remove_watch_{watch.watch_id}")])
+        keyboard.append([InlineKeyboardButton(text="➕ Добавить категорию", callback_data="add_watch")])
+        reply_markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
+        
+        if isinstance(message_or_query, CallbackQuery):
+            await message_or_query.message.edit_text(text, reply_markup=reply_markup, parse_mode="HTML", disable_web_page_preview=True)
+        else:
+            await message_or_query.reply(text, reply_markup=reply_markup, parse_mode="HTML", disable_web_page_preview=True)
+    
+    async def _add_watch(self, query: CallbackQuery, state: FSMContext):
+        keyboard = ReplyKeyboardMarkup(keyboard=[
+            [KeyboardButton(text="❌ Отмена")]
+        ], resize_keyboard=True)
+        
+        await query.message.edit_text("👁 Отправьте ссылку на категорию Ozon для мониторинга:")
+        await query.message.reply("Или нажмите кнопку:", reply_markup=keyboard)
+        await state.set_state(ParsingStates.waiting_for_watch_url)
+    
+    async def _remove_watch(self, query: CallbackQuery, watch_id: str):
+        user_id = str(query.from_user.id)
+        if watch_id.isdigit():
+            await self._run_blocking(self.app_manager.remove_watch, user_id, int(watch_id))
+        await self._show_watches(query)
+    
+    async def _handle_watch_url_input(self, message: Message, state: FSMContext):
+        if not self._is_authorized_user(message):
+            return
+        
+        if message.text == "❌ Отмена":
+            await state.clear()
+            await self._cmd_start(message)
+            return
+        
+        if not message.text or not self._is_ozon_category_url(message.text):
+            await message.reply("❌ Неверная ссылка. Отправьте ссылку на категорию Ozon:")
+            return
+        
+        await state.update_data(watch_url=message.text.strip())
+        await message.reply("⏱ Как часто проверять категорию? Введите интервал в часах (от 1 до 168):")
+        await state.set_state(ParsingStates.waiting_for_watch_interval)
+    
+    async def _handle_watch_interval_input(self, message: Message, state: FSMContext):
+        if not self._is_authorized_user(message):
+            return
+        
+        if message.text == "❌ Отмена":
+            await state.clear()
+            await self._cmd_start(message)
+            return
+        
+        try:
+            hours = float(message.text.strip().replace(',', '.'))
+            if hours < 1 or hours > 168:
+                raise ValueError()
+        except ValueError:
+            await message.reply("❌ Введите число часов от 1 до 168:")
+            return
+        
+        user_id = str(message.from_user.id)
+        data = await state.get_data()
+        settings = await self._get_user_settings(user_id)
+        watch_id = await self._run_blocking(
+            self.app_manager.add_watch, user_id, data['watch_url'], int(hours * 60),
+            settings.get('default_product_count', 500),
+        )
+        await state.clear()
+        
+        keyboard = ReplyKeyboardMarkup(keyboard=[
+            [KeyboardButton(text="👁 Мониторинг"), KeyboardButton(text="🏠 Главное меню")]
+        ], resize_keyboard=True)
+        await message.reply(
+            f"✅ Наблюдение #{watch_id} добавлено: проверка каждые {hours:g} ч, первая — сейчас.\n"
+            "Первая проверка парсит всю категорию, следующие — только новые товары.",
+            reply_markup=keyboard,
+        )
+    
+    async def _toggle_delta_mode(self, query: CallbackQuery, state: FSMContext):
+        user_id = str(query.from_user.id)
+        settings = await self._get_user_settings(user_id)
+        
+        await self._save_user_settings(
+            user_id,
+            settings['selected_fields'],
+            settings['field_order'],
+            settings.get('default_product_count', 500),
+            settings.get('min_seller_orders', 0),
+            settings.get('max_seller_orders', 0),
+            delta_mode=not settings.get('delta_mode', False),
+        )
+        await self._show_settings(query, state)
+    
     async def _handle_default_count_input(self, message: Message, state: FSMContext):
         if not self._is_authorized_user(message):
             return
@@ -713,9 +1042,9 @@ class TelegramBotManager:
             return
         
         user_id = str(message.from_user.id)
-        settings = self.db.get_user_settings(user_id)
+        settings = await self._get_user_settings(user_id)
         settings['default_product_count'] = count
-        self.db.save_user_settings(
+        await self._save_user_settings(
             user_id,
             settings['selected_fields'],
             settings['field_order'],
@@ -751,8 +1080,8 @@ class TelegramBotManager:
             return
         
         user_id = str(message.from_user.id)
-        settings = self.db.get_user_settings(user_id)
-        self.db.save_user_settings(
+        settings = await self._get_user_settings(user_id)
+        await self._save_user_settings(
             user_id,
             settings['selected_fields'],
             settings['field_order'],
@@ -788,8 +1117,8 @@ class TelegramBotManager:
             return
         
         user_id = str(message.from_user.id)
-        settings = self.db.get_user_settings(user_id)
-        self.db.save_user_settings(
+        settings = await self._get_user_settings(user_id)
+        await self._save_user_settings(
             user_id,
             settings['selected_fields'],
             settings['field_order'],
@@ -806,9 +1135,48 @@ class TelegramBotManager:
         await message.reply(f"✅ Фильтр по заказам обновлен: {max_text}", reply_markup=keyboard)
         await state.clear()
     
+    async def _handle_target_sellers_input(self, message: Message, state: FSMContext):
+        if not self._is_authorized_user(message):
+            return
+        
+        if message.text == "❌ Отмена":
+            await self._show_settings(message, state)
+            return
+        
+        try:
+            value = int(message.text.strip())
+            if value < 0 or value > 100_000:
+                raise ValueError()
+        except ValueError:
+            keyboard = ReplyKeyboardMarkup(keyboard=[
+                [KeyboardButton(text="❌ Отмена")]
+            ], resize_keyboard=True)
+            await message.reply("❌ Введите целое число от 0 до 100000:", reply_markup=keyboard)
+            return
+        
+        user_id = str(message.from_user.id)
+        settings = await self._get_user_settings(user_id)
+        await self._save_user_settings(
+            user_id,
+            settings['selected_fields'],
+            settings['field_order'],
+            settings.get('default_product_count', 500),
+            settings.get('min_seller_orders', 0),
+            settings.get('max_seller_orders', 0),
+            target_sellers=value,
+        )
+        
+        keyboard = ReplyKeyboardMarkup(keyboard=[
+            [KeyboardButton(text="🏠 Главное меню")]
+        ], resize_keyboard=True)
+        
+        result_text = f"✅ Цель: {value} продавцов" if value else "✅ Цель по продавцам отключена"
+        await message.reply(result_text, reply_markup=keyboard)
+        await state.clear()
+
     async def _configure_fields(self, query: CallbackQuery, state: FSMContext):
         user_id = str(query.from_user.id)
-        settings = self.db.get_user_settings(user_id)
+        settings = await self._get_user_settings(user_id)
         selected_fields = settings['selected_fields']
         field_order = settings['field_order']
         
@@ -839,9 +1207,13 @@ class TelegramBotManager:
         try:
             self.is_running = False
             # 🚀 non-blocking stop
-            if hasattr(self, 'dp') and self.dp and self.dp._loop and not self.dp._loop.is_closed():
+            if self.webhook:
+                if self._loop and not self._loop.is_closed() and self._shutdown_event:
+                    self._loop.call_soon_threadsafe(self._shutdown_event.set)
+            elif hasattr(self, 'dp') and self.dp and self.dp._loop and not self.dp._loop.is_closed():
                 asyncio.run_coroutine_threadsafe(self.dp.stop_polling(), self.dp._loop)
-            if self.bot_thread and self.bot_thread.is_alive():
-                self.bot_thread.join(timeout=2)
+            if self.bot_thread and self.bot_thread.is_alive() and threading.current_thread() is not self.bot_thread:
+                # Поток завершается сам после корректной остановки сервера/polling
+                self.bot_thread.join(timeout=10)
         except Exception as e:
             logger.error(f"Ошибка остановки Telegram бота: {e}")
\ No newline at end of file
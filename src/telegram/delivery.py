@@ -0,0 +1,375 @@
+"""
+Сервис доставки сообщений и файлов в Telegram: одна сессия бота и один фоновый event loop
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from ..utils.metrics import DELIVERY_JOBS, DELIVERY_SECONDS, gauge
+
+logger = logging.getLogger(__name__)
+
+# Лимит Bot API на отправку документа; части берутся с запасом на multipart-заголовки
+TELEGRAM_DOCUMENT_LIMIT = 50 * 1024 * 1024
+DOCUMENT_PART_SIZE = 45 * 1024 * 1024
+# Минимальный интервал между правками одного сообщения о прогрессе
+PROGRESS_MIN_INTERVAL = 3.0
+RETRY_AFTER_ATTEMPTS = 3
+
+
+def prepare_document_parts(path, limit: int = TELEGRAM_DOCUMENT_LIMIT, part_size: int = DOCUMENT_PART_SIZE) -> List[Path]:
+    """
+    Возвращает список файлов для отправки: сам файл, если он укладывается в лимит,
+    иначе zip-архив, а если и он больше лимита — части архива (.zip.001, .zip.002, ...)
+    """
+    path = Path(path)
+    if path.stat().st_size <= limit:
+        return [path]
+
+    archive = path.with_name(f"{path.name}.zip")
+    with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        zf.write(path, arcname=path.name)
+    if archive.stat().st_size <= limit:
+        logger.info(f"Файл {path.name} упакован в архив для отправки")
+        return [archive]
+
+    # Части архива собираются обратно 7-Zip или командой cat
+    parts = []
+    with open(archive, 'rb') as src:
+        index = 1
+        while True:
+            chunk = src.read(part_size)
+            if not chunk:
+                break
+            part = archive.with_name(f"{archive.name}.{index:03d}")
+            part.write_bytes(chunk)
+            parts.append(part)
+            index += 1
+    archive.unlink()
+    logger.info(f"Архив {archive.name} разбит на {len(parts)} частей для отправки")
+    return parts
+
+
+@dataclass
+class DeliveryJob:
+    kind: str  # 'message', 'document', 'callback'
+    chat_id: str = ""
+    chat_ids: List[str] = field(default_factory=list)
+    text: str = ""
+    path: str = ""
+    caption: str = ""
+    parse_mode: Optional[str] = None
+    callback: Optional[Callable[[], None]] = None
+
+
+@dataclass
+class ProgressMessage:
+    """Состояние живого сообщения о прогрессе: последний отправленный и ожидающий текст"""
+    chat_id: str
+    message_id: Optional[int] = None
+    text: str = ""
+    pending: Optional[str] = None
+    final: bool = False
+    last_sent: float = 0.0
+    task: Optional[asyncio.Task] = None
+
+
+class DeliveryService:
+    """
+    Принимает задания на отправку из любого потока через неблокирующую очередь
+    и выполняет их по порядку в собственном потоке с event loop.
+    """
+
+    def __init__(self, bot_token: str):
+        self.bot_token = bot_token
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._bot = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._progress: Dict[str, ProgressMessage] = {}
+
+    def start(self, timeout: float = 10) -> bool:
+        if self._thread and self._thread.is_alive():
+            return True
+        self._ready.clear()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="telegram-delivery", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            logger.error("Сервис доставки Telegram не запустился вовремя")
+            return False
+        return True
+
+    def _run(self):
+        loop = None
+        try:
+            if sys.platform == 'win32':
+                asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self._loop = loop
+            loop.run_until_complete(self._main())
+        except Exception as e:
+            logger.error(f"Ошибка сервиса доставки Telegram: {e}")
+        finally:
+            self._stopped.set()
+            self._ready.set()
+            if loop and not loop.is_closed():
+                loop.close()
+
+    async def _main(self):
+        from aiogram import Bot
+
+        self._queue = asyncio.Queue()
+        self._bot = Bot(token=self.bot_token)
+        self._ready.set()
+        logger.info("Сервис доставки Telegram запущен")
+        try:
+            while True:
+                job = await self._queue.get()
+                if job is None:
+                    break
+                await self._process(job)
+            # Дожидаемся последних правок сообщений о прогрессе
+            tasks = [state.task for state in self._progress.values() if state.task and not state.task.done()]
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            await self._bot.session.close()
+            logger.info("Сервис доставки Telegram остановлен")
+
+    async def _process(self, job: DeliveryJob):
+        started = time.perf_counter()
+        result = 'ok'
+        try:
+            if job.kind == 'message':
+                await self._with_retry(lambda: self._bot.send_message(chat_id=job.chat_id, text=job.text, parse_mode=job.parse_mode))
+            elif job.kind == 'document':
+                await self._send_document(job)
+            elif job.kind == 'callback' and job.callback:
+                # Синхронные действия (например, удаление папки) выполняются вне event loop
+                await asyncio.get_running_loop().run_in_executor(None, job.callback)
+        except Exception as e:
+            result = 'error'
+            logger.error(f"Ошибка доставки ({job.kind}) пользователю {job.chat_id or ', '.join(job.chat_ids)}: {e}")
+        DELIVERY_JOBS.inc(kind=job.kind, result=result)
+        DELIVERY_SECONDS.observe(time.perf_counter() - started, kind=job.kind)
+
+    async def _send_document(self, job: DeliveryJob):
+        """Загружает файл один раз, остальным получателям пересылает его по file_id"""
+        from aiogram.types import FSInputFile
+
+        loop = asyncio.get_running_loop()
+        parts = await loop.run_in_executor(None, prepare_document_parts, job.path)
+        for index, part in enumerate(parts, 1):
+            caption = job.caption
+            if len(parts) > 1:
+                caption = f"{caption}\n\nЧасть {index}/{len(parts)}" if caption else f"Часть {index}/{len(parts)}"
+            elif part.name != Path(job.path).name:
+                caption = f"{caption}\n\n🗜 Файл упакован в zip" if caption else "🗜 Файл упакован в zip"
+
+            file_id = None
+            for chat_id in job.chat_ids:
+                try:
+                    message = await self._with_retry(lambda: self._bot.send_document(
+                        chat_id=chat_id,
+                        document=file_id or FSInputFile(part),
+                        caption=caption or None,
+                        parse_mode=job.parse_mode,
+                    ))
+                    if file_id is None and message.document:
+                        file_id = message.document.file_id
+                except Exception as e:
+                    logger.error(f"Ошибка отправки файла {part.name} пользователю {chat_id}: {e}")
+
+    async def _with_retry(self, request: Callable):
+        """Выполняет запрос к Bot API, при 429 ждет retry_after и повторяет"""
+        from aiogram.exceptions import TelegramRetryAfter
+
+        for attempt in range(RETRY_AFTER_ATTEMPTS):
+            try:
+                return await request()
+            except TelegramRetryAfter as e:
+                if attempt == RETRY_AFTER_ATTEMPTS - 1:
+                    raise
+                logger.warning(f"Telegram ограничил частоту запросов, повтор через {e.retry_after} с")
+                await asyncio.sleep(e.retry_after)
+
+    def _update_progress(self, key: str, chat_id: str, text: str, final: bool):
+        # Выполняется в потоке сервиса: новый текст заменяет еще не отправленный
+        state = self._progress.get(key)
+        if state is None:
+            state = ProgressMessage(chat_id=chat_id)
+            self._progress[key] = state
+        state.pending = text
+        state.final = state.final or final
+        if state.task is None or state.task.done():
+            state.task = asyncio.ensure_future(self._flush_progress(key, state))
+
+    async def _flush_progress(self, key: str, state: ProgressMessage):
+        loop = asyncio.get_running_loop()
+        while state.pending is not None:
+            delay = state.last_sent + PROGRESS_MIN_INTERVAL - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            text, state.pending = state.pending, None
+            if text == state.text:
+                continue
+            await self._send_progress(state, text)
+            state.last_sent = loop.time()
+        if state.final and self._progress.get(key) is state:
+            del self._progress[key]
+
+    async def _send_progress(self, state: ProgressMessage, text: str):
+        from aiogram.exceptions import TelegramBadRequest
+
+        try:
+            if state.message_id is None:
+                message = await self._with_retry(lambda: self._bot.send_message(chat_id=state.chat_id, text=text, parse_mode="HTML"))
+                state.message_id = message.message_id
+            else:
+                await self._with_retry(lambda: self._bot.edit_message_text(
+                    text=text, chat_id=state.chat_id, message_id=state.message_id, parse_mode="HTML"
+                ))
+            state.text = text
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                logger.error(f"Ошибка обновления прогресса пользователю {state.chat_id}: {e}")
+        except Exception as e:
+            logger.error(f"Ошибка обновления прогресса пользователю {state.chat_id}: {e}")
+
+    def queue_depth(self) -> int:
+        """Задания, ожидающие отправки (читается из другого потока — значение приблизительное)"""
+        queue = self._queue
+        return queue.qsize() if queue is not None else 0
+
+    def _is_available(self) -> bool:
+        if not self._ready.is_set() and not self.start():
+            return False
+        if self._stopped.is_set() or not self._loop or self._loop.is_closed():
+            logger.error("Сервис доставки Telegram не запущен, задание отброшено")
+            return False
+        return True
+
+    def _submit(self, job: DeliveryJob) -> bool:
+        if not self._is_available():
+            return False
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return True
+
+    def submit_message(self, chat_id: str, text: str, parse_mode: Optional[str] = None) -> bool:
+        return self._submit(DeliveryJob('message', chat_id=str(chat_id).strip(), text=text, parse_mode=parse_mode))
+
+    def submit_document(self, chat_id: str, path: str, caption: str = "", parse_mode: Optional[str] = None) -> bool:
+        return self.submit_document_to_many([chat_id], path, caption=caption, parse_mode=parse_mode)
+
+    def submit_document_to_many(self, chat_ids: List[str], path: str, caption: str = "", parse_mode: Optional[str] = None) -> bool:
+        """Отправляет один файл нескольким получателям: загрузка происходит только один раз"""
+        chat_ids = [str(chat_id).strip() for chat_id in chat_ids if str(chat_id).strip()]
+        if not chat_ids:
+            return False
+        return self._submit(DeliveryJob('document', chat_ids=chat_ids, path=str(path), caption=caption, parse_mode=parse_mode))
+
+    def submit_callback(self, callback: Callable[[], None]) -> bool:
+        """Ставит действие в очередь: оно выполнится после всех ранее отправленных заданий"""
+        return self._submit(DeliveryJob('callback', callback=callback))
+
+    def submit_progress(self, key: str, chat_id: str, text: str, final: bool = False) -> bool:
+        """
+        Обновляет живое сообщение о прогрессе задания key: первое обновление отправляет
+        сообщение, следующие редактируют его не чаще PROGRESS_MIN_INTERVAL, промежуточные
+        тексты схлопываются в последний
+        """
+        if not self._is_available():
+            return False
+        self._loop.call_soon_threadsafe(self._update_progress, key, str(chat_id).strip(), text, final)
+        return True
+
+    def stop(self, timeout: float = 30):
+        """Дожидается отправки поставленных заданий и останавливает сервис"""
+        if self._loop and not self._loop.is_closed() and not self._stopped.is_set():
+            try:
+                self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+            except RuntimeError:
+                pass
+        if self._thread and self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self._thread.join(timeout=timeout)
+
+
+_services: Dict[str, DeliveryService] = {}
+_services_lock = threading.Lock()
+# Токен и получатели по умолчанию читаются из config.txt один раз
+_default_token: Optional[str] = None
+_default_recipients: List[str] = []
+
+
+def _queue_depth() -> int:
+    with _services_lock:
+        services = list(_services.values())
+    return sum(service.queue_depth() for service in services)
+
+
+gauge("ozon_delivery_queue_depth", "Задания в очереди доставки Telegram").set_function(_queue_depth)
+gauge("ozon_progress_messages", "Живые сообщения о прогрессе").set_function(
+    lambda: sum(len(service._progress) for service in list(_services.values()))
+)
+
+
+def set_default_bot(bot_token: str, user_ids: Optional[List[str]] = None):
+    """Регистрирует токен (и получателей) по умолчанию, например при запуске бота"""
+    global _default_token, _default_recipients
+    with _services_lock:
+        _default_token = bot_token
+        if user_ids is not None:
+            _default_recipients = [str(uid).strip() for uid in user_ids if str(uid).strip()]
+
+
+def _load_defaults():
+    global _default_token, _default_recipients
+    if _default_token:
+        return
+    from ..utils.config_loader import load_telegram_config_multi
+    bot_token, chat_ids = load_telegram_config_multi()
+    with _services_lock:
+        if not _default_token:
+            _default_token = bot_token
+            _default_recipients = chat_ids
+
+
+def get_default_recipients() -> List[str]:
+    _load_defaults()
+    return list(_default_recipients)
+
+
+def get_delivery_service(bot_token: Optional[str] = None) -> Optional[DeliveryService]:
+    """Возвращает общий сервис доставки для токена (по умолчанию — токен из config.txt)"""
+    if not bot_token:
+        _load_defaults()
+        bot_token = _default_token
+        if not bot_token:
+            logger.error("Нет TELEGRAM_BOT_TOKEN в config.txt")
+            return None
+    with _services_lock:
+        service = _services.get(bot_token)
+        if service is None or service._stopped.is_set():
+            service = DeliveryService(bot_token)
+            _services[bot_token] = service
+    service.start()
+    return service
+
+
+def shutdown_delivery_services(timeout: float = 30):
+    """Останавливает все сервисы доставки, дождавшись отправки очередей"""
+    with _services_lock:
+        services = list(_services.values())
+        _services.clear()
+    for service in services:
+        service.stop(timeout)
@@ -0,0 +1,49 @@
+"""
+Замер задержки event loop бота: насколько позже запланированного просыпается корутина
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+
+    def __init__(self, interval: float = 0.5, warn_threshold: float = 0.25, window: int = 240, warn_every: float = 30.0):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.warn_every = warn_every
+        self._samples = deque(maxlen=window)
+        self._max_lag = 0.0
+        self._last_warning = 0.0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._samples.append(lag)
+            self._max_lag = max(self._max_lag, lag)
+
+            now = time.monotonic()
+            if lag >= self.warn_threshold and now - self._last_warning >= self.warn_every:
+                self._last_warning = now
+                logger.warning(f"Event loop бота заблокирован на {lag * 1000:.0f} мс")
+
+    def stats(self) -> Dict[str, float]:
+        """Задержка в миллисекундах: последняя, средняя и p95 за окно, максимум за все время"""
+        samples = list(self._samples)
+        if not samples:
+            return {'last_ms': 0.0, 'avg_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return {
+            'last_ms': round(samples[-1] * 1000, 1),
+            'avg_ms': round(sum(samples) / len(samples) * 1000, 1),
+            'p95_ms': round(p95 * 1000, 1),
+            'max_ms': round(self._max_lag * 1000, 1),
+        }
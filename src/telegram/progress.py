@@ -0,0 +1,121 @@
+"""
+Живое сообщение о прогрессе парсинга: этап, обработано, скорость, ETA, найдено продавцов
+"""
+import threading
+import time
+from typing import Optional
+
+from .delivery import DeliveryService
+
+STAGE_NAMES = {
+    'links': '🔗 Сбор ссылок',
+    'products': '📦 Парсинг товаров',
+    'sellers': '🏪 Парсинг продавцов',
+    'export': '💾 Сохранение файлов',
+    'done': '✅ Завершено',
+    'stopped': '⏹️ Остановлено',
+    'failed': '❌ Ошибка',
+}
+FINAL_STAGES = {'done', 'stopped', 'failed'}
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(max(0, seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours > 0:
+        return f"{hours}ч {minutes}м"
+    if minutes > 0:
+        return f"{minutes}м {seconds}с"
+    return f"{seconds}с"
+
+
+class ProgressReporter:
+    """
+    Потокобезопасно считает прогресс задания и передает текст в сервис доставки;
+    частоту правок сообщения ограничивает сам сервис
+    """
+
+    def __init__(self, delivery: Optional[DeliveryService], chat_id: str, key: str):
+        self.delivery = delivery
+        self.chat_id = chat_id
+        self.key = key
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._stage = 'links'
+        self._stage_started = self._started
+        self._total = 0
+        self._done = 0
+        self._sellers_found = 0
+        self._target = 0
+
+    def set_stage(self, stage: str, total: int = 0):
+        with self._lock:
+            self._stage = stage
+            self._stage_started = time.monotonic()
+            self._total = total
+            self._done = 0
+        self._publish()
+
+    def set_target(self, target: int):
+        with self._lock:
+            self._target = target
+
+    def advance(self, count: int = 1) -> int:
+        with self._lock:
+            self._done += count
+            done = self._done
+        self._publish()
+        return done
+
+    def add_sellers(self, count: int = 1):
+        with self._lock:
+            self._sellers_found += count
+        self._publish()
+
+    def finish(self, stage: str = 'done'):
+        with self._lock:
+            self._stage = stage
+        self._publish(final=True)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            stage_elapsed = now - self._stage_started
+            throughput = self._done / stage_elapsed if stage_elapsed > 0 else 0.0
+            eta = None
+            if throughput > 0 and self._total > self._done:
+                eta = (self._total - self._done) / throughput
+            return {
+                'stage': self._stage,
+                'done': self._done,
+                'total': self._total,
+                'throughput': throughput,
+                'eta': eta,
+                'sellers_found': self._sellers_found,
+                'target': self._target,
+                'elapsed': now - self._started,
+            }
+
+    def render(self) -> str:
+        snap = self.snapshot()
+        stage = snap['stage']
+        title = "⏳ <b>Парсинг</b>" if stage not in FINAL_STAGES else "📋 <b>Парсинг</b>"
+        lines = [title, "", f"📋 Этап: {STAGE_NAMES.get(stage, stage)}"]
+        if stage in ('products', 'sellers') and snap['total']:
+            percent = snap['done'] / snap['total'] * 100
+            lines.append(f"📈 Обработано: {snap['done']}/{snap['total']} ({percent:.0f}%)")
+            lines.append(f"⚡ Скорость: {snap['throughput'] * 60:.1f}/мин")
+            if snap['eta'] is not None:
+                lines.append(f"⏱ Осталось: ~{_format_duration(snap['eta'])}")
+        if snap['target']:
+            lines.append(f"🎯 Найдено продавцов: {snap['sellers_found']}/{snap['target']}")
+        else:
+            lines.append(f"🏪 Найдено продавцов: {snap['sellers_found']}")
+        lines.append(f"🕐 Прошло: {_format_duration(snap['elapsed'])}")
+        return "\n".join(lines)
+
+    def _publish(self, final: bool = False):
+        if self.delivery is None:
+            return
+        self.delivery.submit_progress(self.key, self.chat_id, self.render(), final=final)
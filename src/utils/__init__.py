@@ -1,6 +1,11 @@
-from .logger import setup_logging
-from .selenium_manager import SeleniumManager
-from .excel_exporter import ExcelExporter
-from .database import Database
+from .lazy_import import lazy_exports
+
+# selenium и openpyxl загружаются только при обращении к SeleniumManager/ExcelExporter
+__getattr__ = lazy_exports(__name__, {
+    'setup_logging': '.logger',
+    'SeleniumManager': '.selenium_manager',
+    'ExcelExporter': '.excel_exporter',
+    'Database': '.database',
+})
 
 __all__ = ['setup_logging', 'SeleniumManager', 'ExcelExporter', 'Database']
\ No newline at end of file
@@ -1,6 +1,8 @@
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Tuple, Optional, Dict, Any
 import logging
+import os
 import sys
 
 logger = logging.getLogger(__name__)
@@ -58,6 +60,15 @@ def write_config(new_config: Dict[str, Any]) -> bool:
         logger.error(f"Ошибка записи в config.txt: {e}")
         return False
 
+def load_flag(key: str, config: Optional[Dict[str, str]] = None) -> bool:
+    """Булев флаг: переменная окружения с тем же именем важнее значения из config.txt"""
+    value = os.environ.get(key)
+    if value is None:
+        if config is None:
+            config = read_config()
+        value = config.get(key, '')
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
 def load_telegram_config() -> Tuple[Optional[str], Optional[str]]:
     """Загружает TELEGRAM_BOT_TOKEN и TELEGRAM_CHAT_ID из config.txt"""
     config = read_config()
@@ -80,3 +91,63 @@ def load_telegram_config_multi() -> Tuple[Optional[str], list]:
         chat_ids = [uid.strip() for uid in chat_ids_str.split(',') if uid.strip()]
     
     return bot_token, chat_ids
+
+@dataclass
+class WebhookConfig:
+    """Параметры webhook-режима бота: локальный HTTP-сервер и публичный URL для Telegram"""
+    host: str = "127.0.0.1"
+    port: int = 8080
+    path: str = "/telegram/webhook"
+    url: str = ""  # Публичный адрес (за reverse proxy); пустой — webhook в Telegram не регистрируется
+    secret: str = ""
+
+def load_webhook_config(config: Optional[Dict[str, str]] = None) -> Optional[WebhookConfig]:
+    """Возвращает настройки webhook, если в config.txt задан TELEGRAM_MODE=webhook, иначе None (polling)"""
+    if config is None:
+        config = read_config()
+    
+    if config.get('TELEGRAM_MODE', 'polling').strip().lower() != 'webhook':
+        return None
+    
+    path = config.get('TELEGRAM_WEBHOOK_PATH', '/telegram/webhook').strip() or '/telegram/webhook'
+    if not path.startswith('/'):
+        path = '/' + path
+    
+    try:
+        port = int(config.get('TELEGRAM_WEBHOOK_PORT', 8080))
+    except ValueError:
+        logger.warning("Некорректный TELEGRAM_WEBHOOK_PORT, используется 8080")
+        port = 8080
+    
+    return WebhookConfig(
+        host=config.get('TELEGRAM_WEBHOOK_HOST', '127.0.0.1').strip() or '127.0.0.1',
+        port=port,
+        path=path,
+        url=config.get('TELEGRAM_WEBHOOK_URL', '').strip(),
+        secret=config.get('TELEGRAM_WEBHOOK_SECRET', '').strip(),
+    )
+
+@dataclass
+class MetricsConfig:
+    """Параметры локального HTTP-эндпоинта метрик Prometheus"""
+    host: str = "127.0.0.1"
+    port: int = 9108
+
+def load_metrics_config(config: Optional[Dict[str, str]] = None) -> Optional[MetricsConfig]:
+    """Возвращает настройки эндпоинта метрик, если в config.txt задан METRICS_ENABLED=true, иначе None"""
+    if config is None:
+        config = read_config()
+    
+    if config.get('METRICS_ENABLED', 'false').strip().lower() not in ('1', 'true', 'yes', 'on'):
+        return None
+    
+    try:
+        port = int(config.get('METRICS_PORT', 9108))
+    except ValueError:
+        logger.warning("Некорректный METRICS_PORT, используется 9108")
+        port = 9108
+    
+    return MetricsConfig(
+        host=config.get('METRICS_HOST', '127.0.0.1').strip() or '127.0.0.1',
+        port=port,
+    )
@@ -1,22 +1,44 @@
 import logging
 from pathlib import Path
-from .config_loader import read_config, write_config
+from .settings_store import get_settings_store
+from .export import DEFAULT_EXPORT_FORMATS, EXPORT_FORMATS, EXPORT_COMPRESSIONS
 
 logger = logging.getLogger(__name__)
 
 class Database:
     def __init__(self):
-        pass
+        self._store = None
+    
+    @property
+    def store(self):
+        # Настройки хранятся в SQLite с кэшем в памяти, config.txt больше не перечитывается;
+        # база открывается при первом обращении
+        if self._store is None:
+            self._store = get_settings_store()
+        return self._store
     
     def get_user_settings(self, user_id: str):
-        config = read_config()
+        config = self.store.get(user_id)
+        
+        # Ключи настроек пользователя (в config.txt они хранились с префиксом USER_<id>_)
+        selected_fields_key = "SELECTED_FIELDS"
+        field_order_key = "FIELD_ORDER"
+        default_count_key = "DEFAULT_COUNT"
+        min_orders_key = "MIN_ORDERS"
+        max_orders_key = "MAX_ORDERS"
+        export_formats_key = "EXPORT_FORMATS"
+        export_compression_key = "EXPORT_COMPRESSION"
+        target_sellers_key = "TARGET_SELLERS"
+        delta_mode_key = "DELTA_MODE"
         
-        # Получаем настройки для конкретного пользователя
-        selected_fields_key = f"USER_{user_id}_SELECTED_FIELDS"
-        field_order_key = f"USER_{user_id}_FIELD_ORDER"
-        default_count_key = f"USER_{user_id}_DEFAULT_COUNT"
-        min_orders_key = f"USER_{user_id}_MIN_ORDERS"
-        max_orders_key = f"USER_{user_id}_MAX_ORDERS"
+        export_formats = [f for f in config.get(export_formats_key, '').split(',') if f in EXPORT_FORMATS]
+        if not export_formats:
+            export_formats = list(DEFAULT_EXPORT_FORMATS)
+        export_compression = config.get(export_compression_key, 'none')
+        if export_compression not in EXPORT_COMPRESSIONS:
+            export_compression = 'none'
+        target_sellers = int(config.get(target_sellers_key, 0) or 0)
+        delta_mode = config.get(delta_mode_key, '0') == '1'
         
         if selected_fields_key in config and field_order_key in config:
             selected_fields = config[selected_fields_key].split(',') if config[selected_fields_key] else []
@@ -40,6 +62,10 @@ class Database:
                     'default_product_count': default_count,
                     'min_seller_orders': min_orders,
                     'max_seller_orders': max_orders,
+                    'export_formats': export_formats,
+                    'export_compression': export_compression,
+                    'target_sellers': target_sellers,
+                    'delta_mode': delta_mode,
                 }
 
             return {
@@ -48,6 +74,10 @@ class Database:
                 'default_product_count': default_count,
                 'min_seller_orders': min_orders,
                 'max_seller_orders': max_orders,
+                'export_formats': export_formats,
+                'export_compression': export_compression,
+                'target_sellers': target_sellers,
+                'delta_mode': delta_mode,
             }
         else:
             # Настройки по умолчанию
@@ -59,6 +89,10 @@ class Database:
                 'default_product_count': 500,
                 'min_seller_orders': 0,
                 'max_seller_orders': 0,
+                'export_formats': export_formats,
+                'export_compression': export_compression,
+                'target_sellers': target_sellers,
+                'delta_mode': delta_mode,
             }
     
     def save_user_settings(
@@ -69,13 +103,26 @@ class Database:
         default_count: int = 500,
         min_seller_orders: int = 0,
         max_seller_orders: int = 0,
+        export_formats: list = None,
+        export_compression: str = None,
+        target_sellers: int = None,
+        delta_mode: bool = None,
     ):
         config = {
-            f"USER_{user_id}_SELECTED_FIELDS": ','.join(selected_fields),
-            f"USER_{user_id}_FIELD_ORDER": ','.join(field_order),
-            f"USER_{user_id}_DEFAULT_COUNT": str(default_count),
-            f"USER_{user_id}_MIN_ORDERS": str(int(min_seller_orders or 0)),
-            f"USER_{user_id}_MAX_ORDERS": str(int(max_seller_orders or 0)),
+            "SELECTED_FIELDS": ','.join(selected_fields),
+            "FIELD_ORDER": ','.join(field_order),
+            "DEFAULT_COUNT": str(default_count),
+            "MIN_ORDERS": str(int(min_seller_orders or 0)),
+            "MAX_ORDERS": str(int(max_seller_orders or 0)),
         }
+        # Форматы экспорта пишем только если их передали, иначе сохраняются текущие
+        if export_formats is not None:
+            config["EXPORT_FORMATS"] = ','.join(export_formats)
+        if export_compression is not None:
+            config["EXPORT_COMPRESSION"] = export_compression
+        if target_sellers is not None:
+            config["TARGET_SELLERS"] = str(int(target_sellers or 0))
+        if delta_mode is not None:
+            config["DELTA_MODE"] = '1' if delta_mode else '0'
         
-        return write_config(config)
\ No newline at end of file
+        return self.store.set_many(user_id, config)
@@ -0,0 +1,65 @@
+"""
+Дельта-отчеты: в выгрузку попадают только новые продавцы и продавцы с изменившимися данными.
+
+Каждая нормализованная строка продавца получает отпечаток (хэш содержимого). Отпечатки
+прошлого запуска той же категории берутся из склада одним запросом в словарь, поэтому
+сравнение — один поиск по хэшу на продавца, линейно по размеру запуска.
+"""
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from .export import SELLER_EXPORT_FIELDS, build_seller_row
+
+NEW = 'new'
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+
+
+def row_fingerprint(row: Dict[str, Any]) -> str:
+    """Хэш содержимого нормализованной строки продавца (порядок полей фиксирован)"""
+    payload = json.dumps([row.get(field) for field in SELLER_EXPORT_FIELDS], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SellerDelta:
+    """
+    Сравнивает продавцов текущего запуска с их последними отпечатками в категории.
+    Потокобезопасен: classify() вызывается из воркеров по мере готовности продавцов.
+    """
+
+    def __init__(self, previous_hashes: Dict[str, str], seller_meta: Optional[Dict[str, Dict[str, str]]] = None):
+        self.previous_hashes = previous_hashes
+        self.seller_meta = seller_meta if seller_meta is not None else {}
+        self._lock = threading.Lock()
+        self._statuses: Dict[str, str] = {}
+
+    @property
+    def has_baseline(self) -> bool:
+        return bool(self.previous_hashes)
+
+    def classify(self, seller) -> str:
+        """new / changed / unchanged; повторный вызов для того же продавца возвращает прежний ответ"""
+        seller_id = seller.seller_id
+        with self._lock:
+            status = self._statuses.get(seller_id)
+            if status is not None:
+                return status
+        previous = self.previous_hashes.get(seller_id)
+        if previous is None:
+            status = NEW
+        elif previous == row_fingerprint(build_seller_row(seller, self.seller_meta)):
+            status = UNCHANGED
+        else:
+            status = CHANGED
+        with self._lock:
+            return self._statuses.setdefault(seller_id, status)
+
+    def is_reported(self, seller) -> bool:
+        return self.classify(seller) != UNCHANGED
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            statuses = list(self._statuses.values())
+        return {status: statuses.count(status) for status in (NEW, CHANGED, UNCHANGED)}
@@ -1,164 +1,263 @@
 import logging
+from copy import copy
 import openpyxl
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill, NamedStyle
 from openpyxl.utils import get_column_letter
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+
+def _numeric(row: dict, field: str):
+    """Числовая ячейка из типизированного значения строки; без него — исходный текст"""
+    value = row.get(f'{field}_value')
+    return value if value is not None else row.get(field, '')
+
+
+SELLER_FIELD_MAPPING = {
+    'seller_id': ('ID продавца', lambda s: s.get('seller_id', '')),
+    'seller_name': ('Продавец', lambda s: s.get('seller_name', '')),
+    'company_name': ('Название компании', lambda s: s.get('company_name', '')),
+    'inn': ('ИНН', lambda s: s.get('inn', '')),
+    'orders_count': ('Заказов', lambda s: _numeric(s, 'orders_count')),
+    'reviews_count': ('Отзывов', lambda s: _numeric(s, 'reviews_count')),
+    'average_rating': ('Рейтинг', lambda s: _numeric(s, 'average_rating')),
+    'working_time': ('Работает с', lambda s: s.get('working_time', '')),
+    'seller_link': ('Ссылка продавца', lambda s: s.get('seller_link', '')),
+}
+SELLER_DEFAULT_FIELDS = ['seller_name', 'company_name', 'seller_link', 'orders_count', 'average_rating', 'reviews_count', 'inn', 'working_time']
+
+PRODUCT_FIELD_MAPPING = {
+    'article': ('Артикул', lambda p: p.get('article', '')),
+    'name': ('Название товара', lambda p: p.get('name', '')),
+    'seller_name': ('Продавец', lambda p: p.get('seller', {}).get('name', '')),
+    'company_name': ('Название компании', lambda p: p.get('seller', {}).get('company_name', '')),
+    'inn': ('ИНН', lambda p: p.get('seller', {}).get('inn', '')),
+    'card_price': ('Цена карты', lambda p: p.get('card_price', 0)),
+    'price': ('Цена', lambda p: p.get('price', 0)),
+    'original_price': ('Старая цена', lambda p: p.get('original_price', 0)),
+    'product_url': ('Ссылка товара', lambda p: p.get('product_url', '')),
+    'image_url': ('Изображение', lambda p: p.get('image_url', '')),
+    'orders_count': ('Заказов', lambda p: p.get('seller', {}).get('orders_count', '')),
+    'reviews_count': ('Отзывов', lambda p: p.get('seller', {}).get('reviews_count', '')),
+    'average_rating': ('Рейтинг', lambda p: p.get('seller', {}).get('average_rating', '')),
+    'working_time': ('Работает с', lambda p: p.get('seller', {}).get('working_time', ''))
+}
+PRODUCT_DEFAULT_FIELDS = ['name', 'company_name', 'product_url', 'image_url']
+
+# Ширина колонок (адаптивная)
+DEFAULT_WIDTHS = {
+    'Артикул': 12,
+    'Название товара': 40,
+    'Продавец': 25,
+    'Название компании': 30,
+    'ИНН': 15,
+    'Цена карты': 12,
+    'Цена': 12,
+    'Старая цена': 12,
+    'Ссылка товара': 50,
+    'Ссылка продавца': 50,
+    'Изображение': 50,
+    'ID продавца': 14,
+    'Заказов': 12,
+    'Отзывов': 12,
+    'Рейтинг': 12,
+    'Работает с': 15,
+}
+
+# Имена общих стилей книги: один стиль на всю колонку вместо объектов на каждую ячейку
+HEADER_STYLE = 'ozon_header'
+DATA_STYLE = 'ozon_data'
+LINK_STYLE = 'ozon_link'
+
+
+def _build_named_styles():
+    border = Border(
+        left=Side(style='thin'), right=Side(style='thin'),
+        top=Side(style='thin'), bottom=Side(style='thin')
+    )
+    header = NamedStyle(
+        name=HEADER_STYLE,
+        font=Font(name='Arial', size=11, bold=True, color='FFFFFF'),
+        fill=PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid'),
+        alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+        border=border,
+    )
+    data = NamedStyle(
+        name=DATA_STYLE,
+        font=Font(name='Arial', size=10),
+        alignment=Alignment(horizontal='left', vertical='center', wrap_text=True),
+        border=border,
+    )
+    link = NamedStyle(
+        name=LINK_STYLE,
+        font=Font(name='Arial', size=10, color='0563C1', underline='single'),
+        alignment=Alignment(horizontal='left', vertical='center', wrap_text=True),
+        border=border,
+    )
+    return header, data, link
+
+
 class ExcelExporter:
-    def __init__(self, output_dir: Path, filename: str):
+    """
+    Экспорт в Excel. В обычном режиме книга строится в памяти; при streaming=True
+    используется write-only режим openpyxl: строки сбрасываются на диск по мере
+    добавления, а стили задаются общими именованными стилями.
+    """
+
+    def __init__(self, output_dir: Path, filename: str, streaming: bool = False):
         self.output_dir = output_dir
         self.filename = filename
         self.filepath = output_dir / f"{filename}.xlsx"
-    
+        self.streaming = streaming
+        self._wb = None
+        self._ws = None
+        self._extractors = []
+        self._link_cols = set()
+        self._style_arrays = {}
+        self._headers = []
+        self._has_success_col = False
+        self._row_idx = 1
+
     def export_results(self, data: dict, selected_fields: list = None) -> bool:
         try:
-            wb = openpyxl.Workbook()
-            ws = wb.active
-
             # Поддерживаем 2 формата данных:
             # 1) products: [{..., seller: {...}}]
             # 2) sellers: [{...}]
             is_sellers = 'sellers' in data
             rows = data.get('sellers', []) if is_sellers else data.get('products', [])
 
-            if is_sellers:
-                ws.title = "Ozon Sellers"
-                field_mapping = {
-                    'seller_id': ('ID продавца', lambda s: s.get('seller_id', '')),
-                    'seller_name': ('Продавец', lambda s: s.get('seller_name', '')),
-                    'company_name': ('Название компании', lambda s: s.get('company_name', '')),
-                    'inn': ('ИНН', lambda s: s.get('inn', '')),
-                    'orders_count': ('Заказов', lambda s: s.get('orders_count', '')),
-                    'reviews_count': ('Отзывов', lambda s: s.get('reviews_count', '')),
-                    'average_rating': ('Рейтинг', lambda s: s.get('average_rating', '')),
-                    'working_time': ('Работает с', lambda s: s.get('working_time', '')),
-                    'seller_link': ('Ссылка продавца', lambda s: s.get('seller_link', '')),
-                }
-                default_fields = ['seller_name', 'company_name', 'seller_link', 'orders_count', 'average_rating', 'reviews_count', 'inn', 'working_time']
-            else:
-                ws.title = "Ozon Products"
-                field_mapping = {
-                    'article': ('Артикул', lambda p: p.get('article', '')),
-                    'name': ('Название товара', lambda p: p.get('name', '')),
-                    'seller_name': ('Продавец', lambda p: p.get('seller', {}).get('name', '')),
-                    'company_name': ('Название компании', lambda p: p.get('seller', {}).get('company_name', '')),
-                    'inn': ('ИНН', lambda p: p.get('seller', {}).get('inn', '')),
-                    'card_price': ('Цена карты', lambda p: p.get('card_price', 0)),
-                    'price': ('Цена', lambda p: p.get('price', 0)),
-                    'original_price': ('Старая цена', lambda p: p.get('original_price', 0)),
-                    'product_url': ('Ссылка товара', lambda p: p.get('product_url', '')),
-                    'image_url': ('Изображение', lambda p: p.get('image_url', '')),
-                    'orders_count': ('Заказов', lambda p: p.get('seller', {}).get('orders_count', '')),
-                    'reviews_count': ('Отзывов', lambda p: p.get('seller', {}).get('reviews_count', '')),
-                    'average_rating': ('Рейтинг', lambda p: p.get('seller', {}).get('average_rating', '')),
-                    'working_time': ('Работает с', lambda p: p.get('seller', {}).get('working_time', ''))
-                }
-                default_fields = ['name', 'company_name', 'product_url', 'image_url']
-            
-            # Используем выбранные поля или все по умолчанию
-            if selected_fields:
-                included_fields = [field for field in selected_fields if field in field_mapping]
-                if not included_fields:
-                    included_fields = list(default_fields)
-                headers = [field_mapping[field][0] for field in included_fields]
-                field_extractors = [field_mapping[field][1] for field in included_fields]
+            self.begin(selected_fields, is_sellers=is_sellers)
+            for item in rows:
+                self.append(item)
+            return self.finish()
+
+        except Exception as e:
+            logger.error(f"Ошибка экспорта в Excel: {e}")
+            self._reset()
+            return False
+
+    def begin(self, selected_fields: list = None, is_sellers: bool = True):
+        """Создает книгу и пишет заголовки; далее строки добавляются через append()"""
+        if is_sellers:
+            title, field_mapping, default_fields = "Ozon Sellers", SELLER_FIELD_MAPPING, SELLER_DEFAULT_FIELDS
+        else:
+            title, field_mapping, default_fields = "Ozon Products", PRODUCT_FIELD_MAPPING, PRODUCT_DEFAULT_FIELDS
+
+        # Используем выбранные поля или все по умолчанию
+        included_fields = [field for field in (selected_fields or []) if field in field_mapping]
+        if not included_fields:
+            included_fields = list(default_fields)
+        headers = [field_mapping[field][0] for field in included_fields]
+        self._extractors = [field_mapping[field][1] for field in included_fields]
+
+        self._link_cols = set()
+        if 'seller_link' in included_fields:
+            self._link_cols.add(included_fields.index('seller_link'))
+        if (not is_sellers) and 'product_url' in included_fields:
+            self._link_cols.add(included_fields.index('product_url'))
+
+        # Скрытая колонка-флаг успешности для условного форматирования (актуально для products)
+        self._has_success_col = not is_sellers
+
+        if self.streaming:
+            self._wb = openpyxl.Workbook(write_only=True)
+            self._ws = self._wb.create_sheet(title)
+        else:
+            self._wb = openpyxl.Workbook()
+            self._ws = self._wb.active
+            self._ws.title = title
+
+        # Индексы стилей вычисляются один раз; ячейкам присваивается готовый StyleArray,
+        # без поиска именованного стиля по списку на каждую ячейку
+        self._style_arrays = {}
+        for style in _build_named_styles():
+            self._wb.add_named_style(style)
+            self._style_arrays[style.name] = style.as_tuple()
+
+        ws = self._ws
+        for col, header in enumerate(headers, 1):
+            ws.column_dimensions[get_column_letter(col)].width = DEFAULT_WIDTHS.get(header, 15)
+        if self._has_success_col:
+            ws.column_dimensions[get_column_letter(len(headers) + 1)].hidden = True
+
+        # Высота строк задается по умолчанию для листа, без прохода по каждой строке
+        ws.sheet_format.defaultRowHeight = 20
+        ws.sheet_format.customHeight = True
+        ws.freeze_panes = "A2"
+
+        header_values = list(headers) + (['success'] if self._has_success_col else [])
+        self._write_row([(value, HEADER_STYLE, None) for value in header_values])
+        self._headers = headers
+
+    def append(self, item: dict):
+        """Добавляет одну строку данных"""
+        cells = []
+        for col_idx, extractor in enumerate(self._extractors):
+            value = extractor(item)
+            if col_idx in self._link_cols and isinstance(value, str) and value.startswith(("http://", "https://")):
+                cells.append((value, LINK_STYLE, value))
             else:
-                included_fields = list(default_fields)
-                headers = [field_mapping[field][0] for field in default_fields]
-                field_extractors = [field_mapping[field][1] for field in default_fields]
-            
-            # Стили
-            header_font = Font(name='Arial', size=11, bold=True, color='FFFFFF')
-            header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-            header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            
-            data_font = Font(name='Arial', size=10)
-            data_alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
-            
-            border = Border(
-                left=Side(style='thin'), right=Side(style='thin'),
-                top=Side(style='thin'), bottom=Side(style='thin')
-            )
-            
-            # Заголовки
-            for col, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col, value=header)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = header_alignment
-                cell.border = border
-            
-            # Данные
-            hyperlink_cols = set()
-            if 'seller_link' in included_fields:
-                hyperlink_cols.add(included_fields.index('seller_link') + 1)
-            if (not is_sellers) and 'product_url' in included_fields:
-                hyperlink_cols.add(included_fields.index('product_url') + 1)
-
-            for row_idx, item in enumerate(rows, 2):
-                row_data = [extractor(item) for extractor in field_extractors]
-
-                # Цветовая индикация успешности (только для products, если есть флаг success)
-                success_flag = bool(item.get('success')) if isinstance(item, dict) else True
-                fill = (
-                    PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-                    if success_flag
-                    else PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
+                cells.append((value, DATA_STYLE, None))
+        if self._has_success_col:
+            # Красим только неуспешные items: флаг 0 подсвечивается условным форматированием
+            failed = isinstance(item, dict) and item.get('success') is False
+            cells.append((0 if failed else 1, DATA_STYLE, None))
+        self._write_row(cells)
+
+    def finish(self) -> bool:
+        """Добавляет фильтр и условное форматирование, сохраняет файл"""
+        try:
+            ws = self._ws
+            data_rows = self._row_idx - 2
+            last_col = get_column_letter(len(self._headers))
+
+            # Фильтр
+            if data_rows > 0:
+                ws.auto_filter.ref = f"A1:{last_col}{data_rows + 1}"
+
+            if self._has_success_col and data_rows > 0:
+                flag_col = get_column_letter(len(self._headers) + 1)
+                ws.conditional_formatting.add(
+                    f"A2:{last_col}{data_rows + 1}",
+                    FormulaRule(
+                        formula=[f"${flag_col}2=0"],
+                        fill=PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid'),
+                    ),
                 )
 
-                for col_idx, value in enumerate(row_data, 1):
-                    cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                    cell.font = data_font
-                    cell.alignment = data_alignment
-                    cell.border = border
-
-                    if col_idx in hyperlink_cols and isinstance(value, str) and value.startswith(("http://", "https://")):
-                        cell.hyperlink = value
-                        cell.style = "Hyperlink"
-
-                    # Красим только неуспешные items (актуально для products)
-                    if isinstance(item, dict) and item.get('success') is False:
-                        cell.fill = fill
-            
-            # Ширина колонок (адаптивная)
-            default_widths = {
-                'Артикул': 12,
-                'Название товара': 40,
-                'Продавец': 25,
-                'Название компании': 30,
-                'ИНН': 15,
-                'Цена карты': 12,
-                'Цена': 12,
-                'Старая цена': 12,
-                'Ссылка товара': 50,
-                'Ссылка продавца': 50,
-                'Изображение': 50,
-                'ID продавца': 14,
-                'Заказов': 12,
-                'Отзывов': 12,
-                'Рейтинг': 12,
-                'Работает с': 15,
-            }
-            
-            for col, header in enumerate(headers, 1):
-                width = default_widths.get(header, 15)
-                ws.column_dimensions[get_column_letter(col)].width = width
-            
-            # Высота строк
-            for r in range(1, len(rows) + 2):
-                ws.row_dimensions[r].height = 20
-            
-            # Фильтр и заморозка
-            if rows:
-                ws.auto_filter.ref = f"A1:{get_column_letter(len(headers))}{len(rows) + 1}"
-            ws.freeze_panes = "A2"
-            
-            wb.save(self.filepath)
-            logger.info(f"Excel файл сохранен: {self.filepath}")
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            self._wb.save(self.filepath)
+            logger.info(f"Excel файл сохранен: {self.filepath} ({data_rows} строк)")
             return True
-            
         except Exception as e:
-            logger.error(f"Ошибка экспорта в Excel: {e}")
-            return False
\ No newline at end of file
+            logger.error(f"Ошибка сохранения Excel: {e}")
+            return False
+        finally:
+            self._reset()
+
+    def _write_row(self, cells):
+        ws = self._ws
+        if self.streaming:
+            row = []
+            for value, style, hyperlink in cells:
+                cell = WriteOnlyCell(ws, value=value)
+                cell._style = copy(self._style_arrays[style])
+                if hyperlink:
+                    cell.hyperlink = hyperlink
+                row.append(cell)
+            ws.append(row)
+        else:
+            for col_idx, (value, style, hyperlink) in enumerate(cells, 1):
+                cell = ws.cell(row=self._row_idx, column=col_idx, value=value)
+                cell._style = copy(self._style_arrays[style])
+                if hyperlink:
+                    cell.hyperlink = hyperlink
+        self._row_idx += 1
+
+    def _reset(self):
+        self._wb = None
+        self._ws = None
+        self._row_idx = 1
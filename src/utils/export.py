@@ -0,0 +1,362 @@
+"""
+Единая модель экспорта: нормализованные строки продавцов и приёмники (sinks)
+"""
+import csv
+import gzip
+import io
+import json
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .normalize import parse_count_value, parse_rating_value, seller_metric  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+# Порядок колонок нормализованной строки продавца: отображаемые строки Ozon
+# и рядом те же метрики числами (int/float, пусто — если значения нет)
+SELLER_EXPORT_FIELDS = [
+    'seller_id', 'seller_name', 'company_name', 'inn',
+    'orders_count', 'reviews_count', 'average_rating', 'working_time', 'seller_link',
+    'orders_count_value', 'reviews_count_value', 'average_rating_value',
+]
+
+# Доступные форматы экспорта и сжатия
+EXPORT_FORMATS = ['excel', 'json', 'csv', 'jsonl', 'parquet']
+DEFAULT_EXPORT_FORMATS = ['excel', 'json']
+EXPORT_COMPRESSIONS = ['none', 'gzip', 'zstd']
+COMPRESSION_SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+# Размер пачки строк, которая сбрасывается в Parquet одной row group
+PARQUET_BATCH_SIZE = 1000
+
+
+def _clean_quotes(value: Optional[str]) -> str:
+    return (value or '').replace('\\"', '"')
+
+
+def build_seller_row(seller, seller_meta: Optional[Dict[str, Dict[str, str]]] = None) -> Dict[str, Any]:
+    """Строит нормализованную строку продавца из SellerInfo и метаданных карточек товаров"""
+    sid = getattr(seller, 'seller_id', '') or ''
+    meta = (seller_meta or {}).get(sid, {}) if sid else {}
+    return {
+        'seller_id': sid,
+        'seller_name': _clean_quotes(meta.get('seller_name')),
+        'company_name': _clean_quotes(getattr(seller, 'company_name', '')),
+        'inn': getattr(seller, 'inn', '') or '',
+        'orders_count': getattr(seller, 'orders_count', '') or '',
+        'reviews_count': getattr(seller, 'reviews_count', '') or '',
+        'average_rating': getattr(seller, 'average_rating', '') or '',
+        'working_time': getattr(seller, 'working_time', '') or '',
+        'seller_link': meta.get('seller_link') or (f"https://ozon.ru/seller/{sid}" if sid else ""),
+        'orders_count_value': seller_metric(seller, 'orders_count'),
+        'reviews_count_value': seller_metric(seller, 'reviews_count'),
+        'average_rating_value': seller_metric(seller, 'average_rating'),
+    }
+
+
+class ExportSink:
+    """Базовый приёмник строк экспорта"""
+
+    def __init__(self, filepath: Path):
+        self.filepath = Path(filepath)
+
+    def open(self, context: Dict[str, Any]):
+        pass
+
+    def write_row(self, row: Dict[str, Any]):
+        raise NotImplementedError
+
+    def close(self) -> Optional[Path]:
+        """Завершает запись и возвращает путь к файлу (или None при ошибке)"""
+        return self.filepath
+
+
+class JsonExportSink(ExportSink):
+    """Потоковая запись JSON-документа: заголовок, массив sellers по одной строке, итог в конце"""
+
+    def __init__(self, filepath: Path):
+        super().__init__(filepath)
+        self._file = None
+        self._count = 0
+
+    def open(self, context: Dict[str, Any]):
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.filepath, 'w', encoding='utf-8')
+        self._count = 0
+        self._file.write('{\n')
+        self._file.write(f'  "timestamp": {json.dumps(context.get("timestamp", ""), ensure_ascii=False)},\n')
+        self._file.write(f'  "category_url": {json.dumps(context.get("category_url", ""), ensure_ascii=False)},\n')
+        self._file.write('  "sellers": [')
+
+    def write_row(self, row: Dict[str, Any]):
+        body = json.dumps(row, ensure_ascii=False, indent=2).replace('\n', '\n    ')
+        self._file.write(('\n    ' if self._count == 0 else ',\n    ') + body)
+        self._count += 1
+
+    def close(self) -> Optional[Path]:
+        if not self._file:
+            return None
+        self._file.write('\n  ]' if self._count else ']')
+        self._file.write(f',\n  "total_sellers": {self._count}\n}}\n')
+        self._file.close()
+        self._file = None
+        return self.filepath
+
+
+class ExcelExportSink(ExportSink):
+    """Excel-приёмник поверх ExcelExporter в потоковом (write-only) режиме"""
+
+    def __init__(self, output_dir: Path, filename: str, selected_fields: list = None):
+        from .excel_exporter import ExcelExporter
+        self.exporter = ExcelExporter(output_dir, filename, streaming=True)
+        super().__init__(self.exporter.filepath)
+        self.selected_fields = selected_fields
+
+    def open(self, context: Dict[str, Any]):
+        self.exporter.begin(self.selected_fields, is_sellers=True)
+
+    def write_row(self, row: Dict[str, Any]):
+        self.exporter.append(row)
+
+    def close(self) -> Optional[Path]:
+        return self.filepath if self.exporter.finish() else None
+
+
+def _open_text_stream(filepath: Path, compression: str = 'none'):
+    """Открывает текстовый поток на запись с опциональным сжатием gzip/zstd"""
+    if compression == 'gzip':
+        return gzip.open(filepath, 'wt', encoding='utf-8', newline='')
+    if compression == 'zstd':
+        import zstandard
+        raw = open(filepath, 'wb')
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw), encoding='utf-8', newline='')
+    return open(filepath, 'w', encoding='utf-8', newline='')
+
+
+def resolve_compression(compression: Optional[str]) -> str:
+    """Проверяет доступность сжатия; zstd без пакета zstandard заменяется на gzip"""
+    compression = (compression or 'none').lower()
+    if compression not in EXPORT_COMPRESSIONS:
+        return 'none'
+    if compression == 'zstd':
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            logger.warning("Пакет zstandard не установлен, используется gzip")
+            return 'gzip'
+    return compression
+
+
+def is_parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class CsvExportSink(ExportSink):
+    """Потоковая запись CSV: заголовок при открытии, затем по строке на продавца"""
+
+    def __init__(self, filepath: Path, compression: str = 'none'):
+        self.compression = resolve_compression(compression)
+        super().__init__(Path(str(filepath) + COMPRESSION_SUFFIXES[self.compression]))
+        self._file = None
+        self._writer = None
+
+    def open(self, context: Dict[str, Any]):
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        self._file = _open_text_stream(self.filepath, self.compression)
+        self._writer = csv.DictWriter(self._file, fieldnames=SELLER_EXPORT_FIELDS, extrasaction='ignore')
+        self._writer.writeheader()
+
+    def write_row(self, row: Dict[str, Any]):
+        self._writer.writerow(row)
+
+    def close(self) -> Optional[Path]:
+        if not self._file:
+            return None
+        self._file.close()
+        self._file = None
+        return self.filepath
+
+
+class JsonLinesExportSink(ExportSink):
+    """Потоковая запись JSON Lines: один JSON-объект продавца на строку"""
+
+    def __init__(self, filepath: Path, compression: str = 'none'):
+        self.compression = resolve_compression(compression)
+        super().__init__(Path(str(filepath) + COMPRESSION_SUFFIXES[self.compression]))
+        self._file = None
+
+    def open(self, context: Dict[str, Any]):
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        self._file = _open_text_stream(self.filepath, self.compression)
+
+    def write_row(self, row: Dict[str, Any]):
+        self._file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def close(self) -> Optional[Path]:
+        if not self._file:
+            return None
+        self._file.close()
+        self._file = None
+        return self.filepath
+
+
+class ParquetExportSink(ExportSink):
+    """
+    Запись Parquet через pyarrow пачками по PARQUET_BATCH_SIZE строк.
+    Заказы и отзывы пишутся как int64, рейтинг — как float64 (из готовых *_value строки).
+    """
+
+    def __init__(self, filepath: Path, compression: str = 'none'):
+        super().__init__(filepath)
+        # Для Parquet сжатие задается кодеком внутри файла
+        self.codec = {'gzip': 'gzip', 'zstd': 'zstd'}.get((compression or 'none').lower(), 'snappy')
+        self._writer = None
+        self._schema = None
+        self._batch: List[Dict[str, Any]] = []
+
+    def open(self, context: Dict[str, Any]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        self._schema = pa.schema([
+            ('seller_id', pa.string()),
+            ('seller_name', pa.string()),
+            ('company_name', pa.string()),
+            ('inn', pa.string()),
+            ('orders_count', pa.int64()),
+            ('reviews_count', pa.int64()),
+            ('average_rating', pa.float64()),
+            ('working_time', pa.string()),
+            ('seller_link', pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(str(self.filepath), self._schema, compression=self.codec)
+
+    def write_row(self, row: Dict[str, Any]):
+        typed = dict(row)
+        typed['orders_count'] = row.get('orders_count_value')
+        typed['reviews_count'] = row.get('reviews_count_value')
+        typed['average_rating'] = row.get('average_rating_value')
+        self._batch.append(typed)
+        if len(self._batch) >= PARQUET_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if not self._batch:
+            return
+        import pyarrow as pa
+        self._writer.write_table(pa.Table.from_pylist(self._batch, schema=self._schema))
+        self._batch = []
+
+    def close(self) -> Optional[Path]:
+        if not self._writer:
+            return None
+        self._flush()
+        self._writer.close()
+        self._writer = None
+        return self.filepath
+
+
+def create_sink(fmt: str, output_dir: Path, base_name: str, selected_fields: list = None,
+                compression: str = 'none') -> Optional[ExportSink]:
+    """Создает приёмник по имени формата (None, если формат недоступен)"""
+    if fmt == 'excel':
+        return ExcelExportSink(output_dir, base_name, selected_fields)
+    if fmt == 'json':
+        return JsonExportSink(output_dir / f"{base_name}.json")
+    if fmt == 'csv':
+        return CsvExportSink(output_dir / f"{base_name}.csv", compression)
+    if fmt == 'jsonl':
+        return JsonLinesExportSink(output_dir / f"{base_name}.jsonl", compression)
+    if fmt == 'parquet':
+        if not is_parquet_available():
+            logger.warning("pyarrow не установлен, экспорт в Parquet пропущен")
+            return None
+        return ParquetExportSink(output_dir / f"{base_name}.parquet", compression)
+    logger.warning(f"Неизвестный формат экспорта: {fmt}")
+    return None
+
+
+class ExportWriter:
+    """
+    Строит нормализованную строку каждого продавца ровно один раз и раздаёт её
+    всем зарегистрированным приёмникам. Потокобезопасен: строки можно писать
+    из воркеров прямо во время парсинга.
+    """
+
+    def __init__(self, seller_meta: Optional[Dict[str, Dict[str, str]]] = None,
+                 row_filter: Optional[Callable[[Dict[str, Any]], bool]] = None):
+        self.seller_meta = seller_meta if seller_meta is not None else {}
+        self.row_filter = row_filter
+        self.sinks: List[ExportSink] = []
+        self.rows_written = 0
+        self._seen_ids = set()
+        self._lock = threading.Lock()
+        self._opened = False
+        self._closed = False
+        self._files: Dict[str, Path] = {}
+
+    def add_sink(self, name: str, sink: ExportSink) -> 'ExportWriter':
+        sink.name = name
+        self.sinks.append(sink)
+        return self
+
+    def open(self, category_url: str = ''):
+        context = {
+            'timestamp': datetime.now().strftime("%d.%m.%Y_%H-%M-%S"),
+            'category_url': category_url,
+        }
+        with self._lock:
+            for sink in list(self.sinks):
+                try:
+                    sink.open(context)
+                except Exception as e:
+                    logger.error(f"Ошибка открытия приёмника экспорта {sink.name}: {e}")
+                    self.sinks.remove(sink)
+            self._opened = True
+
+    def write_seller(self, seller) -> Optional[Dict[str, Any]]:
+        """Нормализует продавца и пишет строку во все приёмники. Возвращает строку или None."""
+        if not getattr(seller, 'success', False):
+            return None
+        row = build_seller_row(seller, self.seller_meta)
+        with self._lock:
+            if not self._opened or self._closed:
+                return None
+            sid = row['seller_id']
+            if sid and sid in self._seen_ids:
+                return None
+            if self.row_filter and not self.row_filter(row):
+                return None
+            self._seen_ids.add(sid)
+            for sink in self.sinks:
+                try:
+                    sink.write_row(row)
+                except Exception as e:
+                    logger.error(f"Ошибка записи в приёмник {sink.name}: {e}")
+            self.rows_written += 1
+        return row
+
+    def close(self) -> Dict[str, Path]:
+        """Закрывает все приёмники (идемпотентно) и возвращает {имя: путь} созданных файлов"""
+        with self._lock:
+            if self._closed:
+                return dict(self._files)
+            self._closed = True
+            for sink in self.sinks:
+                try:
+                    path = sink.close()
+                    if path and Path(path).exists():
+                        self._files[sink.name] = Path(path)
+                except Exception as e:
+                    logger.error(f"Ошибка закрытия приёмника {sink.name}: {e}")
+            logger.info(f"Экспорт завершен: {self.rows_written} строк, файлы: {[str(p) for p in self._files.values()]}")
+            return dict(self._files)
@@ -0,0 +1,226 @@
+"""
+Допуск драйверов Chrome по ресурсам хоста.
+
+Новый драйвер получает аренду, только если после его запуска у системы останется запас
+свободной памяти и CPU не перегружен. Средний RSS одного драйвера (chromedriver со всеми
+дочерними процессами Chrome) измеряется по живым арендам, до первых замеров берется оценка.
+Драйвер, разросшийся выше DRIVER_RSS_LIMIT_MB, воркер пересоздает между запросами.
+
+Нужен psutil; без него действует статический предел (ResourceManager.MAX_TOTAL_WORKERS).
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set
+
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+_UNSET = object()
+
+
+def _load_psutil():
+    try:
+        import psutil
+        return psutil
+    except ImportError:
+        return None
+
+
+class AdmissionTimeout(RuntimeError):
+    """Запас ресурсов для нового драйвера так и не появился"""
+
+
+class AdmissionCancelled(AdmissionTimeout):
+    """Ожидание аренды прервано: парсинг остановлен"""
+
+
+@dataclass
+class HostSample:
+    available_mb: float
+    cpu_percent: float
+    # Средний RSS одного драйвера: по замерам живых драйверов или оценка
+    driver_rss_mb: float
+    drivers_rss_mb: float
+
+
+class DriverLease:
+    """Разрешение на один запущенный драйвер; pid — процесс chromedriver"""
+
+    def __init__(self, profile: str):
+        self.profile = profile
+        self.pid: Optional[int] = None
+        self.rss_mb: Optional[float] = None
+        self._checked_at = time.monotonic()
+
+
+class DriverAdmission:
+
+    # Свободная память, которую всегда оставляем системе
+    MIN_FREE_MB = 1024
+    # RSS драйвера до первых замеров
+    DRIVER_RSS_ESTIMATE_MB = 350
+    # Выше этого RSS драйвер пересоздается
+    DRIVER_RSS_LIMIT_MB = 1536
+    # При такой загрузке CPU новые драйверы не выдаются
+    MAX_CPU_PERCENT = 90.0
+    # Верхняя граница даже на больших хостах
+    MAX_DRIVERS = 48
+    SAMPLE_INTERVAL = 2.0
+    RECYCLE_CHECK_INTERVAL = 30.0
+    WAIT_STEP = 2.0
+    ADMISSION_TIMEOUT = 600.0
+
+    def __init__(self, static_limit: int, psutil_module: Any = _UNSET):
+        self.static_limit = static_limit
+        self._psutil = _load_psutil() if psutil_module is _UNSET else psutil_module
+        self._cond = threading.Condition()
+        self._leases: Set[DriverLease] = set()
+        self._sample_lock = threading.Lock()
+        self._sample: Optional[HostSample] = None
+        self._sampled_at = 0.0
+        if self._psutil is None:
+            logger.info(f"psutil не установлен: предел драйверов статический ({static_limit})")
+
+    @property
+    def enabled(self) -> bool:
+        return self._psutil is not None
+
+    def live_count(self) -> int:
+        with self._cond:
+            return len(self._leases)
+
+    def sample(self, force: bool = False) -> Optional[HostSample]:
+        """Замер хоста; чаще SAMPLE_INTERVAL берется прошлый"""
+        if self._psutil is None:
+            return None
+        with self._sample_lock:
+            now = time.monotonic()
+            if not force and self._sample is not None and now - self._sampled_at < self.SAMPLE_INTERVAL:
+                return self._sample
+            with self._cond:
+                leases = list(self._leases)
+            measured = []
+            for lease in leases:
+                if lease.pid is not None:
+                    lease.rss_mb = self._tree_rss_mb(lease.pid)
+                    if lease.rss_mb:
+                        measured.append(lease.rss_mb)
+            driver_rss = max(sum(measured) / len(measured), 1.0) if measured else self.DRIVER_RSS_ESTIMATE_MB
+            self._sample = HostSample(
+                available_mb=self._psutil.virtual_memory().available / 1024 / 1024,
+                cpu_percent=self._psutil.cpu_percent(interval=None),
+                driver_rss_mb=driver_rss,
+                drivers_rss_mb=sum(measured),
+            )
+            self._sampled_at = now
+            return self._sample
+
+    def effective_limit(self) -> int:
+        """Сколько драйверов хост выдержит сейчас: живые плюс те, на которые хватает запаса"""
+        sample = self.sample()
+        if sample is None:
+            return self.static_limit
+        with self._cond:
+            leases = list(self._leases)
+        # Только что запущенные драйверы еще не набрали память — резервируем ее заранее
+        reserved = sum(max(0.0, sample.driver_rss_mb - (lease.rss_mb or 0.0)) for lease in leases)
+        headroom = sample.available_mb - self.MIN_FREE_MB - reserved
+        extra = max(0, int(headroom // sample.driver_rss_mb))
+        if sample.cpu_percent >= self.MAX_CPU_PERCENT:
+            extra = 0
+        return max(1, min(self.MAX_DRIVERS, len(leases) + extra))
+
+    def acquire(self, profile: str = "", timeout: Optional[float] = None, stop_event=None) -> DriverLease:
+        """
+        Выдает аренду, когда есть запас ресурсов. Первый драйвер выдается всегда, иначе
+        ждет освобождения или запаса не дольше timeout и бросает AdmissionTimeout.
+        stop_event — любой объект с is_set(): остановка прерывает ожидание с AdmissionCancelled
+        """
+        timeout = self.ADMISSION_TIMEOUT if timeout is None else timeout
+        lease = self._try_acquire(profile)
+        if lease is not None:
+            return lease
+        logger.info(f"Нет запаса ресурсов для нового драйвера ({self._describe()}), ожидание")
+        deadline = time.monotonic() + timeout
+        with tracing.span('driver.admission_wait'):
+            while True:
+                if stop_event is not None and stop_event.is_set():
+                    raise AdmissionCancelled("Ожидание ресурсов для нового драйвера прервано остановкой")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AdmissionTimeout(f"Нет ресурсов для нового драйвера за {timeout:.0f} с ({self._describe()})")
+                with self._cond:
+                    self._cond.wait(min(self.WAIT_STEP, remaining))
+                lease = self._try_acquire(profile)
+                if lease is not None:
+                    return lease
+
+    def _try_acquire(self, profile: str) -> Optional[DriverLease]:
+        limit = self.effective_limit()
+        with self._cond:
+            if self._leases and len(self._leases) >= limit:
+                return None
+            lease = DriverLease(profile)
+            self._leases.add(lease)
+            return lease
+
+    def attach(self, lease: DriverLease, pid: Optional[int]):
+        lease.pid = pid
+
+    def release(self, lease: DriverLease):
+        with self._cond:
+            self._leases.discard(lease)
+            self._cond.notify_all()
+
+    def should_recycle(self, lease: DriverLease) -> bool:
+        """RSS драйвера выше DRIVER_RSS_LIMIT_MB; проверяется не чаще RECYCLE_CHECK_INTERVAL"""
+        if self._psutil is None or lease.pid is None:
+            return False
+        now = time.monotonic()
+        if now - lease._checked_at < self.RECYCLE_CHECK_INTERVAL:
+            return False
+        lease._checked_at = now
+        lease.rss_mb = self._tree_rss_mb(lease.pid)
+        return lease.rss_mb > self.DRIVER_RSS_LIMIT_MB
+
+    def status(self) -> Dict[str, Any]:
+        sample = self.sample()
+        status: Dict[str, Any] = {
+            'effective_max_workers': self.effective_limit(),
+            'live_drivers': self.live_count(),
+            'admission': 'psutil' if sample is not None else 'static',
+        }
+        if sample is not None:
+            status.update(
+                host_available_mb=round(sample.available_mb),
+                host_cpu_percent=round(sample.cpu_percent, 1),
+                driver_rss_mb=round(sample.driver_rss_mb),
+            )
+        return status
+
+    def _describe(self) -> str:
+        sample = self.sample()
+        if sample is None:
+            return f"драйверов {self.live_count()}/{self.static_limit}"
+        return (
+            f"драйверов {self.live_count()}, свободно {sample.available_mb:.0f} МБ, "
+            f"CPU {sample.cpu_percent:.0f}%, RSS драйвера ~{sample.driver_rss_mb:.0f} МБ"
+        )
+
+    def _tree_rss_mb(self, pid: int) -> float:
+        psutil = self._psutil
+        try:
+            process = psutil.Process(pid)
+            processes = [process] + process.children(recursive=True)
+        except psutil.Error:
+            return 0.0
+        total = 0
+        for proc in processes:
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / 1024 / 1024
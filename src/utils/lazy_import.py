@@ -0,0 +1,20 @@
+"""
+Ленивые экспорты пакетов: имя из __init__ импортируется из подмодуля при первом обращении.
+Так импорт, например, src.telegram.delivery не тянет aiogram через src.telegram.bot_manager.
+"""
+import importlib
+import sys
+from typing import Any, Callable, Dict
+
+
+def lazy_exports(package: str, exports: Dict[str, str]) -> Callable[[str], Any]:
+    """Возвращает __getattr__ для пакета; exports — {имя: относительный путь подмодуля}"""
+    def __getattr__(name: str) -> Any:
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module, package), name)
+        # Следующие обращения идут напрямую, без __getattr__
+        setattr(sys.modules[package], name, value)
+        return value
+    return __getattr__
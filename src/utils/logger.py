@@ -1,10 +1,124 @@
-
+import atexit
+import json
 import logging
 import logging.handlers
+import queue
+import threading
+import time
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+
+from .config_loader import load_flag
+
+# Слушатель очереди логов (режим LOG_QUEUE): записи из потоков воркеров пишутся в файлы в его потоке
+_listener = None
+_listener_lock = threading.Lock()
+
+# Атрибуты LogRecord, которые не являются полями extra=...
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна JSON-строка; поля из extra=... попадают в объект как есть"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class ItemLogAggregator:
+    """
+    Сворачивает поэлементные сообщения (товар/продавец обработан) в периодическую строку INFO.
+    Подробности по каждому элементу остаются на уровне DEBUG у вызывающего кода.
+    """
+
+    def __init__(self, logger: logging.Logger, title: str, interval: float = 10.0):
+        self.logger = logger
+        self.title = title
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._window = {'success': 0, 'error': 0, 'cached': 0}
+        self._total = 0
+        self._window_started = time.monotonic()
+
+    def record(self, success: bool, cached: bool = False):
+        with self._lock:
+            self._window['success' if success else 'error'] += 1
+            if cached:
+                self._window['cached'] += 1
+            self._total += 1
+            if time.monotonic() - self._window_started < self.interval:
+                return
+            line = self._take_line()
+        self.logger.info(line)
+
+    def flush(self):
+        """Выводит накопленное (например, в конце этапа) и сбрасывает общий счетчик"""
+        with self._lock:
+            line = self._take_line() if sum(self._window.values()) else None
+            self._total = 0
+        if line:
+            self.logger.info(line)
 
-def setup_logging(log_level="INFO", log_dir=None):
+    def _take_line(self) -> str:
+        elapsed = time.monotonic() - self._window_started
+        window = self._window
+        processed = window['success'] + window['error']
+        line = (
+            f"{self.title}: +{processed} за {elapsed:.0f} с "
+            f"(успешно {window['success']}, ошибок {window['error']}, из кэша {window['cached']}), всего {self._total}"
+        )
+        self._window = {'success': 0, 'error': 0, 'cached': 0}
+        self._window_started = time.monotonic()
+        return line
+
+
+def attach_handler(handler: logging.Handler):
+    """Подключает обработчик к логированию: в режиме очереди — к слушателю, иначе к корневому логгеру"""
+    with _listener_lock:
+        if _listener is not None:
+            _listener.handlers = _listener.handlers + (handler,)
+            return
+    logging.getLogger().addHandler(handler)
+
+
+def detach_handler(handler: logging.Handler):
+    with _listener_lock:
+        if _listener is not None and handler in _listener.handlers:
+            _listener.handlers = tuple(h for h in _listener.handlers if h is not handler)
+            return
+    logging.getLogger().removeHandler(handler)
+
+
+def stop_logging_queue():
+    """Дописывает оставшиеся в очереди записи и останавливает поток слушателя"""
+    global _listener
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def setup_logging(log_level="INFO", log_dir=None, use_queue=None, json_format=None):
+    """
+    use_queue/json_format по умолчанию берутся из LOG_QUEUE/LOG_JSON (переменная окружения или config.txt).
+    В режиме очереди корневой логгер только кладет запись в очередь, а консоль и файлы
+    обслуживает QueueListener в отдельном потоке. JSON применяется к файлам логов.
+    """
+    global _listener
     
     if log_dir is None:
         log_dir = Path(__file__).parent.parent.parent / "logs"
@@ -12,23 +126,30 @@ def setup_logging(log_level="INFO", log_dir=None):
     log_dir = Path(log_dir)
     log_dir.mkdir(exist_ok=True)
     
-
+    if use_queue is None:
+        use_queue = load_flag('LOG_QUEUE')
+    if json_format is None:
+        json_format = load_flag('LOG_JSON')
+    
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
+    file_formatter = JsonFormatter() if json_format else formatter
     
 
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, log_level.upper()))
     
 
+    stop_logging_queue()
     root_logger.handlers.clear()
+    handlers = []
     
 
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+    handlers.append(console_handler)
     
 
     log_file = log_dir / f"ozon_parser_{datetime.now().strftime('%Y%m%d')}.log"
@@ -39,8 +160,8 @@ def setup_logging(log_level="INFO", log_dir=None):
         encoding='utf-8'
     )
     file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(formatter)
-    root_logger.addHandler(file_handler)
+    file_handler.setFormatter(file_formatter)
+    handlers.append(file_handler)
     
 
     error_file = log_dir / f"errors_{datetime.now().strftime('%Y%m%d')}.log"
@@ -51,7 +172,18 @@ def setup_logging(log_level="INFO", log_dir=None):
         encoding='utf-8'
     )
     error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(formatter)
-    root_logger.addHandler(error_handler)
+    error_handler.setFormatter(file_formatter)
+    handlers.append(error_handler)
+    
+    if use_queue:
+        log_queue = queue.SimpleQueue()
+        root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        with _listener_lock:
+            _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            _listener.start()
+        atexit.register(stop_logging_queue)
+    else:
+        for handler in handlers:
+            root_logger.addHandler(handler)
     
-    logging.info("Логирование настроено успешно")
\ No newline at end of file
+    logging.info("Логирование настроено успешно" + (" (очередь)" if use_queue else ""))
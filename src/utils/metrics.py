@@ -0,0 +1,297 @@
+"""
+Метрики приложения в текстовом формате Prometheus и локальный HTTP-эндпоинт /metrics.
+
+Счетчики и гистограммы обновляются по месту одной операцией под локом. Мгновенные
+значения (сессии, воркеры, очередь доставки) — gauge с функцией, которая вызывается
+только при запросе /metrics, поэтому пока эндпоинт никто не опрашивает, метрики
+почти ничего не стоят. Сервер включается ключом METRICS_ENABLED=true в config.txt.
+"""
+import logging
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .config_loader import MetricsConfig
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Секунды: от разбора JSON до долгого прохождения антибота
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 240)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Значение задается вручную (set/inc/dec) или функцией, вызываемой при сборе"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], object]] = None
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], object]):
+        """function() -> число или {кортеж значений меток: число}"""
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                collected = self._function()
+            except Exception as e:
+                logger.debug(f"Ошибка сбора метрики {self.name}: {e}")
+                return
+            items = collected.items() if isinstance(collected, dict) else [((), collected)]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # {метки: [счетчики по корзинам..., count, sum]}
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += 1
+            state[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {_format_value(cumulative)}"
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {_format_value(state[-2])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(state[-2])}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-1])}"
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# Метрики, которые обновляются из нескольких модулей
+ITEMS = counter("ozon_items_total", "Обработанные товары и продавцы по результату", ("kind", "result"))
+FETCH_SECONDS = histogram("ozon_fetch_seconds", "Время загрузки одной страницы API (без кэша)", ("kind",))
+WORKER_RESTARTS = counter("ozon_worker_restarts_total", "Пересоздания воркеров после блокировки", ("kind",))
+DRIVERS_LIVE = gauge("ozon_drivers_live", "Открытые Chrome драйверы")
+DRIVERS_LIVE.set(0)
+DRIVER_START_SECONDS = histogram("ozon_driver_start_seconds", "Время запуска Chrome драйвера")
+RUNS = counter("ozon_runs_total", "Завершенные запуски парсинга по статусу", ("status",))
+DELIVERY_JOBS = counter("ozon_delivery_jobs_total", "Задания доставки Telegram по результату", ("kind", "result"))
+DELIVERY_SECONDS = histogram("ozon_delivery_seconds", "Время выполнения задания доставки", ("kind",))
+
+
+def record_item(kind: str, success: bool, fetched: bool, started: float):
+    """Учитывает один товар/продавца; started — time.perf_counter() перед загрузкой"""
+    if not fetched:
+        ITEMS.inc(kind=kind, result='cached')
+        return
+    ITEMS.inc(kind=kind, result='success' if success else 'error')
+    FETCH_SECONDS.observe(time.perf_counter() - started, kind=kind)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Опросы Prometheus каждые несколько секунд не должны засорять лог
+        pass
+
+
+class MetricsServer:
+
+    def __init__(self, config: MetricsConfig):
+        self.config = config
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1] if self._server else self.config.port
+
+    def start(self) -> bool:
+        if self._server is not None:
+            return True
+        try:
+            self._server = ThreadingHTTPServer((self.config.host, self.config.port), _MetricsHandler)
+        except OSError as e:
+            logger.error(f"Не удалось запустить эндпоинт метрик на {self.config.host}:{self.config.port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        logger.info(f"Метрики Prometheus: http://{self.config.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+_server: Optional[MetricsServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(config: Optional[MetricsConfig]) -> Optional[MetricsServer]:
+    """Запускает эндпоинт, если он включен в конфигурации (config=None — выключен)"""
+    global _server
+    if config is None:
+        return None
+    with _server_lock:
+        if _server is None:
+            server = MetricsServer(config)
+            if not server.start():
+                return None
+            _server = server
+    return _server
+
+
+def stop_metrics_server():
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.stop()
+            _server = None
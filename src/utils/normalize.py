@@ -0,0 +1,108 @@
+"""
+Единый нормализатор числовых метрик продавца: заказы, отзывы, рейтинг.
+
+Строки с Ozon ("897 K", "1,6 M", "5 972", "4,8") разбираются один раз при парсинге
+продавца; фильтры, сортировка, топ-K и экспорт работают с уже готовыми числами.
+"""
+import heapq
+import re
+from typing import Any, Iterable, List, Optional
+
+# Поле отображаемой строки -> поле типизированного значения
+TYPED_SELLER_FIELDS = {
+    'orders_count': 'orders_count_value',
+    'reviews_count': 'reviews_count_value',
+    'average_rating': 'average_rating_value',
+}
+
+_SPACES = ('\u00a0', '\u202f', '\u2009')
+_MILLION_RE = re.compile(r'\s*(m|млн\.?)\s*$', re.I)
+_THOUSAND_RE = re.compile(r'\s*(k|тыс\.?)\s*$', re.I)
+
+
+def parse_count_value(value, default: Optional[int] = 0) -> Optional[int]:
+    """Преобразует строковое значение счетчика в int.
+    Поддержка: 897 K, 1,6 M, 40,2 K (запятая — десятичная), 5 972, 1 315 (пробел — тысячи),
+    тыс./млн. Для пустого или нераспознанного значения возвращает default.
+    """
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return default
+    if isinstance(value, (int, float)):
+        return int(value)
+    s = str(value).strip()
+    for space in _SPACES:
+        s = s.replace(space, ' ')
+    s = s.lower()
+    if not s:
+        return default
+
+    multiplier = 1
+    # Убираем суффикс K/M (или тыс/млн), остаётся только числовая часть
+    if _MILLION_RE.search(s):
+        multiplier = 1_000_000
+        s = _MILLION_RE.sub('', s)
+    elif _THOUSAND_RE.search(s):
+        multiplier = 1_000
+        s = _THOUSAND_RE.sub('', s)
+
+    # Пробел — разделитель тысяч (5 972 → 5972), запятая — десятичная (1,6 → 1.6)
+    s = s.replace(' ', '').replace(',', '.')
+    try:
+        return int(round(float(s) * multiplier))
+    except ValueError:
+        return default
+
+
+def parse_rating_value(value) -> Optional[float]:
+    """Преобразует рейтинг вида "4,8" в float (None, если значения нет)"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    s = str(value).strip().replace(',', '.')
+    try:
+        return float(s) if s else None
+    except ValueError:
+        return None
+
+
+def seller_metric(seller: Any, field: str):
+    """
+    Типизированное значение метрики продавца (SellerInfo или строки экспорта).
+    Если готового значения нет (старые данные), строка разбирается нормализатором.
+    """
+    typed_field = TYPED_SELLER_FIELDS[field]
+    getter = seller.get if isinstance(seller, dict) else lambda name: getattr(seller, name, None)
+    value = getter(typed_field)
+    if value is not None:
+        return value
+    if field == 'average_rating':
+        return parse_rating_value(getter(field))
+    return parse_count_value(getter(field), default=None)
+
+
+def _sort_key(field: str):
+    # Продавцы без значения всегда идут после продавцов с любым значением
+    def key(seller):
+        value = seller_metric(seller, field)
+        return (value is not None, value if value is not None else 0)
+    return key
+
+
+def sort_sellers(sellers: Iterable[Any], field: str = 'orders_count', descending: bool = True) -> List[Any]:
+    """Сортирует продавцов по числовой метрике; без значения — в конце"""
+    items = list(sellers)
+    if descending:
+        return sorted(items, key=_sort_key(field), reverse=True)
+    with_value = sorted((s for s in items if seller_metric(s, field) is not None), key=_sort_key(field))
+    return with_value + [s for s in items if seller_metric(s, field) is None]
+
+
+def top_sellers(sellers: Iterable[Any], k: int, field: str = 'orders_count') -> List[Any]:
+    """Топ-K продавцов по метрике без полной сортировки списка"""
+    if k <= 0:
+        return []
+    key = _sort_key(field)
+    return [s for s in heapq.nlargest(k, sellers, key=key) if key(s)[0]]
@@ -0,0 +1,180 @@
+"""
+Профилирование одного запуска: CPU всех потоков парсинга и снимки tracemalloc на границах этапов.
+
+Включается флагом PROFILE_RUN=true (переменная окружения или config.txt). Если установлен
+yappi, используется он (видит все потоки сразу), иначе в каждом потоке, получившем запуск
+через tracing.propagate(), работает свой cProfile. Результаты пишутся в папку запуска,
+которая в этом случае не удаляется после отправки. Одновременно профилируется один запуск.
+"""
+import cProfile
+import functools
+import io
+import logging
+import pstats
+import re
+import threading
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк попадает в сводки CPU и аллокаций
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+TRACEMALLOC_FRAMES = 10
+
+_active_lock = threading.Lock()
+_active: Optional['RunProfiler'] = None
+
+
+def _load_yappi():
+    try:
+        import yappi
+        return yappi
+    except ImportError:
+        return None
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r'[^\w.-]+', '_', name) or 'thread'
+
+
+class RunProfiler:
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        # Папка запуска становится известна после сбора ссылок
+        self.output_dir: Optional[Path] = None
+        self._lock = threading.Lock()
+        self._profiles: List[Tuple[str, cProfile.Profile]] = []
+        self._allocations: List[str] = []
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._owns_tracemalloc = False
+        self._yappi = None
+
+    @classmethod
+    def acquire(cls, label: str = "") -> Optional['RunProfiler']:
+        """Запускает профилировщик, если другой запуск сейчас не профилируется"""
+        global _active
+        with _active_lock:
+            if _active is not None:
+                logger.warning("Профилирование уже идет для другого запуска, этот запуск не профилируется")
+                return None
+            _active = cls(label)
+        _active._start()
+        return _active
+
+    def _start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._owns_tracemalloc = True
+        self._previous = self._snapshot()
+        self._yappi = _load_yappi()
+        if self._yappi is not None:
+            self._yappi.set_clock_type('wall')
+            self._yappi.start(builtins=False, profile_threads=True)
+        logger.info(f"Профилирование запуска включено ({'yappi' if self._yappi else 'cProfile по потокам'})")
+
+    def wrap(self, fn: Callable) -> Callable:
+        """Профилирует fn в потоке, где он выполняется (с yappi не нужно — он видит все потоки)"""
+        if self._yappi is not None:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as e:
+                # Python 3.12+: cProfile не может работать в нескольких потоках одновременно
+                logger.debug(f"cProfile недоступен в потоке {threading.current_thread().name}: {e}")
+                return fn(*args, **kwargs)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+                with self._lock:
+                    self._profiles.append((threading.current_thread().name, profile))
+        return wrapper
+
+    def stage_boundary(self, stage: str):
+        """Снимок tracemalloc: топ мест аллокаций, выросших с прошлой границы"""
+        snapshot = self._snapshot()
+        with self._lock:
+            previous, self._previous = self._previous, snapshot
+        stats = snapshot.compare_to(previous, 'lineno') if previous is not None else snapshot.statistics('lineno')
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"== {stage}: занято {current / 1e6:.1f} МБ, пик {peak / 1e6:.1f} МБ =="]
+        lines.extend(str(stat) for stat in stats[:TOP_ALLOCATIONS])
+        with self._lock:
+            self._allocations.append("\n".join(lines))
+
+    def finish(self, fallback_dir: Path) -> Optional[Path]:
+        """Останавливает профилирование и пишет результаты; возвращает папку с ними"""
+        global _active
+        output_dir = Path(self.output_dir or fallback_dir)
+        try:
+            self.stage_boundary('finish')
+            output_dir.mkdir(parents=True, exist_ok=True)
+            if self._yappi is not None:
+                self._write_yappi(output_dir)
+            else:
+                self._write_cprofile(output_dir)
+            (output_dir / 'tracemalloc.txt').write_text("\n\n".join(self._allocations) + "\n", encoding='utf-8')
+            logger.info(f"Профиль запуска сохранен: {output_dir}")
+            return output_dir
+        except Exception as e:
+            logger.error(f"Не удалось сохранить профиль запуска: {e}")
+            return None
+        finally:
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+            with _active_lock:
+                if _active is self:
+                    _active = None
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        # Собственные аллокации tracemalloc в отчет не попадают
+        return tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+
+    def _write_cprofile(self, output_dir: Path):
+        by_thread: Dict[str, pstats.Stats] = {}
+        combined: Optional[pstats.Stats] = None
+        with self._lock:
+            profiles = list(self._profiles)
+        for thread_name, profile in profiles:
+            # Воркер, пересозданный после блокировки, попадает в тот же файл потока
+            if thread_name in by_thread:
+                by_thread[thread_name].add(profile)
+            else:
+                by_thread[thread_name] = pstats.Stats(profile)
+            if combined is None:
+                combined = pstats.Stats(profile)
+            else:
+                combined.add(profile)
+        for thread_name, stats in by_thread.items():
+            stats.dump_stats(str(output_dir / f"cpu_{_safe_name(thread_name)}.prof"))
+        if combined is not None:
+            combined.dump_stats(str(output_dir / "cpu_all.prof"))
+            self._write_summary(output_dir, combined)
+
+    def _write_yappi(self, output_dir: Path):
+        yappi = self._yappi
+        yappi.stop()
+        try:
+            for thread in yappi.get_thread_stats():
+                stats = yappi.get_func_stats(ctx_id=thread.id)
+                if not stats.empty():
+                    stats.save(str(output_dir / f"cpu_{_safe_name(thread.name)}_{thread.id}.prof"), type='pstat')
+            all_path = output_dir / "cpu_all.prof"
+            yappi.get_func_stats().save(str(all_path), type='pstat')
+            self._write_summary(output_dir, pstats.Stats(str(all_path)))
+        finally:
+            yappi.clear_stats()
+
+    def _write_summary(self, output_dir: Path, stats: pstats.Stats):
+        buffer = io.StringIO()
+        stats.stream = buffer
+        stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        (output_dir / "cpu_summary.txt").write_text(buffer.getvalue(), encoding='utf-8')
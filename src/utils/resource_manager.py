@@ -4,10 +4,13 @@
 import logging
 import threading
 import time
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, List, Optional
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
+from .host_resources import DriverAdmission
+from .metrics import gauge
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -23,16 +26,27 @@ class ResourceManager:
     """Менеджер для динамического распределения воркеров между пользователями"""
     
     # Константы
+    # Без psutil — жесткий предел; с psutil реальный предел считает DriverAdmission по памяти и CPU
     MAX_TOTAL_WORKERS = 15
     MAX_WORKERS_PER_USER = 5
     MIN_WORKERS_PER_USER = 2
     SESSION_TIMEOUT_MINUTES = 30
+    # Прогресс сессий публикуется подписчикам не чаще, чем раз в этот интервал (секунды)
+    PROGRESS_NOTIFY_INTERVAL = 0.5
     
     def __init__(self):
         self._lock = threading.RLock()
         self._active_sessions: Dict[str, UserSession] = {}
         self._cleanup_thread = None
+        # Подписчики на изменения сессий (например, статус AppManager)
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        # Номер последнего собранного state(): подписчик отбрасывает состояния, пришедшие не по порядку
+        self._state_seq = 0
+        self._progress_notified_at = 0.0
+        # Выдает аренды на запуск драйверов Chrome (см. SeleniumManager.create_driver)
+        self.admission = DriverAdmission(self.MAX_TOTAL_WORKERS)
         self._start_cleanup_thread()
+        self._register_metrics()
         logger.info(f"ResourceManager инициализирован: макс {self.MAX_TOTAL_WORKERS} воркеров, макс {self.MAX_WORKERS_PER_USER} на пользователя")
     
     def _start_cleanup_thread(self):
@@ -49,6 +63,91 @@ class ResourceManager:
         self._cleanup_thread = threading.Thread(target=cleanup_loop, daemon=True)
         self._cleanup_thread.start()
     
+    def _register_metrics(self):
+        """Снимки состояния считаются только при запросе /metrics"""
+        gauge("ozon_active_sessions", "Активные сессии парсинга").set_function(self.get_active_users_count)
+        gauge("ozon_allocated_workers", "Воркеры, выделенные активным сессиям").set_function(
+            self._allocated_workers
+        )
+        gauge("ozon_effective_max_workers", "Предел драйверов с учетом ресурсов хоста").set_function(self.effective_max_workers)
+        gauge("ozon_driver_leases", "Выданные аренды драйверов Chrome").set_function(self.admission.live_count)
+        gauge("ozon_sessions_by_stage", "Активные сессии по этапу", ("stage",)).set_function(self._sessions_by_stage)
+        gauge("ozon_session_items", "Элементы активных сессий: всего и обработано", ("state",)).set_function(self._session_items)
+    
+    def _allocated_workers(self) -> int:
+        with self._lock:
+            return sum(session.allocated_workers for session in self._active_sessions.values())
+    
+    def effective_max_workers(self) -> int:
+        """Сколько воркеров (драйверов) можно держать сейчас: по ресурсам хоста или MAX_TOTAL_WORKERS"""
+        return self.admission.effective_limit()
+    
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        """
+        callback(state) вызывается после изменения сессий, state — см. state(). Вызовы идут
+        из разных потоков вне блокировки, поэтому подписчик сравнивает state['seq']
+        """
+        with self._lock:
+            self._listeners.append(callback)
+    
+    def remove_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+    
+    def state(self) -> Dict[str, Any]:
+        """
+        Компактное состояние сессий без форматирования: время старта — unix timestamp,
+        seq растет с каждым вызовом (более поздний снимок сессий — больший seq)
+        """
+        # Замер хоста (psutil) делается до блокировки: воркеры не должны ждать его в update_progress
+        effective_max_workers = self.effective_max_workers()
+        with self._lock:
+            self._state_seq += 1
+            return {
+                'seq': self._state_seq,
+                'total_active_users': len(self._active_sessions),
+                'total_allocated_workers': sum(session.allocated_workers for session in self._active_sessions.values()),
+                'effective_max_workers': effective_max_workers,
+                'sessions': {
+                    user_id: {
+                        'stage': session.current_stage,
+                        'workers': session.allocated_workers,
+                        'processed': session.processed_items,
+                        'total': session.total_items,
+                        'started': session.start_time.timestamp(),
+                    }
+                    for user_id, session in self._active_sessions.items()
+                },
+            }
+    
+    def _notify(self):
+        with self._lock:
+            listeners = list(self._listeners)
+        if not listeners:
+            return
+        state = self.state()
+        for callback in listeners:
+            try:
+                callback(state)
+            except Exception as e:
+                logger.debug(f"Ошибка подписчика ResourceManager: {e}")
+    
+    def _sessions_by_stage(self) -> Dict[tuple, int]:
+        with self._lock:
+            stages: Dict[tuple, int] = {}
+            for session in self._active_sessions.values():
+                stages[(session.current_stage,)] = stages.get((session.current_stage,), 0) + 1
+            return stages
+    
+    def _session_items(self) -> Dict[tuple, int]:
+        with self._lock:
+            sessions = list(self._active_sessions.values())
+        return {
+            ('total',): sum(session.total_items for session in sessions),
+            ('processed',): sum(session.processed_items for session in sessions),
+        }
+    
     def start_parsing_session(self, user_id: str, stage: str, total_items: int) -> int:
         """
         Начинает новую сессию парсинга для пользователя
@@ -90,14 +189,24 @@ class ResourceManager:
             
             allocated_workers = self._active_sessions[user_id].allocated_workers
             logger.info(f"Пользователь {user_id} получил {allocated_workers} воркеров для этапа {stage} (активных пользователей: {len(self._active_sessions)})")
-            
-            return allocated_workers
+        
+        self._notify()
+        return allocated_workers
     
     def update_progress(self, user_id: str, processed_items: int):
-        """Обновляет прогресс пользователя"""
+        """Обновляет прогресс пользователя; подписчики узнают о нем не чаще PROGRESS_NOTIFY_INTERVAL"""
         with self._lock:
-            if user_id in self._active_sessions:
-                self._active_sessions[user_id].processed_items = processed_items
+            session = self._active_sessions.get(user_id)
+            if session is None or session.processed_items == processed_items:
+                return
+            session.processed_items = processed_items
+            # Вызывается на каждый товар и продавца: промежуточные значения пропускаем,
+            # последнее значение этапа публикуется всегда
+            now = time.monotonic()
+            if processed_items != session.total_items and now - self._progress_notified_at < self.PROGRESS_NOTIFY_INTERVAL:
+                return
+            self._progress_notified_at = now
+        self._notify()
     
     def finish_parsing_session(self, user_id: str):
         """Завершает сессию парсинга пользователя"""
@@ -107,6 +216,9 @@ class ResourceManager:
                 logger.info(f"Завершена сессия пользователя {user_id}")
                 # Перераспределяем воркеры между оставшимися пользователями
                 self._redistribute_workers()
+            else:
+                return
+        self._notify()
     
     def get_active_users_count(self) -> int:
         """Возвращает количество активных пользователей"""
@@ -126,7 +238,9 @@ class ResourceManager:
             status = {
                 'total_active_users': len(self._active_sessions),
                 'total_allocated_workers': sum(session.allocated_workers for session in self._active_sessions.values()),
-                'sessions': {}
+                'sessions': {},
+                # effective_max_workers, live_drivers и замеры хоста
+                **self.admission.status(),
             }
             
             for user_id, session in self._active_sessions.items():
@@ -147,19 +261,23 @@ class ResourceManager:
         """Рассчитывает количество воркеров для нового пользователя"""
         active_users = len(self._active_sessions)
         
+        available_workers = self.effective_max_workers()
+        
         if active_users == 0:
-            # Первый пользователь получает максимум воркеров
-            return min(self.MAX_WORKERS_PER_USER, self._calculate_optimal_workers(total_items))
+            # Первый пользователь получает максимум воркеров, но не больше, чем выдержит хост
+            return max(1, min(self.MAX_WORKERS_PER_USER, self._calculate_optimal_workers(total_items), available_workers))
         
         # Рассчитываем справедливое распределение
-        available_workers = self.MAX_TOTAL_WORKERS
         target_users = active_users + 1  # Включаем нового пользователя
-        
-        workers_per_user = max(self.MIN_WORKERS_PER_USER, 
-                              min(self.MAX_WORKERS_PER_USER, 
-                                  available_workers // target_users))
-        
-        return workers_per_user
+        return self._fair_share(available_workers, target_users)
+    
+    def _fair_share(self, available_workers: int, users: int) -> int:
+        """Базовая доля пользователя: не меньше MIN_WORKERS_PER_USER, если сумма долей укладывается в предел"""
+        share = max(self.MIN_WORKERS_PER_USER, min(self.MAX_WORKERS_PER_USER, available_workers // users))
+        if share * users > available_workers:
+            # Предел хоста меньше минимума на всех: делим то, что есть, но хотя бы по одному воркеру
+            share = max(1, available_workers // users)
+        return share
     
     def _redistribute_workers(self):
         """Перераспределяет воркеры между всеми активными пользователями"""
@@ -167,12 +285,10 @@ class ResourceManager:
             return
         
         active_users = len(self._active_sessions)
-        available_workers = self.MAX_TOTAL_WORKERS
+        available_workers = self.effective_max_workers()
         
-        # Справедливое распределение без приоритета по времени
-        base_workers_per_user = max(self.MIN_WORKERS_PER_USER, 
-                                   min(self.MAX_WORKERS_PER_USER, 
-                                       available_workers // active_users))
+        # Справедливое распределение без приоритета по времени; сумма не превышает предел хоста
+        base_workers_per_user = self._fair_share(available_workers, active_users)
         
         # Распределяем базовое количество всем пользователям
         total_allocated = 0
@@ -199,10 +315,13 @@ class ResourceManager:
                 if all(s.allocated_workers >= self.MAX_WORKERS_PER_USER for s in user_list):
                     break
         
-        # Логируем новое распределение
-        logger.info(f"Справедливое распределение воркеров для {active_users} пользователей:")
+        # Логируем новое распределение одной строкой, подробности по пользователям — на DEBUG
+        logger.info(
+            f"Справедливое распределение {available_workers} воркеров для {active_users} пользователей: "
+            + ", ".join(f"{user_id}={session.allocated_workers}" for user_id, session in self._active_sessions.items())
+        )
         for user_id, session in self._active_sessions.items():
-            logger.info(f"  Пользователь {user_id}: {session.allocated_workers} воркеров ({session.current_stage})")
+            logger.debug(f"  Пользователь {user_id}: {session.allocated_workers} воркеров ({session.current_stage})")
     
     def _calculate_optimal_workers(self, total_items: int) -> int:
         """Рассчитывает оптимальное количество воркеров для количества элементов"""
@@ -233,6 +352,25 @@ class ResourceManager:
             
             if expired_users:
                 self._redistribute_workers()
+        if expired_users:
+            self._notify()
+
+# Глобальный экземпляр менеджера ресурсов создается при первом обращении, а не при импорте
+_resource_manager: Optional[ResourceManager] = None
+_resource_manager_lock = threading.Lock()
+
+
+def get_resource_manager() -> ResourceManager:
+    global _resource_manager
+    if _resource_manager is None:
+        with _resource_manager_lock:
+            if _resource_manager is None:
+                _resource_manager = ResourceManager()
+    return _resource_manager
+
 
-# Глобальный экземпляр менеджера ресурсов
-resource_manager = ResourceManager()
\ No newline at end of file
+def __getattr__(name):
+    # Совместимость со старым импортом: from ..utils.resource_manager import resource_manager
+    if name == 'resource_manager':
+        return get_resource_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
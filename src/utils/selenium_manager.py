@@ -8,18 +8,38 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium_stealth import stealth
-from typing import Optional
+from typing import Callable, Optional
+
+from . import tracing
+from .host_resources import DriverLease
+from .metrics import DRIVER_START_SECONDS, DRIVERS_LIVE
+from .resource_manager import get_resource_manager
 
 logger = logging.getLogger(__name__)
 
+# Профили драйвера: 'full' — полноценная страница (каталог в OzonLinkParser),
+# 'api' — воркеры товаров и продавцов, которые открывают только JSON composer-api/entrypoint-api
+PROFILE_FULL = 'full'
+PROFILE_API = 'api'
+
+API_WINDOW_SIZE = "800,600"
+API_PAGE_LOAD_TIMEOUT = 30
+# 2 — запретить: картинки и уведомления JSON-ответу не нужны
+API_CONTENT_PREFS = {
+    'profile.managed_default_content_settings.images': 2,
+    'profile.default_content_setting_values.notifications': 2,
+}
+
 class SeleniumManager:
     
-    def __init__(self, headless=True):
+    def __init__(self, headless=True, profile: str = PROFILE_FULL):
         self.headless = headless
+        self.profile = profile
         self.driver: Optional[webdriver.Chrome] = None
         self.wait: Optional[WebDriverWait] = None
+        self.lease: Optional[DriverLease] = None
     
-    def create_driver(self) -> webdriver.Chrome:
+    def _build_options(self) -> Options:
         chrome_options = Options()
         
         chrome_options.add_argument("--no-sandbox")
@@ -34,10 +54,63 @@ class SeleniumManager:
         if self.headless:
             chrome_options.add_argument("--headless")
         
-        chrome_options.add_argument("--window-size=1920,1080")
+        if self.profile == PROFILE_API:
+            # JSON-ответу не нужны картинки, шрифты и медиа; get() возвращается после DOMContentLoaded,
+            # а сам JSON дожидается wait_for_json_response()
+            chrome_options.page_load_strategy = 'eager'
+            chrome_options.add_argument(f"--window-size={API_WINDOW_SIZE}")
+            chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+            chrome_options.add_argument("--disable-remote-fonts")
+            chrome_options.add_argument("--autoplay-policy=user-gesture-required")
+            chrome_options.add_argument("--mute-audio")
+            chrome_options.add_experimental_option('prefs', API_CONTENT_PREFS)
+        else:
+            chrome_options.add_argument("--window-size=1920,1080")
+        return chrome_options
+    
+    def create_driver(self, stop_event=None) -> webdriver.Chrome:
+        return self._leased(self._create_driver, stop_event)
+    
+    def create_driver_with_logging(self, stop_event=None) -> webdriver.Chrome:
+        return self._leased(self._create_driver_with_logging, stop_event)
+    
+    def _leased(self, create: Callable[[], webdriver.Chrome], stop_event=None) -> webdriver.Chrome:
+        """
+        Запускает драйвер, когда у хоста есть запас памяти и CPU; аренда возвращается в close().
+        Пока аренды нет, остановка через stop_event прерывает ожидание (AdmissionCancelled)
+        """
+        admission = get_resource_manager().admission
+        lease = admission.acquire(self.profile, stop_event=stop_event)
+        try:
+            driver = create()
+        except Exception:
+            admission.release(lease)
+            raise
+        process = getattr(getattr(driver, 'service', None), 'process', None)
+        admission.attach(lease, getattr(process, 'pid', None))
+        self.lease = lease
+        return driver
+    
+    def recycle_if_bloated(self, stop_event=None) -> bool:
+        """
+        Пересоздает драйвер, если его RSS превысил предел; True — драйвер теперь новый.
+        Если новый драйвер запустить не удалось, исключение уходит вызывающему, а драйвера нет
+        """
+        if self.lease is None or not get_resource_manager().admission.should_recycle(self.lease):
+            return False
+        logger.info(f"Драйвер занимает {self.lease.rss_mb:.0f} МБ, пересоздание")
+        self.close()
+        self.create_driver(stop_event)
+        return True
+    
+    def _create_driver(self) -> webdriver.Chrome:
+        chrome_options = self._build_options()
         
         try:
-            driver = webdriver.Chrome(options=chrome_options)
+            started = time.perf_counter()
+            with tracing.span('driver.create'):
+                driver = webdriver.Chrome(options=chrome_options)
+            DRIVER_START_SECONDS.observe(time.perf_counter() - started)
             
 
             stealth(driver,
@@ -49,23 +122,28 @@ class SeleniumManager:
                    fix_hairline=True)
             
 
-            driver.implicitly_wait(20)
-            driver.set_page_load_timeout(60)
+            if self.profile == PROFILE_API:
+                # Без неявного ожидания: воркеры API не ищут элементы на странице
+                driver.set_page_load_timeout(API_PAGE_LOAD_TIMEOUT)
+            else:
+                driver.implicitly_wait(20)
+                driver.set_page_load_timeout(60)
             
 
             driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
             
             self.driver = driver
+            DRIVERS_LIVE.inc()
             self.wait = WebDriverWait(driver, 20)
             
-            logger.info("Chrome драйвер создан успешно")
+            logger.info(f"Chrome драйвер создан успешно (профиль {self.profile})")
             return driver
             
         except WebDriverException as e:
             logger.error(f"Ошибка создания Chrome драйвера: {e}")
             raise
     
-    def create_driver_with_logging(self) -> webdriver.Chrome:
+    def _create_driver_with_logging(self) -> webdriver.Chrome:
         chrome_options = Options()
         
         chrome_options.add_argument("--no-sandbox")
@@ -85,7 +163,10 @@ class SeleniumManager:
         chrome_options.add_argument("--window-size=1920,1080")
         
         try:
-            driver = webdriver.Chrome(options=chrome_options)
+            started = time.perf_counter()
+            with tracing.span('driver.create'):
+                driver = webdriver.Chrome(options=chrome_options)
+            DRIVER_START_SECONDS.observe(time.perf_counter() - started)
             
             stealth(driver,
                    languages=["ru-RU", "ru"],
@@ -101,6 +182,7 @@ class SeleniumManager:
             driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
             
             self.driver = driver
+            DRIVERS_LIVE.inc()
             self.wait = WebDriverWait(driver, 20)
             
             logger.info("Chrome драйвер с логированием создан успешно")
@@ -117,10 +199,12 @@ class SeleniumManager:
         
         try:
             logger.debug(f"Переход по URL: {url}")
-            self.driver.get(url)
+            with tracing.span('page.get'):
+                self.driver.get(url)
             
 
-            self._wait_for_antibot_bypass()
+            with tracing.span('antibot.wait'):
+                self._wait_for_antibot_bypass()
             
             return True
             
@@ -132,6 +216,10 @@ class SeleniumManager:
             return False
     
     def wait_for_json_response(self, timeout: int = 90) -> Optional[str]:
+        with tracing.span('json.wait'):
+            return self._poll_json_response(timeout)
+    
+    def _poll_json_response(self, timeout: int) -> Optional[str]:
         if not self.driver:
             return None
             
@@ -152,18 +240,19 @@ class SeleniumManager:
                     
                     if json_content:
                         try:
-                            data = json.loads(json_content)
+                            with tracing.span('json.decode'):
+                                data = json.loads(json_content)
                             if 'widgetStates' in data:
                                 logger.debug("JSON ответ с widgetStates найден")
                                 return json_content
                         except json.JSONDecodeError:
                             pass
                     
-                    time.sleep(2.5)  # Увеличенное время ожидания между проверками
+                    tracing.sleep(2.5, 'json.poll_sleep')  # Увеличенное время ожидания между проверками
                     
                 except Exception as e:
                     logger.debug(f"Ошибка проверки содержимого страницы: {e}")
-                    time.sleep(2.5)  # Увеличенное время ожидания при ошибке
+                    tracing.sleep(2.5, 'json.poll_sleep')  # Увеличенное время ожидания при ошибке
                     continue
             
             logger.warning(f"Таймаут ожидания JSON ответа после {timeout} секунд")
@@ -216,18 +305,18 @@ class SeleniumManager:
                         )
                         self.driver.refresh()
                         reload_attempts += 1
-                        time.sleep(15)      
+                        tracing.sleep(15, 'antibot.sleep')
                         continue
                     else:
                         logger.warning("Превышено кол-во попыток, возвращаем новый драйвер")
                         raise Exception("Access blocked after retries")
                 else:
-                    logger.info("Антибот защита пройдена")
+                    logger.debug("Антибот защита пройдена")
                     return
             except Exception as e:
                 if "Access blocked" in str(e):
                     raise
-                time.sleep(15)  
+                tracing.sleep(15, 'antibot.sleep')
                 continue
 
         logger.warning(f"Антибот защита не пройдена за {max_wait_time} секунд")
@@ -263,5 +352,9 @@ class SeleniumManager:
             except Exception as e:
                 logger.error(f"Ошибка закрытия драйвера: {e}")
             finally:
+                DRIVERS_LIVE.dec()
                 self.driver = None
-                self.wait = None
\ No newline at end of file
+                self.wait = None
+                if self.lease is not None:
+                    get_resource_manager().admission.release(self.lease)
+                    self.lease = None
\ No newline at end of file
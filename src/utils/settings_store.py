@@ -0,0 +1,187 @@
+"""
+Хранилище пользовательских настроек в SQLite (WAL) с кэшем в памяти.
+
+Настройки USER_<id>_* из config.txt переносятся в базу при первом запуске.
+Если config.txt правят вручную или из GUI, изменённые ключи подхватываются
+при следующем чтении, а кэш сбрасывается.
+"""
+import logging
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from .config_loader import get_config_path
+
+logger = logging.getLogger(__name__)
+
+USER_KEY_RE = re.compile(r'^USER_(-?\d+)_(.+)$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_settings (
+    user_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (user_id, key)
+);
+CREATE TABLE IF NOT EXISTS config_import (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def get_settings_db_path() -> Path:
+    """База лежит рядом с config.txt (и в сборке PyInstaller тоже)"""
+    return get_config_path().with_name("settings.db")
+
+
+class SettingsStore:
+
+    def __init__(self, db_path: Optional[Path] = None, config_path: Optional[Path] = None):
+        self.db_path = Path(db_path) if db_path else get_settings_db_path()
+        self.config_path = Path(config_path) if config_path else get_config_path()
+        self._lock = threading.RLock()
+        self._cache: Dict[str, Dict[str, str]] = {}
+        self._config_mtime: Optional[int] = None
+        self._data_version: Optional[int] = None
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._sync_config(force=True)
+
+    def get(self, user_id: str) -> Dict[str, str]:
+        """Возвращает копию настроек пользователя (ключи без префикса USER_<id>_)"""
+        user_id = str(user_id)
+        with self._lock:
+            self._check_external_changes()
+            settings = self._cache.get(user_id)
+            if settings is None:
+                rows = self._conn.execute(
+                    "SELECT key, value FROM user_settings WHERE user_id = ?", (user_id,)
+                ).fetchall()
+                settings = dict(rows)
+                self._cache[user_id] = settings
+            return dict(settings)
+
+    def set_many(self, user_id: str, values: Dict[str, object]) -> bool:
+        """Атомарно обновляет переданные ключи; остальные настройки пользователя не трогаются"""
+        user_id = str(user_id)
+        values = {key: str(value) for key, value in values.items()}
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(
+                    "INSERT INTO user_settings (user_id, key, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id, key) DO UPDATE SET value = excluded.value",
+                    [(user_id, key, value) for key, value in values.items()],
+                )
+                self._conn.execute("COMMIT")
+            except Exception as e:
+                self._conn.execute("ROLLBACK")
+                logger.error(f"Ошибка сохранения настроек пользователя {user_id}: {e}")
+                return False
+            if user_id in self._cache:
+                self._cache[user_id].update(values)
+            # Собственная запись не должна сбрасывать кэш как внешнее изменение
+            self._data_version = self._read_data_version()
+            return True
+
+    def invalidate(self, user_id: Optional[str] = None):
+        with self._lock:
+            if user_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(str(user_id), None)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _read_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _check_external_changes(self):
+        # data_version меняется, когда в базу пишет другое соединение (например, второй процесс)
+        data_version = self._read_data_version()
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._cache.clear()
+        self._sync_config()
+
+    def _sync_config(self, force: bool = False):
+        """Подхватывает ключи USER_<id>_* из config.txt, если файл изменился"""
+        try:
+            mtime = self.config_path.stat().st_mtime_ns
+        except OSError:
+            return
+        if not force and mtime == self._config_mtime:
+            return
+        self._config_mtime = mtime
+
+        config = self._read_config_file()
+        imported = dict(self._conn.execute("SELECT key, value FROM config_import").fetchall())
+        changed_users = set()
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+            for config_key, value in config.items():
+                match = USER_KEY_RE.match(config_key)
+                if not match or imported.get(config_key) == value:
+                    continue
+                user_id, key = match.groups()
+                if config_key in imported:
+                    # Ключ правили в config.txt после прошлого импорта — внешнее изменение побеждает
+                    self._conn.execute(
+                        "INSERT INTO user_settings (user_id, key, value) VALUES (?, ?, ?) "
+                        "ON CONFLICT(user_id, key) DO UPDATE SET value = excluded.value",
+                        (user_id, key, value),
+                    )
+                else:
+                    # Новый ключ (миграция или базовые настройки из GUI) не перетирает значения из базы
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO user_settings (user_id, key, value) VALUES (?, ?, ?)",
+                        (user_id, key, value),
+                    )
+                self._conn.execute(
+                    "INSERT INTO config_import (key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (config_key, value),
+                )
+                changed_users.add(user_id)
+            self._conn.execute("COMMIT")
+        except Exception as e:
+            self._conn.execute("ROLLBACK")
+            logger.error(f"Ошибка импорта настроек из config.txt: {e}")
+            return
+
+        if changed_users:
+            logger.info(f"Настройки из config.txt импортированы для пользователей: {', '.join(sorted(changed_users))}")
+        for user_id in changed_users:
+            self._cache.pop(user_id, None)
+        self._data_version = self._read_data_version()
+
+    def _read_config_file(self) -> Dict[str, str]:
+        config = {}
+        with open(self.config_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if '=' in line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    config[key] = value
+        return config
+
+
+_store: Optional[SettingsStore] = None
+_store_lock = threading.Lock()
+
+
+def get_settings_store() -> SettingsStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SettingsStore()
+    return _store
@@ -0,0 +1,142 @@
+"""
+Объединение одинаковых запросов между сессиями пользователей.
+
+Если два пользователя парсят пересекающиеся категории, одни и те же артикулы и
+seller_id запрашивались бы каждым своим Chrome. SingleFlight пропускает к браузеру
+только первый запрос по ключу, остальные ждут его Future; успешный результат
+кладется в общий кэш с коротким TTL и переиспользуется запусками, идущими почти одновременно.
+"""
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Реестр выполняющихся запросов: по одному выполнению fn на ключ в каждый момент времени"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Выполняет fn() или дожидается уже идущего выполнения с тем же ключом.
+        Возвращает (результат, shared): shared=True — результат получен чужим вызовом.
+        Исключение fn получают все ожидающие.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future.result(), False
+
+    def inflight(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+
+class SharedFetchCache:
+    """
+    Кэш результатов с TTL и ограничением размера поверх SingleFlight.
+    Кэшируются только результаты, прошедшие is_cacheable; вызывающий всегда
+    получает копию, поэтому может дополнять ее своими данными.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 20000,
+                 is_cacheable: Optional[Callable[[Any], bool]] = None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.is_cacheable = is_cacheable or (lambda value: value is not None)
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._stats = {'hits': 0, 'coalesced': 0, 'fetches': 0}
+
+    def peek(self, key: Hashable) -> Any:
+        """Копия закэшированного результата без загрузки (None — нет в кэше)"""
+        cached = self._get(key)
+        if cached is None:
+            return None
+        self._count('hits')
+        return copy.copy(cached)
+
+    def fetch(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Возвращает (копия результата, fetched): fetched=True — этот вызов сам загрузил страницу"""
+        cached = self._get(key)
+        if cached is not None:
+            self._count('hits')
+            return copy.copy(cached), False
+
+        value, shared = self._flight.do(key, lambda: self._load(key, fn))
+        if shared:
+            self._count('coalesced')
+            logger.debug(f"{self.name}: {key} получен из параллельного запроса")
+        return copy.copy(value), not shared
+
+    def _load(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        # Ключ мог попасть в кэш, пока мы ждали своей очереди на SingleFlight
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        self._count('fetches')
+        value = fn()
+        if self.is_cacheable(value):
+            self._put(key, value)
+        return value
+
+    def _get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['inflight'] = self._flight.inflight()
+        return stats
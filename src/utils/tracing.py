@@ -0,0 +1,205 @@
+"""
+Легковесные спаны для замера фаз парсинга.
+
+Запуск привязывается к потоку через bind_run(); span() в потоке без привязки ничего
+не делает, поэтому инструментированный код почти ничего не стоит вне запуска.
+Потоки воркеров наследуют привязку через propagate(). По завершении запуск
+сворачивается в p50/p95/p99 по каждой фазе или выгружается в формате Chrome trace
+(chrome://tracing, Perfetto) — по дорожке на поток.
+"""
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+_local = threading.local()
+
+# Спаны этапов запуска (links, products, sellers, export...) — в отличие от фаз по элементам
+STAGE_PREFIX = 'stage.'
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    duration: float
+    thread_id: int
+    thread_name: str
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+class RunTrace:
+    """Спаны одного запуска; запись потокобезопасна"""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.started = time.perf_counter()
+        self.started_wall = time.time()
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+        # RunProfiler (utils.profiling), если запуск профилируется: propagate() профилирует
+        # потоки воркеров, а окончание каждого этапа (stage.*) снимает tracemalloc
+        self.profiler = None
+
+    def add(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """{фаза: count, total, p50, p95, p99, max} — секунды"""
+        durations: Dict[str, List[float]] = {}
+        for span in self.spans():
+            durations.setdefault(span.name, []).append(span.duration)
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            summary[name] = {
+                'count': len(values),
+                'total': round(sum(values), 4),
+                'p50': round(_percentile(values, 50), 4),
+                'p95': round(_percentile(values, 95), 4),
+                'p99': round(_percentile(values, 99), 4),
+                'max': round(values[-1], 4),
+            }
+        return summary
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Trace Event Format: complete-события (ph=X) в микросекундах от начала запуска"""
+        pid = os.getpid()
+        # Идентификаторы завершившихся потоков переиспользуются (воркеры товаров, затем продавцов),
+        # поэтому дорожка определяется парой (ident, имя потока)
+        tids: Dict[tuple, int] = {}
+        thread_names: Dict[int, str] = {}
+        events = []
+        for span in sorted(self.spans(), key=lambda s: s.start):
+            tid = tids.setdefault((span.thread_id, span.thread_name), len(tids) + 1)
+            thread_names.setdefault(tid, span.thread_name)
+            events.append({
+                'name': span.name,
+                'cat': span.name.split('.', 1)[0],
+                'ph': 'X',
+                'ts': round((span.start - self.started) * 1e6),
+                'dur': round(span.duration * 1e6),
+                'pid': pid,
+                'tid': tid,
+                'args': {key: str(value) for key, value in span.attrs.items()},
+            })
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': self.label or 'run'}}]
+        for tid, name in thread_names.items():
+            metadata.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+            metadata.append({'name': 'thread_sort_index', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'sort_index': tid}})
+        return {
+            'traceEvents': metadata + events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'label': self.label, 'started_at': self.started_wall},
+        }
+
+    def write_chrome_trace(self, path: Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+        return path
+
+
+def _percentile(ordered: List[float], percent: float) -> float:
+    # Ближайший ранг: для малых выборок возвращает реально наблюдавшееся значение
+    index = max(0, min(len(ordered) - 1, math.ceil(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def current_run() -> Optional[RunTrace]:
+    return getattr(_local, 'trace', None)
+
+
+@contextmanager
+def bind_run(trace: Optional[RunTrace]):
+    """Привязывает запуск к текущему потоку на время блока"""
+    previous = current_run()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+@contextmanager
+def _record(trace: RunTrace, name: str, attrs: Dict[str, Any]):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        thread = threading.current_thread()
+        trace.add(Span(name, start, time.perf_counter() - start, thread.ident, thread.name, attrs))
+        if trace.profiler is not None and name.startswith(STAGE_PREFIX):
+            trace.profiler.stage_boundary(name)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **attrs):
+    """Контекстный менеджер спана; без привязанного запуска — пустышка без аллокаций"""
+    trace = current_run()
+    if trace is None:
+        return _NULL_SPAN
+    return _record(trace, name, attrs)
+
+
+def sleep(seconds: float, name: str = 'sleep'):
+    """time.sleep, видимый в замерах как отдельная фаза"""
+    with span(name, seconds=seconds):
+        time.sleep(seconds)
+
+
+def propagate(fn: Callable) -> Callable:
+    """Оборачивает fn так, что в другом потоке (executor, Thread) он видит запуск вызывающего"""
+    trace = current_run()
+    if trace is None:
+        return fn
+    if trace.profiler is not None:
+        fn = trace.profiler.wrap(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with bind_run(trace):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def format_stages(summary: Dict[str, Dict[str, float]]) -> str:
+    """Одна строка с суммарным временем этапов запуска: «links 12с · products 340с»"""
+    return " · ".join(
+        f"{name[len(STAGE_PREFIX):]} {stats['total']:.0f}с"
+        for name, stats in summary.items() if name.startswith(STAGE_PREFIX)
+    )
+
+
+def format_summary(summary: Dict[str, Dict[str, float]], limit: int = 6) -> List[str]:
+    """Строки «фаза: p50/p95/p99 ×count» для самых затратных фаз (по суммарному времени), без этапов"""
+    phases = sorted(
+        ((name, stats) for name, stats in summary.items() if not name.startswith(STAGE_PREFIX)),
+        key=lambda item: item[1]['total'], reverse=True,
+    )[:limit]
+    return [
+        f"{name}: {stats['p50']:.2f}/{stats['p95']:.2f}/{stats['p99']:.2f}с ×{stats['count']}"
+        for name, stats in phases
+    ]
@@ -0,0 +1,331 @@
+"""
+Исторический склад товаров и продавцов в SQLite (WAL).
+
+Папка output/<категория>_<время>/ удаляется после отправки, а склад накапливает
+все запуски: товары и продавцы upsert-ятся по ключу, а каждое появление в
+запуске (с категорией и метриками на тот момент) пишется в таблицы sightings.
+Запросы вида «продавцы категории X с заказами > N за 7 дней» идут по индексам.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .config_loader import get_config_path
+from .delta import row_fingerprint
+from .export import build_seller_row
+from .normalize import seller_metric
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT,
+    category_url TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    total_products INTEGER NOT NULL DEFAULT 0,
+    total_sellers INTEGER NOT NULL DEFAULT 0,
+    perf_json TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_category ON runs (category_url, finished_at);
+
+CREATE TABLE IF NOT EXISTS products (
+    article TEXT PRIMARY KEY,
+    name TEXT,
+    company_name TEXT,
+    company_inn TEXT,
+    image_url TEXT,
+    card_price INTEGER,
+    price INTEGER,
+    original_price INTEGER,
+    seller_id TEXT,
+    seller_link TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_run_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_products_seller ON products (seller_id);
+
+CREATE TABLE IF NOT EXISTS product_sightings (
+    run_id INTEGER NOT NULL,
+    article TEXT NOT NULL,
+    category_url TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    price INTEGER,
+    card_price INTEGER,
+    PRIMARY KEY (run_id, article)
+);
+CREATE INDEX IF NOT EXISTS idx_product_sightings_category ON product_sightings (category_url, seen_at);
+
+CREATE TABLE IF NOT EXISTS sellers (
+    seller_id TEXT PRIMARY KEY,
+    company_name TEXT,
+    inn TEXT,
+    orders_count TEXT,
+    reviews_count TEXT,
+    average_rating TEXT,
+    working_time TEXT,
+    orders_count_value INTEGER,
+    reviews_count_value INTEGER,
+    average_rating_value REAL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_run_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sellers_inn ON sellers (inn);
+CREATE INDEX IF NOT EXISTS idx_sellers_orders ON sellers (orders_count_value);
+
+CREATE TABLE IF NOT EXISTS seller_sightings (
+    run_id INTEGER NOT NULL,
+    seller_id TEXT NOT NULL,
+    category_url TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    orders_count_value INTEGER,
+    reviews_count_value INTEGER,
+    average_rating_value REAL,
+    row_hash TEXT,
+    PRIMARY KEY (run_id, seller_id)
+);
+CREATE INDEX IF NOT EXISTS idx_seller_sightings_category ON seller_sightings (category_url, seen_at, seller_id);
+CREATE INDEX IF NOT EXISTS idx_seller_sightings_seller ON seller_sightings (seller_id, seen_at);
+CREATE INDEX IF NOT EXISTS idx_seller_sightings_orders ON seller_sightings (orders_count_value);
+"""
+
+PRODUCT_UPSERT = """
+INSERT INTO products (article, name, company_name, company_inn, image_url, card_price, price,
+                      original_price, seller_id, seller_link, first_seen, last_seen, last_run_id)
+VALUES (:article, :name, :company_name, :company_inn, :image_url, :card_price, :price,
+        :original_price, :seller_id, :seller_link, :seen_at, :seen_at, :run_id)
+ON CONFLICT(article) DO UPDATE SET
+    name = excluded.name, company_name = excluded.company_name, company_inn = excluded.company_inn,
+    image_url = excluded.image_url, card_price = excluded.card_price, price = excluded.price,
+    original_price = excluded.original_price, seller_id = excluded.seller_id,
+    seller_link = excluded.seller_link, last_seen = excluded.last_seen, last_run_id = excluded.last_run_id
+"""
+
+SELLER_UPSERT = """
+INSERT INTO sellers (seller_id, company_name, inn, orders_count, reviews_count, average_rating, working_time,
+                     orders_count_value, reviews_count_value, average_rating_value, first_seen, last_seen, last_run_id)
+VALUES (:seller_id, :company_name, :inn, :orders_count, :reviews_count, :average_rating, :working_time,
+        :orders_count_value, :reviews_count_value, :average_rating_value, :seen_at, :seen_at, :run_id)
+ON CONFLICT(seller_id) DO UPDATE SET
+    company_name = excluded.company_name, inn = excluded.inn, orders_count = excluded.orders_count,
+    reviews_count = excluded.reviews_count, average_rating = excluded.average_rating,
+    working_time = excluded.working_time, orders_count_value = excluded.orders_count_value,
+    reviews_count_value = excluded.reviews_count_value, average_rating_value = excluded.average_rating_value,
+    last_seen = excluded.last_seen, last_run_id = excluded.last_run_id
+"""
+
+
+def get_warehouse_db_path() -> Path:
+    """Склад лежит рядом с config.txt, как и settings.db"""
+    return get_config_path().with_name("warehouse.db")
+
+
+class Warehouse:
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path) if db_path else get_warehouse_db_path()
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        # Базы, созданные до появления дельта-отчетов, не имеют отпечатков строк
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(seller_sightings)")}
+        if 'row_hash' not in columns:
+            self._conn.execute("ALTER TABLE seller_sightings ADD COLUMN row_hash TEXT")
+        # ...и сводки по фазам запуска
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(runs)")}
+        if 'perf_json' not in columns:
+            self._conn.execute("ALTER TABLE runs ADD COLUMN perf_json TEXT")
+
+    def record_run(self, category_url: str, products: Iterable[Any], sellers: Iterable[Any],
+                   user_id: Optional[str] = None, started_at: Optional[float] = None,
+                   seller_meta: Optional[Dict[str, Dict[str, str]]] = None) -> Optional[int]:
+        """
+        Сохраняет запуск одной транзакцией: успешные ProductInfo/SellerInfo upsert-ятся,
+        их появление в запуске пишется с категорией и отпечатком строки продавца.
+        Возвращает run_id (None при ошибке).
+        """
+        seen_at = time.time()
+        products = [p for p in products if getattr(p, 'success', False)]
+        sellers = [s for s in sellers if getattr(s, 'success', False)]
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                run_id = self._conn.execute(
+                    "INSERT INTO runs (user_id, category_url, started_at, finished_at, total_products, total_sellers) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (str(user_id) if user_id else None, category_url, started_at or seen_at, seen_at,
+                     len(products), len(sellers)),
+                ).lastrowid
+                product_rows = [self._product_row(p, run_id, seen_at) for p in products]
+                self._conn.executemany(PRODUCT_UPSERT, product_rows)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO product_sightings (run_id, article, category_url, seen_at, price, card_price) "
+                    "VALUES (:run_id, :article, :category_url, :seen_at, :price, :card_price)",
+                    [dict(row, category_url=category_url) for row in product_rows],
+                )
+                seller_rows = [self._seller_row(s, run_id, seen_at, seller_meta) for s in sellers]
+                self._conn.executemany(SELLER_UPSERT, seller_rows)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO seller_sightings (run_id, seller_id, category_url, seen_at, "
+                    "orders_count_value, reviews_count_value, average_rating_value, row_hash) "
+                    "VALUES (:run_id, :seller_id, :category_url, :seen_at, "
+                    ":orders_count_value, :reviews_count_value, :average_rating_value, :row_hash)",
+                    [dict(row, category_url=category_url) for row in seller_rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception as e:
+                self._conn.execute("ROLLBACK")
+                logger.error(f"Ошибка сохранения запуска в склад: {e}")
+                return None
+        logger.info(f"Запуск {run_id} сохранен в склад: {len(products)} товаров, {len(sellers)} продавцов")
+        return run_id
+
+    def query_sellers(self, category_url: Optional[str] = None, min_orders: Optional[int] = None,
+                      max_orders: Optional[int] = None, seen_within_days: Optional[float] = None,
+                      limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Продавцы, замеченные (в категории category_url, если задана) за последние seen_within_days дней,
+        с текущим числом заказов в [min_orders, max_orders]. Сортировка по заказам по убыванию.
+        """
+        conditions, params = [], []
+        if category_url:
+            conditions.append("ss.category_url = ?")
+            params.append(category_url)
+        if seen_within_days:
+            conditions.append("ss.seen_at >= ?")
+            params.append(time.time() - seen_within_days * 86400)
+        if min_orders is not None:
+            conditions.append("s.orders_count_value >= ?")
+            params.append(int(min_orders))
+        if max_orders is not None:
+            conditions.append("s.orders_count_value <= ?")
+            params.append(int(max_orders))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = (
+            "SELECT s.*, MAX(ss.seen_at) AS last_seen_in_scope, COUNT(ss.run_id) AS sightings "
+            "FROM seller_sightings ss JOIN sellers s ON s.seller_id = ss.seller_id "
+            f"{where} GROUP BY s.seller_id "
+            "ORDER BY s.orders_count_value IS NULL, s.orders_count_value DESC LIMIT ?"
+        )
+        params.append(int(limit))
+        return self._fetch(sql, params)
+
+    def previous_seller_hashes(self, category_url: str) -> Dict[str, str]:
+        """
+        Последний отпечаток каждого продавца, встречавшегося в категории: {seller_id: row_hash}.
+        Берется по всем запускам, а не только по последнему: остановленный или упавший запуск
+        содержит лишь часть продавцов, и остальные иначе считались бы новыми
+        """
+        with self._lock:
+            # В SQLite неагрегированные колонки при MAX() берутся из строки с максимумом
+            rows = self._conn.execute(
+                "SELECT seller_id, row_hash, MAX(run_id) FROM seller_sightings "
+                "WHERE category_url = ? AND row_hash IS NOT NULL GROUP BY seller_id",
+                (category_url,),
+            ).fetchall()
+        return {row['seller_id']: row['row_hash'] for row in rows}
+
+    def save_run_perf(self, run_id: int, perf: Dict[str, Dict[str, float]]):
+        """Сохраняет сводку p50/p95/p99 по фазам к уже записанному запуску"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE runs SET perf_json = ? WHERE run_id = ?", (json.dumps(perf, ensure_ascii=False), int(run_id))
+            )
+
+    def run_perf(self, run_id: int) -> Optional[Dict[str, Dict[str, float]]]:
+        rows = self._fetch("SELECT perf_json FROM runs WHERE run_id = ?", (int(run_id),))
+        if not rows or not rows[0]['perf_json']:
+            return None
+        return json.loads(rows[0]['perf_json'])
+
+    def get_seller(self, seller_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._fetch("SELECT * FROM sellers WHERE seller_id = ?", (str(seller_id),))
+        return rows[0] if rows else None
+
+    def find_sellers_by_inn(self, inn: str) -> List[Dict[str, Any]]:
+        return self._fetch("SELECT * FROM sellers WHERE inn = ?", (str(inn),))
+
+    def seller_history(self, seller_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Метрики продавца по запускам, новые первыми"""
+        return self._fetch(
+            "SELECT * FROM seller_sightings WHERE seller_id = ? ORDER BY seen_at DESC LIMIT ?",
+            (str(seller_id), int(limit)),
+        )
+
+    def recent_runs(self, category_url: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        if category_url:
+            return self._fetch(
+                "SELECT * FROM runs WHERE category_url = ? ORDER BY finished_at DESC LIMIT ?",
+                (category_url, int(limit)),
+            )
+        return self._fetch("SELECT * FROM runs ORDER BY finished_at DESC LIMIT ?", (int(limit),))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _fetch(self, sql: str, params) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    @staticmethod
+    def _product_row(product, run_id: int, seen_at: float) -> Dict[str, Any]:
+        return {
+            'article': product.article,
+            'name': product.name,
+            'company_name': product.company_name,
+            'company_inn': product.company_inn,
+            'image_url': product.image_url,
+            'card_price': product.card_price,
+            'price': product.price,
+            'original_price': product.original_price,
+            'seller_id': product.seller_id,
+            'seller_link': product.seller_link,
+            'seen_at': seen_at,
+            'run_id': run_id,
+        }
+
+    @staticmethod
+    def _seller_row(seller, run_id: int, seen_at: float,
+                    seller_meta: Optional[Dict[str, Dict[str, str]]] = None) -> Dict[str, Any]:
+        return {
+            'seller_id': seller.seller_id,
+            'company_name': seller.company_name,
+            'inn': seller.inn,
+            'orders_count': seller.orders_count,
+            'reviews_count': seller.reviews_count,
+            'average_rating': seller.average_rating,
+            'working_time': seller.working_time,
+            'orders_count_value': seller_metric(seller, 'orders_count'),
+            'reviews_count_value': seller_metric(seller, 'reviews_count'),
+            'average_rating_value': seller_metric(seller, 'average_rating'),
+            'row_hash': row_fingerprint(build_seller_row(seller, seller_meta)),
+            'seen_at': seen_at,
+            'run_id': run_id,
+        }
+
+
+_warehouse: Optional[Warehouse] = None
+_warehouse_lock = threading.Lock()
+
+
+def get_warehouse() -> Warehouse:
+    global _warehouse
+    if _warehouse is None:
+        with _warehouse_lock:
+            if _warehouse is None:
+                _warehouse = Warehouse()
+    return _warehouse
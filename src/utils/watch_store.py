@@ -0,0 +1,180 @@
+"""
+Хранилище наблюдений за категориями (ссылка + интервал на пользователя) в settings.db.
+
+Для каждого наблюдения хранится снимок уже обработанных артикулов: на очередном
+запуске парсинг товаров и продавцов получают только артикулы, которых в снимке нет.
+Снимок пополняется только после завершения запуска.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+
+from .settings_store import get_settings_db_path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watches (
+    watch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    category_url TEXT NOT NULL,
+    interval_minutes INTEGER NOT NULL,
+    max_products INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    next_run_at REAL NOT NULL,
+    last_run_at REAL,
+    UNIQUE (user_id, category_url)
+);
+CREATE INDEX IF NOT EXISTS idx_watches_next_run ON watches (next_run_at);
+CREATE TABLE IF NOT EXISTS watch_articles (
+    watch_id INTEGER NOT NULL,
+    article TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (watch_id, article)
+);
+"""
+
+
+@dataclass
+class Watch:
+    watch_id: int
+    user_id: str
+    category_url: str
+    interval_minutes: int
+    max_products: int
+    next_run_at: float
+    last_run_at: Optional[float] = None
+
+
+class WatchStore:
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path) if db_path else get_settings_db_path()
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def add_watch(self, user_id: str, category_url: str, interval_minutes: int, max_products: int) -> int:
+        """Создает наблюдение (или обновляет интервал существующего); первый запуск — сразу"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO watches (user_id, category_url, interval_minutes, max_products, created_at, next_run_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(user_id, category_url) DO UPDATE SET "
+                "interval_minutes = excluded.interval_minutes, max_products = excluded.max_products",
+                (str(user_id), category_url, int(interval_minutes), int(max_products), now, now),
+            )
+            return self._conn.execute(
+                "SELECT watch_id FROM watches WHERE user_id = ? AND category_url = ?", (str(user_id), category_url)
+            ).fetchone()[0]
+
+    def remove_watch(self, user_id: str, watch_id: int) -> bool:
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                deleted = self._conn.execute(
+                    "DELETE FROM watches WHERE watch_id = ? AND user_id = ?", (int(watch_id), str(user_id))
+                ).rowcount
+                if deleted:
+                    self._conn.execute("DELETE FROM watch_articles WHERE watch_id = ?", (int(watch_id),))
+                self._conn.execute("COMMIT")
+            except Exception as e:
+                self._conn.execute("ROLLBACK")
+                logger.error(f"Ошибка удаления наблюдения {watch_id}: {e}")
+                return False
+        return bool(deleted)
+
+    def get_watch(self, watch_id: int) -> Optional[Watch]:
+        watches = self._select("WHERE watch_id = ?", (int(watch_id),))
+        return watches[0] if watches else None
+
+    def list_watches(self, user_id: Optional[str] = None) -> List[Watch]:
+        if user_id is None:
+            return self._select("ORDER BY watch_id", ())
+        return self._select("WHERE user_id = ? ORDER BY watch_id", (str(user_id),))
+
+    def due_watches(self, now: Optional[float] = None) -> List[Watch]:
+        return self._select("WHERE next_run_at <= ? ORDER BY next_run_at", (now or time.time(),))
+
+    def next_run_at(self) -> Optional[float]:
+        with self._lock:
+            return self._conn.execute("SELECT MIN(next_run_at) FROM watches").fetchone()[0]
+
+    def schedule(self, watch_id: int, next_run_at: float, ran: bool = True):
+        with self._lock:
+            if ran:
+                self._conn.execute(
+                    "UPDATE watches SET next_run_at = ?, last_run_at = ? WHERE watch_id = ?",
+                    (next_run_at, time.time(), int(watch_id)),
+                )
+            else:
+                self._conn.execute("UPDATE watches SET next_run_at = ? WHERE watch_id = ?", (next_run_at, int(watch_id)))
+
+    def diff_articles(self, watch_id: int, articles: Iterable[str]) -> Set[str]:
+        """
+        Сравнивает артикулы листинга со снимком наблюдения, не меняя снимок.
+        Возвращает артикулы, которых раньше не было (при первом запуске — все).
+        """
+        with self._lock:
+            known = {
+                row[0] for row in self._conn.execute(
+                    "SELECT article FROM watch_articles WHERE watch_id = ?", (int(watch_id),)
+                )
+            }
+        return set(articles) - known
+
+    def mark_seen(self, watch_id: int, articles: Iterable[str]):
+        """
+        Дописывает артикулы в снимок наблюдения. Вызывается после завершения запуска и только
+        для обработанных товаров: после сбоя или остановки остальные останутся новыми
+        """
+        now = time.time()
+        articles = set(articles)
+        if not articles:
+            return
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(
+                    "INSERT INTO watch_articles (watch_id, article, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(watch_id, article) DO UPDATE SET last_seen = excluded.last_seen",
+                    [(int(watch_id), article, now, now) for article in articles],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _select(self, clause: str, params) -> List[Watch]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT watch_id, user_id, category_url, interval_minutes, max_products, next_run_at, last_run_at "
+                f"FROM watches {clause}",
+                params,
+            ).fetchall()
+        return [Watch(*row) for row in rows]
+
+
+_store: Optional[WatchStore] = None
+_store_lock = threading.Lock()
+
+
+def get_watch_store() -> WatchStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = WatchStore()
+    return _store
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Тест сервиса доставки Telegram: подготовка больших файлов, рассылка по file_id, повторы при 429
+и склейка обновлений прогресса
+Запуск: python -m pytest test/test_delivery.py
+"""
+
+import asyncio
+import os
+import sys
+import zipfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import FSInputFile
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.telegram.delivery import DeliveryJob, DeliveryService, prepare_document_parts
+
+LIMIT = 64 * 1024
+PART_SIZE = 48 * 1024
+
+
+def test_small_file_is_sent_as_is(tmp_path):
+    path = tmp_path / "sellers.csv"
+    path.write_bytes(b"a" * LIMIT)
+    assert prepare_document_parts(path, limit=LIMIT, part_size=PART_SIZE) == [path]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["sellers.csv"]
+
+
+def test_large_compressible_file_is_zipped(tmp_path):
+    path = tmp_path / "sellers.csv"
+    path.write_bytes(b"seller;orders\n" * 20000)
+    parts = prepare_document_parts(path, limit=LIMIT, part_size=PART_SIZE)
+    assert [p.name for p in parts] == ["sellers.csv.zip"]
+    assert parts[0].stat().st_size <= LIMIT
+    with zipfile.ZipFile(parts[0]) as zf:
+        assert zf.read("sellers.csv") == path.read_bytes()
+
+
+def test_incompressible_file_is_split_into_parts(tmp_path):
+    path = tmp_path / "sellers.xlsx"
+    payload = os.urandom(3 * LIMIT)
+    path.write_bytes(payload)
+    parts = prepare_document_parts(path, limit=LIMIT, part_size=PART_SIZE)
+    assert [p.name for p in parts][:2] == ["sellers.xlsx.zip.001", "sellers.xlsx.zip.002"]
+    assert all(p.stat().st_size <= PART_SIZE for p in parts)
+    # Промежуточный архив удален, части склеиваются обратно в валидный zip
+    assert not (tmp_path / "sellers.xlsx.zip").exists()
+    joined = tmp_path / "joined.zip"
+    joined.write_bytes(b"".join(p.read_bytes() for p in parts))
+    with zipfile.ZipFile(joined) as zf:
+        assert zf.read("sellers.xlsx") == payload
+
+
+class FakeBot:
+    """Записывает вызовы Bot API; первые retry_after_failures вызовов отвечают 429"""
+
+    def __init__(self, retry_after_failures=0):
+        self.calls = []
+        self.sent_at = []
+        self.retry_after_failures = retry_after_failures
+
+    def _maybe_throttle(self):
+        if self.retry_after_failures > 0:
+            self.retry_after_failures -= 1
+            raise TelegramRetryAfter(method=None, message="Too Many Requests", retry_after=0)
+
+    async def send_document(self, chat_id, document, caption=None, parse_mode=None):
+        self._maybe_throttle()
+        self.calls.append(('send_document', chat_id, document, caption))
+        file_id = document if isinstance(document, str) else f"file-{len(self.calls)}"
+        return SimpleNamespace(document=SimpleNamespace(file_id=file_id))
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self._maybe_throttle()
+        self.calls.append(('send_message', chat_id, text))
+        self.sent_at.append(asyncio.get_running_loop().time())
+        return SimpleNamespace(message_id=len(self.calls))
+
+    async def edit_message_text(self, text, chat_id, message_id, parse_mode=None):
+        self._maybe_throttle()
+        self.calls.append(('edit_message_text', chat_id, text, message_id))
+        self.sent_at.append(asyncio.get_running_loop().time())
+
+
+def make_service(bot) -> DeliveryService:
+    service = DeliveryService("123456:TEST")
+    service._bot = bot
+    return service
+
+
+def test_document_is_uploaded_once_and_reused_by_file_id(tmp_path):
+    path = tmp_path / "sellers.csv"
+    path.write_text("seller_id\n1\n", encoding="utf-8")
+    bot = FakeBot()
+    job = DeliveryJob('document', chat_ids=["1", "2", "3"], path=str(path), caption="📊 Продавцы")
+    asyncio.run(make_service(bot)._send_document(job))
+
+    assert [call[1] for call in bot.calls] == ["1", "2", "3"]
+    assert isinstance(bot.calls[0][2], FSInputFile)
+    assert bot.calls[1][2] == bot.calls[2][2] == "file-1"
+    assert all(call[3] == "📊 Продавцы" for call in bot.calls)
+
+
+def test_retry_after_is_retried_then_raised():
+    bot = FakeBot(retry_after_failures=2)
+    service = make_service(bot)
+    message = asyncio.run(service._with_retry(lambda: bot.send_message(chat_id="1", text="ok")))
+    assert message.message_id == 1
+    assert bot.calls == [('send_message', "1", "ok")]
+
+    bot.retry_after_failures = 3
+    with pytest.raises(TelegramRetryAfter):
+        asyncio.run(service._with_retry(lambda: bot.send_message(chat_id="1", text="fail")))
+    assert len(bot.calls) == 1
+
+
+def test_progress_updates_are_coalesced(monkeypatch):
+    interval = 0.2
+    monkeypatch.setattr('src.telegram.delivery.PROGRESS_MIN_INTERVAL', interval)
+    bot = FakeBot()
+    service = make_service(bot)
+
+    async def run():
+        service._update_progress("parsing:1:100", "1", "10%", final=False)
+        await asyncio.sleep(0.01)
+        # Промежуточный текст заменяется следующим, пока не прошел интервал
+        service._update_progress("parsing:1:100", "1", "20%", final=False)
+        service._update_progress("parsing:1:100", "1", "30%", final=False)
+        await asyncio.sleep(interval * 1.5)
+        service._update_progress("parsing:1:100", "1", "40%", final=False)
+        service._update_progress("parsing:1:100", "1", "Готово", final=True)
+        await service._progress["parsing:1:100"].task
+
+    asyncio.run(run())
+    assert bot.calls == [
+        ('send_message', "1", "10%"),
+        ('edit_message_text', "1", "30%", 1),
+        ('edit_message_text', "1", "Готово", 1),
+    ]
+    gaps = [later - earlier for earlier, later in zip(bot.sent_at, bot.sent_at[1:])]
+    assert all(gap >= interval * 0.95 for gap in gaps)
+    # Финальное сообщение отправлено — состояние прогресса удалено
+    assert service._progress == {}
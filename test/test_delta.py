@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Тест дельта-отчетов: сравнение продавцов с прошлым запуском той же категории
+Запуск: python -m pytest test/test_delta.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.parsers.seller_parser import SellerInfo
+from src.utils.delta import CHANGED, NEW, UNCHANGED, SellerDelta, row_fingerprint
+from src.utils.export import build_seller_row
+from src.utils.warehouse import Warehouse
+
+CATEGORY = "https://www.ozon.ru/category/a/"
+
+
+def make_seller(seller_id: str, orders: str, rating: str = "4,8") -> SellerInfo:
+    return SellerInfo(seller_id=seller_id, company_name=f"ООО {seller_id}", orders_count=orders,
+                      average_rating=rating, success=True)
+
+
+def test_fingerprint_depends_only_on_content():
+    first = build_seller_row(make_seller("1", "897 K"))
+    second = build_seller_row(make_seller("1", "897 K"))
+    assert row_fingerprint(first) == row_fingerprint(second)
+    assert row_fingerprint(first) != row_fingerprint(build_seller_row(make_seller("1", "898 K")))
+
+
+def test_delta_against_previous_run(tmp_path):
+    warehouse = Warehouse(tmp_path / "warehouse.db")
+    meta = {"s1": {"seller_name": "Магазин 1"}}
+    warehouse.record_run(CATEGORY, [], [make_seller("s1", "100"), make_seller("s2", "200")], seller_meta=meta)
+    warehouse.record_run("https://www.ozon.ru/category/other/", [], [make_seller("s3", "1")])
+
+    delta = SellerDelta(warehouse.previous_seller_hashes(CATEGORY), meta)
+    assert delta.has_baseline
+    assert delta.classify(make_seller("s1", "100")) == UNCHANGED
+    assert delta.classify(make_seller("s2", "250")) == CHANGED
+    assert delta.classify(make_seller("s3", "1")) == NEW
+    assert not delta.is_reported(make_seller("s1", "100"))
+    assert delta.summary() == {NEW: 1, CHANGED: 1, UNCHANGED: 1}
+    warehouse.close()
+
+
+def test_partial_run_does_not_reset_baseline(tmp_path):
+    warehouse = Warehouse(tmp_path / "warehouse.db")
+    warehouse.record_run(CATEGORY, [], [make_seller("s1", "100"), make_seller("s2", "200"), make_seller("s3", "300")])
+    # Прерванный запуск успел сохранить только одного продавца
+    warehouse.record_run(CATEGORY, [], [make_seller("s1", "150")])
+
+    delta = SellerDelta(warehouse.previous_seller_hashes(CATEGORY))
+    assert delta.classify(make_seller("s1", "150")) == UNCHANGED
+    assert delta.classify(make_seller("s2", "200")) == UNCHANGED
+    assert delta.classify(make_seller("s3", "350")) == CHANGED
+    assert delta.classify(make_seller("s4", "1")) == NEW
+
+    warehouse.record_run(CATEGORY, [], [make_seller("s1", "150"), make_seller("s2", "200"), make_seller("s3", "350")])
+    delta = SellerDelta(warehouse.previous_seller_hashes(CATEGORY))
+    assert delta.summary() == {NEW: 0, CHANGED: 0, UNCHANGED: 0}
+    assert delta.classify(make_seller("s3", "350")) == UNCHANGED
+    assert delta.classify(make_seller("s1", "160")) == CHANGED
+    warehouse.close()
+
+
+def test_first_run_reports_everything(tmp_path):
+    warehouse = Warehouse(tmp_path / "warehouse.db")
+    delta = SellerDelta(warehouse.previous_seller_hashes(CATEGORY))
+    assert not delta.has_baseline
+    assert delta.is_reported(make_seller("s1", "100"))
+    warehouse.close()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Тест приёмников экспорта: CSV, JSON Lines, JSON и Parquet со сжатием и без, ExportWriter
+Запуск: python -m pytest test/test_export.py
+"""
+
+import csv
+import gzip
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.parsers.seller_parser import SellerInfo
+from src.utils.export import (
+    SELLER_EXPORT_FIELDS, CsvExportSink, ExportWriter, JsonExportSink, JsonLinesExportSink,
+    ParquetExportSink, build_seller_row, create_sink, resolve_compression,
+)
+
+CATEGORY = "https://www.ozon.ru/category/a/"
+
+
+def make_seller(seller_id: str, orders: str = "1,2 K", success: bool = True) -> SellerInfo:
+    return SellerInfo(seller_id=seller_id, company_name=f'ООО "Компания {seller_id}"', orders_count=orders,
+                      reviews_count="350", average_rating="4,8", success=success)
+
+
+def read_text(path: Path, compression: str) -> str:
+    if compression == 'gzip':
+        return gzip.open(path, 'rt', encoding='utf-8').read()
+    if compression == 'zstd':
+        import zstandard
+        with open(path, 'rb') as raw:
+            return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw), encoding='utf-8').read()
+    return path.read_text(encoding='utf-8')
+
+
+def write_rows(sink, rows):
+    sink.open({'timestamp': '01.01.2025_00-00-00', 'category_url': CATEGORY})
+    for row in rows:
+        sink.write_row(row)
+    return sink.close()
+
+
+ROWS = [build_seller_row(make_seller(str(i), f"{i} K")) for i in range(1, 4)]
+
+
+@pytest.mark.parametrize("compression,suffix", [('none', '.csv'), ('gzip', '.csv.gz'), ('zstd', '.csv.zst')])
+def test_csv_round_trip(tmp_path, compression, suffix):
+    if compression == 'zstd':
+        pytest.importorskip('zstandard')
+    path = write_rows(CsvExportSink(tmp_path / "sellers.csv", compression), ROWS)
+    assert path.name == "sellers" + suffix
+    rows = list(csv.DictReader(io.StringIO(read_text(path, compression), newline='')))
+    assert list(rows[0]) == SELLER_EXPORT_FIELDS
+    assert [row['seller_id'] for row in rows] == ["1", "2", "3"]
+    assert rows[0]['company_name'] == 'ООО "Компания 1"'
+    assert rows[2]['orders_count_value'] == "3000"
+
+
+@pytest.mark.parametrize("compression,suffix", [('none', '.jsonl'), ('gzip', '.jsonl.gz'), ('zstd', '.jsonl.zst')])
+def test_jsonl_round_trip(tmp_path, compression, suffix):
+    if compression == 'zstd':
+        pytest.importorskip('zstandard')
+    path = write_rows(JsonLinesExportSink(tmp_path / "sellers.jsonl", compression), ROWS)
+    assert path.name == "sellers" + suffix
+    rows = [json.loads(line) for line in read_text(path, compression).splitlines()]
+    assert rows == ROWS
+    assert rows[1]['orders_count_value'] == 2000
+    assert rows[1]['average_rating_value'] == 4.8
+
+
+@pytest.mark.parametrize("row_count", [0, 2])
+def test_json_document(tmp_path, row_count):
+    path = write_rows(JsonExportSink(tmp_path / "sellers.json"), ROWS[:row_count])
+    document = json.loads(path.read_text(encoding='utf-8'))
+    assert document['category_url'] == CATEGORY
+    assert document['sellers'] == ROWS[:row_count]
+    assert document['total_sellers'] == row_count
+
+
+@pytest.mark.parametrize("compression,codec", [('none', 'SNAPPY'), ('gzip', 'GZIP'), ('zstd', 'ZSTD')])
+def test_parquet_round_trip_with_typed_metrics(tmp_path, compression, codec, monkeypatch):
+    pq = pytest.importorskip('pyarrow.parquet')
+    # Несколько row group: пачки сбрасываются по PARQUET_BATCH_SIZE
+    monkeypatch.setattr('src.utils.export.PARQUET_BATCH_SIZE', 2)
+    path = write_rows(ParquetExportSink(tmp_path / "sellers.parquet", compression), ROWS)
+    metadata = pq.ParquetFile(path).metadata
+    assert metadata.num_row_groups == 2
+    assert metadata.row_group(0).column(0).compression == codec
+    table = pq.read_table(path).to_pylist()
+    assert [row['seller_id'] for row in table] == ["1", "2", "3"]
+    assert table[0]['orders_count'] == 1000 and table[0]['reviews_count'] == 350
+    assert table[0]['average_rating'] == pytest.approx(4.8)
+
+
+def test_resolve_compression(monkeypatch):
+    assert resolve_compression(None) == 'none'
+    assert resolve_compression('GZIP') == 'gzip'
+    assert resolve_compression('zip') == 'none'
+    monkeypatch.setitem(sys.modules, 'zstandard', None)
+    assert resolve_compression('zstd') == 'gzip'
+
+
+def test_export_writer_dedupes_and_filters(tmp_path):
+    writer = ExportWriter(row_filter=lambda row: (row['orders_count_value'] or 0) >= 2000)
+    writer.add_sink('jsonl', create_sink('jsonl', tmp_path, "category"))
+    writer.add_sink('csv', create_sink('csv', tmp_path, "category", compression='gzip'))
+    writer.open(CATEGORY)
+
+    assert writer.write_seller(make_seller("1", "1 K")) is None  # отсеян фильтром
+    assert writer.write_seller(make_seller("2", "2 K"))['seller_id'] == "2"
+    assert writer.write_seller(make_seller("2", "9 K")) is None  # дубликат seller_id
+    assert writer.write_seller(make_seller("3", "5 K", success=False)) is None
+    assert writer.write_seller(make_seller("4", "5 K"))['seller_id'] == "4"
+
+    files = writer.close()
+    assert writer.close() == files
+    assert writer.write_seller(make_seller("5", "5 K")) is None  # после закрытия не пишет
+    assert set(files) == {'jsonl', 'csv'}
+    lines = files['jsonl'].read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line)['seller_id'] for line in lines] == ["2", "4"]
+    assert [json.loads(line)['orders_count'] for line in lines] == ["2 K", "5 K"]
+    csv_rows = list(csv.DictReader(io.StringIO(read_text(files['csv'], 'gzip'), newline='')))
+    assert [row['seller_id'] for row in csv_rows] == ["2", "4"]
+    assert writer.rows_written == 2
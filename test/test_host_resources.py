@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Тест допуска драйверов по ресурсам хоста: предел по памяти и CPU, ожидание аренды и пересоздание,
+распределение воркеров в пределах хоста и передача товаров воркерам, у которых есть драйвер
+Запуск: python -m pytest test/test_host_resources.py
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.parsers import product_parser
+from src.parsers.product_parser import OzonProductParser, ProductInfo, ProductWorker, product_cache
+from src.utils.host_resources import AdmissionCancelled, AdmissionTimeout, DriverAdmission
+from src.utils.resource_manager import ResourceManager
+
+MB = 1024 * 1024
+
+
+class FakeHost:
+    """Замена модуля psutil: свободная память, CPU и RSS процессов задаются тестом"""
+
+    class Error(Exception):
+        pass
+
+    def __init__(self, available_mb, cpu=10.0):
+        self.available_mb = available_mb
+        self.cpu = cpu
+        self.rss_mb = {}
+
+    def virtual_memory(self):
+        return SimpleNamespace(available=self.available_mb * MB)
+
+    def cpu_percent(self, interval=None):
+        return self.cpu
+
+    def Process(self, pid):
+        host = self
+        if pid not in host.rss_mb:
+            raise host.Error(pid)
+        return SimpleNamespace(
+            children=lambda recursive=False: [],
+            memory_info=lambda: SimpleNamespace(rss=host.rss_mb[pid] * MB),
+        )
+
+
+def make_admission(host, **overrides):
+    admission = DriverAdmission(15, psutil_module=host)
+    admission.SAMPLE_INTERVAL = 0
+    for name, value in overrides.items():
+        setattr(admission, name, value)
+    return admission
+
+
+def test_static_limit_without_psutil():
+    admission = DriverAdmission(15, psutil_module=None)
+    assert admission.effective_limit() == 15
+    assert admission.status() == {'effective_max_workers': 15, 'live_drivers': 0, 'admission': 'static'}
+
+
+def test_limit_follows_free_memory_and_cpu():
+    host = FakeHost(available_mb=1024 + 350 * 4)
+    admission = make_admission(host)
+    assert admission.effective_limit() == 4
+
+    host.available_mb = 64 * 1024
+    assert admission.effective_limit() == admission.MAX_DRIVERS
+
+    host.cpu = 95.0
+    assert admission.effective_limit() == 1
+
+
+def test_new_drivers_reserve_memory_until_measured():
+    host = FakeHost(available_mb=1024 + 350 * 3)
+    admission = make_admission(host)
+    first = admission.acquire()
+    admission.attach(first, 1)
+    host.rss_mb[1] = 0
+    # Драйвер запущен, но память еще не набрал: под него зарезервирована оценка
+    assert admission.effective_limit() == 3
+
+    host.rss_mb[1] = 350
+    host.available_mb -= 350
+    assert admission.effective_limit() == 3
+    assert admission.status()['driver_rss_mb'] == 350
+
+
+def test_acquire_waits_for_release_and_times_out():
+    host = FakeHost(available_mb=1024)
+    admission = make_admission(host, WAIT_STEP=0.01)
+    first = admission.acquire()
+    with pytest.raises(AdmissionTimeout):
+        admission.acquire(timeout=0.05)
+
+    threading.Timer(0.05, admission.release, args=(first,)).start()
+    started = time.monotonic()
+    second = admission.acquire(timeout=5)
+    assert time.monotonic() - started < 5
+    assert admission.live_count() == 1
+    admission.release(second)
+
+
+def test_acquire_is_cancelled_by_stop_event():
+    host = FakeHost(available_mb=1024)
+    admission = make_admission(host, WAIT_STEP=0.01)
+    first = admission.acquire()
+    stop_event = threading.Event()
+    threading.Timer(0.05, stop_event.set).start()
+    started = time.monotonic()
+    with pytest.raises(AdmissionCancelled):
+        admission.acquire(timeout=5, stop_event=stop_event)
+    assert time.monotonic() - started < 5
+    assert admission.live_count() == 1
+    admission.release(first)
+
+
+def test_recycle_when_rss_exceeds_limit():
+    host = FakeHost(available_mb=8 * 1024)
+    admission = make_admission(host, RECYCLE_CHECK_INTERVAL=0)
+    lease = admission.acquire()
+    admission.attach(lease, 7)
+    host.rss_mb[7] = 400
+    assert not admission.should_recycle(lease)
+    host.rss_mb[7] = admission.DRIVER_RSS_LIMIT_MB + 1
+    assert admission.should_recycle(lease)
+
+
+def test_allocation_stays_within_host_limit():
+    manager = ResourceManager()
+    manager.admission = DriverAdmission(3, psutil_module=None)
+    users = ["1", "2", "3"]
+    try:
+        assert manager.start_parsing_session("1", 'products', 1000) == 3
+        for user_id in users[1:]:
+            manager.start_parsing_session(user_id, 'products', 1000)
+        # MIN_WORKERS_PER_USER на троих не помещается в предел — делим то, что есть
+        assert sum(manager.get_user_workers(user_id) for user_id in users) <= 3
+        assert all(manager.get_user_workers(user_id) >= 1 for user_id in users)
+    finally:
+        for user_id in users:
+            manager.finish_parsing_session(user_id)
+
+
+class QueueProductWorker:
+    """Воркер 1 не получает драйвер, остальные забирают товары из общей очереди"""
+
+    def __init__(self, worker_id, item_log=None):
+        self.worker_id = worker_id
+
+    def initialize(self, stop_event=None):
+        if self.worker_id == 1:
+            raise AdmissionTimeout("нет запаса памяти")
+
+    def parse_products(self, articles, product_links, on_result=None, stop_event=None):
+        results = []
+        for article in articles:
+            time.sleep(0.002)
+            results.append(ProductInfo(article=article, seller_id=f"w{self.worker_id}", success=True))
+        return results
+
+    def close(self):
+        pass
+
+
+def test_products_of_worker_without_driver_go_to_others(monkeypatch):
+    monkeypatch.setattr(product_parser, "ProductWorker", QueueProductWorker)
+    parser = OzonProductParser(3)
+    parser.product_links = {}
+    articles = [str(70000 + i) for i in range(30)]
+
+    results = parser._parse_multiple_workers(articles, 3)
+
+    assert [result.article for result in results] == articles
+    assert all(result.success for result in results)
+    assert {result.seller_id for result in results} <= {"w2", "w3"}
+
+
+class FailingRecycleManager:
+    driver = None
+
+    def recycle_if_bloated(self, stop_event=None):
+        raise AdmissionTimeout("нет запаса памяти")
+
+    def close(self):
+        pass
+
+
+def test_failed_recycle_ends_worker_with_partial_results():
+    worker = ProductWorker(1)
+    worker.selenium_manager = FailingRecycleManager()
+    worker.driver = object()
+    worker._parse_single_product = lambda article: ProductInfo(article=article, success=True)
+    pending = deque(["recycle-1", "recycle-2", "recycle-3"])
+    try:
+        results = worker.parse_products(product_parser._take_from(pending), {})
+    finally:
+        for article in ("recycle-1", "recycle-2", "recycle-3"):
+            product_cache.invalidate(article)
+
+    # Товар, после которого не удалось пересоздать драйвер, уже обработан и возвращается
+    assert [result.article for result in results] == ["recycle-1"]
+    assert worker.driver is None
+    assert list(pending) == ["recycle-2", "recycle-3"]
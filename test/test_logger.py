@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Тест логирования: режим очереди, JSON-формат и сводки по обработанным элементам
+Запуск: python -m pytest test/test_logger.py
+"""
+
+import json
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.logger import ItemLogAggregator, JsonFormatter, setup_logging, stop_logging_queue
+
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_queue_mode_with_json_files(tmp_path):
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    try:
+        setup_logging(log_dir=tmp_path, use_queue=True, json_format=True)
+        assert [type(h).__name__ for h in root.handlers] == ["QueueHandler"]
+        logging.getLogger("test.worker").info("Товар %s обработан", "123", extra={"article": "123"})
+        stop_logging_queue()
+
+        log_file = next(tmp_path.glob("ozon_parser_*.log"))
+        entries = [json.loads(line) for line in log_file.read_text(encoding="utf-8").splitlines()]
+        entry = next(e for e in entries if e["logger"] == "test.worker")
+        assert entry["message"] == "Товар 123 обработан"
+        assert entry["article"] == "123"
+        assert entry["level"] == "INFO"
+    finally:
+        stop_logging_queue()
+        for handler in root.handlers:
+            handler.close()
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
+
+
+def test_json_formatter_includes_exception():
+    try:
+        raise ValueError("сбой")
+    except ValueError:
+        record = logging.LogRecord("x", logging.ERROR, __file__, 1, "ошибка", None, sys.exc_info())
+    entry = json.loads(JsonFormatter().format(record))
+    assert "ValueError: сбой" in entry["exc"]
+
+
+def test_item_aggregator_rolls_up_messages():
+    log = logging.getLogger("test.aggregator")
+    log.propagate = False
+    collector = _Collect()
+    log.addHandler(collector)
+    log.setLevel(logging.INFO)
+
+    aggregator = ItemLogAggregator(log, "Товары", interval=3600)
+    for index in range(10):
+        aggregator.record(success=index != 0, cached=index < 3)
+    assert collector.messages == []
+    aggregator.flush()
+    assert collector.messages == ["Товары: +10 за 0 с (успешно 9, ошибок 1, из кэша 3), всего 10"]
+    aggregator.flush()
+    assert len(collector.messages) == 1
+
+    eager = ItemLogAggregator(log, "Продавцы", interval=0)
+    eager.record(success=True)
+    assert collector.messages[-1].startswith("Продавцы: +1")
+    log.removeHandler(collector)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Тест буфера вкладки логов: кольцевой буфер, фильтр по уровню и поиск в памяти
+Запуск: python -m pytest test/test_logs_tab.py
+"""
+
+import logging
+import sys
+import threading
+from collections import deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.gui.tabs.logs_tab import LogBuffer, pop_excess_lines
+
+
+def test_ring_buffer_keeps_last_entries():
+    buffer = LogBuffer(max_entries=100)
+    for index in range(250):
+        buffer.emit(logging.INFO, "INFO", f"строка {index}")
+    batch = buffer.drain()
+    assert len(batch) == 100
+    assert len(buffer.entries) == 100
+    assert buffer.entries[0].text == "строка 150"
+    assert buffer.drain() == []
+
+
+def test_emit_from_threads_then_drain():
+    buffer = LogBuffer(max_entries=10000)
+
+    def produce(worker):
+        for index in range(500):
+            buffer.emit(logging.DEBUG, "DEBUG", f"воркер {worker}: {index}")
+
+    threads = [threading.Thread(target=produce, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(buffer.drain()) == 2000
+
+
+def test_level_filter_and_search():
+    buffer = LogBuffer()
+    buffer.emit(logging.DEBUG, "DEBUG", "Товар 1 обработан успешно")
+    buffer.emit(logging.INFO, "INFO", "Товары: +10 за 10 с")
+    buffer.emit(logging.WARNING, "WARNING", "Ошибка товара 2: Не получен JSON")
+    buffer.emit(logging.ERROR, "ERROR", "Ошибка воркера 3")
+    buffer.drain()
+
+    assert len(buffer.select()) == 4
+    assert [e.levelname for e in buffer.select(logging.WARNING)] == ["WARNING", "ERROR"]
+    assert [e.levelname for e in buffer.select(query="ОШИБКА")] == ["WARNING", "ERROR"]
+    assert [e.levelname for e in buffer.select(logging.ERROR, "ошибка")] == ["ERROR"]
+    buffer.clear()
+    assert buffer.select() == []
+
+
+def test_trim_removes_whole_entries():
+    # Третья запись с traceback занимает в окне 4 строки
+    texts = ["первая", "вторая", "ошибка\nTraceback\n  File\nValueError", "четвертая", "пятая"]
+    line_counts = deque()
+    window = []
+    for text in texts:
+        line_counts.append(text.count("\n") + 1)
+        window.extend(text.split("\n"))
+        del window[:pop_excess_lines(line_counts, max_entries=3)]
+    assert list(line_counts) == [4, 1, 1]
+    assert window == ["ошибка", "Traceback", "  File", "ValueError", "четвертая", "пятая"]
+    assert pop_excess_lines(line_counts, max_entries=3) == 0
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Тест метрик: текстовый формат Prometheus и локальный эндпоинт /metrics
+Запуск: python -m pytest test/test_metrics.py
+"""
+
+import sys
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.config_loader import MetricsConfig, load_metrics_config
+from src.utils.metrics import Counter, Gauge, Histogram, MetricsServer, Registry
+
+
+def test_render_counter_gauge_histogram():
+    registry = Registry()
+    items = registry.register(Counter("items_total", "Элементы", ("kind", "result")))
+    live = registry.register(Gauge("drivers_live", "Драйверы"))
+    queue = registry.register(Gauge("queue_depth", "Очередь", ("stage",)))
+    seconds = registry.register(Histogram("fetch_seconds", "Загрузка", ("kind",), buckets=(1, 5)))
+
+    items.inc(kind="product", result="success")
+    items.inc(2, kind="product", result="success")
+    live.inc()
+    live.inc()
+    live.dec()
+    queue.set_function(lambda: {("products",): 3})
+    for value in (0.5, 2, 10):
+        seconds.observe(value, kind="seller")
+
+    text = registry.render()
+    assert '# TYPE items_total counter' in text
+    assert 'items_total{kind="product",result="success"} 3' in text
+    assert 'drivers_live 1' in text
+    assert 'queue_depth{stage="products"} 3' in text
+    assert 'fetch_seconds_bucket{kind="seller",le="1"} 1' in text
+    assert 'fetch_seconds_bucket{kind="seller",le="5"} 2' in text
+    assert 'fetch_seconds_bucket{kind="seller",le="+Inf"} 3' in text
+    assert 'fetch_seconds_sum{kind="seller"} 12.5' in text
+    # Повторная регистрация возвращает существующую метрику
+    assert registry.register(Counter("items_total", "Элементы", ("kind", "result"))) is items
+
+
+def test_endpoint_serves_metrics():
+    server = MetricsServer(MetricsConfig(port=0))
+    assert server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            body = response.read().decode("utf-8")
+            assert response.headers["Content-Type"].startswith("text/plain")
+        assert "# TYPE ozon_items_total counter" in body
+    finally:
+        server.stop()
+
+
+def test_metrics_config_is_opt_in():
+    assert load_metrics_config({}) is None
+    config = load_metrics_config({"METRICS_ENABLED": "true", "METRICS_PORT": "9200"})
+    assert config.port == 9200 and config.host == "127.0.0.1"
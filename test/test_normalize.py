@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Табличные тесты нормализатора метрик продавца
+Запуск: python -m pytest test/test_normalize.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.normalize import parse_count_value, parse_rating_value, sort_sellers, top_sellers
+from src.utils.export import build_seller_row
+from src.parsers.seller_parser import SellerInfo, SellerWorker
+
+COUNT_CASES = [
+    ("897 K", 897_000),
+    ("40,2 K", 40_200),
+    ("1,6 M", 1_600_000),
+    ("2 M", 2_000_000),
+    ("5 972", 5_972),
+    ("1 315", 1_315),
+    ("12 400", 12_400),
+    ("3,5 тыс.", 3_500),
+    ("7 тыс", 7_000),
+    ("1,2 млн", 1_200_000),
+    ("15k", 15_000),
+    ("42", 42),
+    (120, 120),
+    ("", None),
+    ("   ", None),
+    (None, None),
+    ("нет данных", None),
+]
+
+RATING_CASES = [
+    ("4,8", 4.8),
+    ("4.85", 4.85),
+    (" 5 ", 5.0),
+    (4.7, 4.7),
+    ("", None),
+    (None, None),
+    ("—", None),
+]
+
+
+@pytest.mark.parametrize("raw, expected", COUNT_CASES)
+def test_parse_count_value(raw, expected):
+    assert parse_count_value(raw, default=None) == expected
+
+
+def test_parse_count_value_default():
+    assert parse_count_value("") == 0
+    assert parse_count_value("abc", default=-1) == -1
+
+
+@pytest.mark.parametrize("raw, expected", RATING_CASES)
+def test_parse_rating_value(raw, expected):
+    assert parse_rating_value(raw) == expected
+
+
+def make_cell_list(values: dict) -> str:
+    cells = [
+        {"dsCell": {
+            "centerBlock": {"title": {"text": title}},
+            "rightBlock": {"badge": {"text": value}},
+        }}
+        for title, value in values.items()
+    ]
+    return json.dumps({"cells": cells}, ensure_ascii=False)
+
+
+def test_extract_cell_list_data_typed_values():
+    data = SellerWorker._extract_cell_list_data(None, make_cell_list({
+        "Заказов": "40,2 K",
+        "Средняя оценка": "4,9",
+        "Количество отзывов": "1 315",
+        "Работает с Ozon": "3 года",
+    }))
+    assert data["orders"] == "40,2 K"
+    assert data["orders_value"] == 40_200
+    assert data["reviews_value"] == 1_315
+    assert data["rating_value"] == 4.9
+    assert data["working_time"] == "3 года"
+
+
+def test_seller_row_has_typed_columns():
+    seller = SellerInfo(seller_id="1", orders_count="897 K", orders_count_value=897_000,
+                        reviews_count="12", reviews_count_value=12, success=True)
+    row = build_seller_row(seller)
+    assert row["orders_count"] == "897 K"
+    assert row["orders_count_value"] == 897_000
+    assert row["reviews_count_value"] == 12
+    assert row["average_rating_value"] is None
+
+
+def test_sort_and_top_k_use_typed_values():
+    sellers = [
+        SellerInfo(seller_id="a", orders_count_value=5_000),
+        SellerInfo(seller_id="b", orders_count_value=None),
+        SellerInfo(seller_id="c", orders_count_value=1_600_000),
+        SellerInfo(seller_id="d", orders_count="40,2 K"),
+    ]
+    assert [s.seller_id for s in sort_sellers(sellers)] == ["c", "d", "a", "b"]
+    assert [s.seller_id for s in sort_sellers(sellers, descending=False)] == ["a", "d", "c", "b"]
+    assert [s.seller_id for s in top_sellers(sellers, 2)] == ["c", "d"]
+    assert [s.seller_id for s in top_sellers(sellers, 10)] == ["c", "d", "a"]
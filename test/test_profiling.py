@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Тест профилирования запуска: cProfile по потокам воркеров и снимки tracemalloc по этапам
+Запуск: python -m pytest test/test_profiling.py
+"""
+
+import concurrent.futures
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils import tracing
+from src.utils.profiling import RunProfiler
+
+
+def test_profiles_worker_threads_and_stages(tmp_path):
+    trace = tracing.RunTrace("test")
+    trace.profiler = RunProfiler.acquire("test")
+    assert trace.profiler is not None
+    # Второй запуск, пока идет первый, не профилируется
+    assert RunProfiler.acquire("other") is None
+
+    def work(n):
+        return sum(i * i for i in range(n))
+
+    with tracing.bind_run(trace):
+        with tracing.span('stage.products'):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix='product-worker') as executor:
+                list(executor.map(tracing.propagate(work), [10000, 10000]))
+
+    trace.profiler.output_dir = tmp_path / "run"
+    output_dir = trace.profiler.finish(tmp_path / "fallback")
+
+    assert output_dir == tmp_path / "run"
+    names = {path.name for path in output_dir.iterdir()}
+    assert "cpu_all.prof" in names and "cpu_summary.txt" in names
+    assert any(name.startswith("cpu_product-worker") for name in names)
+    allocations = (output_dir / "tracemalloc.txt").read_text(encoding="utf-8")
+    assert "== stage.products:" in allocations and "== finish:" in allocations
+    assert not tracemalloc.is_tracing()
+    # После finish можно профилировать следующий запуск
+    following = RunProfiler.acquire("next")
+    assert following is not None
+    following.finish(tmp_path / "next")
+
+
+def test_finish_uses_fallback_dir(tmp_path):
+    profiler = RunProfiler.acquire("test")
+    assert profiler.finish(tmp_path / "fallback") == tmp_path / "fallback"
+    assert (tmp_path / "fallback" / "tracemalloc.txt").exists()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Тест профилей драйвера: облегченный 'api' для JSON-эндпоинтов и полный для каталога
+Запуск: python -m pytest test/test_selenium_profile.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.selenium_manager import API_WINDOW_SIZE, PROFILE_API, SeleniumManager
+
+
+def test_api_profile_skips_heavy_resources():
+    options = SeleniumManager(profile=PROFILE_API)._build_options()
+    assert options.page_load_strategy == 'eager'
+    assert f"--window-size={API_WINDOW_SIZE}" in options.arguments
+    assert "--blink-settings=imagesEnabled=false" in options.arguments
+    assert "--disable-remote-fonts" in options.arguments
+    assert options.experimental_options['prefs']['profile.managed_default_content_settings.images'] == 2
+    assert "--headless" in options.arguments
+
+
+def test_full_profile_is_unchanged():
+    options = SeleniumManager()._build_options()
+    assert options.page_load_strategy == 'normal'
+    assert "--window-size=1920,1080" in options.arguments
+    assert "--blink-settings=imagesEnabled=false" not in options.arguments
+    assert 'prefs' not in options.experimental_options
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Тест хранилища настроек: перенос USER_<id>_* из config.txt в SQLite, ручные правки config.txt
+и сброс кэша при записи из другого соединения
+Запуск: python -m pytest test/test_settings_store.py
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.settings_store import SettingsStore
+
+
+def write_config(path: Path, lines, mtime_shift_ns: int = 0):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    if mtime_shift_ns:
+        # Файловые системы с грубым mtime: правка должна выглядеть новее прошлой
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + mtime_shift_ns))
+
+
+@pytest.fixture
+def paths(tmp_path):
+    config = tmp_path / "config.txt"
+    write_config(config, [
+        "# Общие настройки",
+        "TELEGRAM_BOT_TOKEN=123:abc",
+        "USER_42_CATEGORY_URL=https://www.ozon.ru/category/a/",
+        "USER_42_MAX_PRODUCTS=500",
+        "USER_-100_MAX_PRODUCTS=10",
+    ])
+    return tmp_path / "settings.db", config
+
+
+@pytest.fixture
+def open_store(paths):
+    stores = []
+
+    def factory() -> SettingsStore:
+        store = SettingsStore(db_path=paths[0], config_path=paths[1])
+        stores.append(store)
+        return store
+
+    yield factory
+    for store in stores:
+        store.close()
+
+
+def test_user_keys_are_migrated_from_config(open_store):
+    store = open_store()
+    assert store.get("42") == {
+        "CATEGORY_URL": "https://www.ozon.ru/category/a/",
+        "MAX_PRODUCTS": "500",
+    }
+    assert store.get(-100) == {"MAX_PRODUCTS": "10"}
+    # Общие ключи без префикса USER_<id>_ в базу не попадают
+    keys = [row[0] for row in store._conn.execute("SELECT key FROM config_import")]
+    assert "TELEGRAM_BOT_TOKEN" not in keys
+
+
+def test_saved_values_survive_restart_with_unchanged_config(open_store):
+    store = open_store()
+    assert store.set_many("42", {"MAX_PRODUCTS": 1000, "REPORT_FORMAT": "csv"})
+    store.close()
+
+    restarted = open_store()
+    # Повторный импорт того же config.txt не перетирает значения, сохраненные в базе
+    assert restarted.get("42")["MAX_PRODUCTS"] == "1000"
+    assert restarted.get("42")["REPORT_FORMAT"] == "csv"
+
+
+def test_newer_config_edit_overrides_store(open_store, paths):
+    store = open_store()
+    store.set_many("42", {"MAX_PRODUCTS": 1000})
+    assert store.get("42")["MAX_PRODUCTS"] == "1000"
+
+    write_config(paths[1], [
+        "USER_42_CATEGORY_URL=https://www.ozon.ru/category/a/",
+        "USER_42_MAX_PRODUCTS=750",
+        "USER_7_MAX_PRODUCTS=20",
+    ], mtime_shift_ns=10 ** 9)
+    # Ключ правили в config.txt после импорта — побеждает ручная правка
+    assert store.get("42")["MAX_PRODUCTS"] == "750"
+    assert store.get("7") == {"MAX_PRODUCTS": "20"}
+
+
+def test_write_from_other_connection_invalidates_cache(open_store):
+    first = open_store()
+    second = open_store()
+    assert first.get("42")["MAX_PRODUCTS"] == "500"
+
+    # Собственная запись не сбрасывает кэш и сразу видна
+    assert first.set_many("42", {"MAX_PRODUCTS": 600})
+    assert first.get("42")["MAX_PRODUCTS"] == "600"
+
+    # Запись другого соединения меняет PRAGMA data_version — кэш первого сбрасывается
+    assert second.set_many("42", {"MAX_PRODUCTS": 900})
+    assert first.get("42")["MAX_PRODUCTS"] == "900"
+
+
+def test_get_returns_copy(open_store):
+    store = open_store()
+    settings = store.get("42")
+    settings["MAX_PRODUCTS"] = "1"
+    assert store.get("42")["MAX_PRODUCTS"] == "500"
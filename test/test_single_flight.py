@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Тест объединения одинаковых запросов между параллельными сессиями
+Запуск: python -m pytest test/test_single_flight.py
+"""
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.single_flight import SharedFetchCache, SingleFlight
+
+
+@dataclass
+class FakeResult:
+    key: str
+    success: bool = True
+    image_url: str = ""
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def slow_fetch():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(flight.do, "article-1", slow_fetch) for _ in range(8)]
+        time.sleep(0.2)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert all(value == "value" for value, _ in results)
+    assert sum(1 for _, shared in results if not shared) == 1
+    assert flight.inflight() == 0
+
+
+def test_exception_reaches_all_waiters():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing_fetch():
+        release.wait(5)
+        raise RuntimeError("Access blocked")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flight.do, "seller-1", failing_fetch) for _ in range(4)]
+        time.sleep(0.2)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+    assert flight.inflight() == 0
+
+
+def test_cache_keeps_only_successful_results_and_returns_copies():
+    cache = SharedFetchCache("test", ttl=60, is_cacheable=lambda result: result.success)
+    calls = []
+
+    def fetch(success):
+        def run():
+            calls.append(1)
+            return FakeResult("a", success=success)
+        return run
+
+    failed, fetched = cache.fetch("a", fetch(False))
+    assert fetched and not failed.success
+    assert cache.peek("a") is None
+
+    first, fetched = cache.fetch("a", fetch(True))
+    assert fetched and first.success
+    first.image_url = "changed by one user"
+
+    second, fetched = cache.fetch("a", fetch(True))
+    assert not fetched
+    assert second.image_url == ""
+    assert len(calls) == 2
+    assert cache.stats()['hits'] == 1
+
+
+def test_cache_entries_expire():
+    cache = SharedFetchCache("test", ttl=0.05)
+    cache.fetch("a", lambda: FakeResult("a"))
+    assert cache.peek("a") is not None
+    time.sleep(0.1)
+    assert cache.peek("a") is None
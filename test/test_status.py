@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Тест компактного статуса: версии снимков, ожидание изменений, подписки и события ResourceManager
+Запуск: python -m pytest test/test_status.py
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.status import StatusBoard
+from src.utils.resource_manager import ResourceManager
+
+
+def test_version_changes_only_on_real_updates():
+    board = StatusBoard(is_running=False, active_users=[])
+    first = board.snapshot()
+    assert first['version'] == 0
+
+    assert board.update(is_running=False) is False
+    assert board.changed_since(0) is None
+
+    assert board.update(is_running=True, active_users=['1'])
+    second = board.snapshot()
+    assert second['version'] == 1 and second['is_running'] and second['active_users'] == ['1']
+    # Прежний снимок не изменяется
+    assert first['is_running'] is False
+    assert board.changed_since(0) is second
+
+
+def test_wait_and_subscribe():
+    board = StatusBoard(stage='links')
+    seen = []
+    unsubscribe = board.subscribe(lambda snapshot: seen.append(snapshot['stage']))
+    board.subscribe(lambda snapshot: 1 / 0)
+
+    timer = threading.Timer(0.05, board.update, kwargs={'stage': 'products'})
+    timer.start()
+    snapshot = board.wait(0, timeout=5)
+    timer.join()
+    assert snapshot['stage'] == 'products'
+    assert seen == ['products']
+
+    unsubscribe()
+    board.update(stage='sellers')
+    assert seen == ['products']
+    assert board.wait(board.version, timeout=0.01)['stage'] == 'sellers'
+
+
+def test_ordered_updates_drop_stale_states():
+    board = StatusBoard(total_active_users=0)
+    assert board.update_ordered('resources', 2, total_active_users=2)
+    # Состояние, собранное раньше, но опубликованное позже, отбрасывается
+    assert board.update_ordered('resources', 1, total_active_users=1) is False
+    assert board.snapshot()['total_active_users'] == 2
+    assert board.update_ordered('resources', 3, total_active_users=0)
+    assert board.snapshot()['total_active_users'] == 0
+
+
+def test_progress_notifications_are_throttled():
+    manager = ResourceManager()
+    manager.PROGRESS_NOTIFY_INTERVAL = 60
+    states = []
+    manager.start_parsing_session('7', 'products', 5)
+    manager.add_listener(states.append)
+
+    for processed in range(1, 6):
+        manager.update_progress('7', processed)
+    # Первое значение и последнее значение этапа; промежуточные пропущены
+    assert [state['sessions']['7']['processed'] for state in states] == [1, 5]
+    assert states[0]['seq'] < states[1]['seq']
+    manager.finish_parsing_session('7')
+
+
+def test_resource_manager_pushes_compact_state():
+    manager = ResourceManager()
+    board = StatusBoard(**manager.state())
+    manager.add_listener(lambda state: board.update(**state))
+
+    manager.start_parsing_session('42', 'products', 10)
+    session = board.snapshot()['sessions']['42']
+    assert session['stage'] == 'products' and session['total'] == 10 and session['workers'] > 0
+    assert board.snapshot()['total_active_users'] == 1
+
+    version = board.version
+    manager.update_progress('42', 3)
+    manager.update_progress('42', 3)
+    assert board.version == version + 1
+    assert board.snapshot()['sessions']['42']['processed'] == 3
+
+    manager.finish_parsing_session('42')
+    assert board.snapshot()['sessions'] == {}
+    assert board.snapshot()['total_allocated_workers'] == 0
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Тест режима цели: пулы воркеров товаров и продавцов живут весь запуск и останавливаются,
+как только найдено нужное число продавцов (воркеры — заглушки без браузера)
+Запуск: python -m pytest test/test_target_mode.py
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config.settings import Settings
+from src.core.app_manager import AppManager, _StopSignal
+from src.parsers import product_parser, seller_parser
+from src.parsers.product_parser import ProductInfo
+from src.parsers.seller_parser import SellerInfo
+from src.telegram.progress import ProgressReporter
+
+
+class FakeProductWorker:
+    """Товар с артикулом N продается продавцом s<N % sellers>"""
+
+    sellers = 50
+
+    def __init__(self, worker_id, item_log=None):
+        self.worker_id = worker_id
+
+    def initialize(self, stop_event=None):
+        pass
+
+    def parse_products(self, articles, product_links, on_result=None, stop_event=None):
+        results = []
+        for article in articles:
+            if stop_event is not None and stop_event.is_set():
+                break
+            time.sleep(0.002)
+            result = ProductInfo(article=article, name=f"Товар {article}", company_name="ООО",
+                                 seller_id=f"s{int(article) % self.sellers}", success=True)
+            results.append(result)
+            on_result(result)
+        return results
+
+    def close(self):
+        pass
+
+
+class FakeSellerWorker:
+    created = []
+
+    def __init__(self, worker_id, item_log=None):
+        self.worker_id = worker_id
+        self.driver = object()
+        self.parsed = 0
+        self.closed = False
+        FakeSellerWorker.created.append(self)
+
+    def initialize(self, stop_event=None):
+        pass
+
+    def parse_sellers(self, seller_ids, on_result=None, stop_event=None):
+        results = []
+        for seller_id in seller_ids:
+            time.sleep(0.002)
+            result = SellerInfo(seller_id=seller_id, orders_count="1 K", success=True)
+            self.parsed += 1
+            results.append(result)
+            on_result(result)
+        return results
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    FakeSellerWorker.created = []
+    monkeypatch.setattr(product_parser, "ProductWorker", FakeProductWorker)
+    monkeypatch.setattr(seller_parser, "SellerWorker", FakeSellerWorker)
+    monkeypatch.setattr(seller_parser.SellerStream, "POLL_INTERVAL", 0.05)
+    # Пауза cleanup() рассчитана на закрытие настоящих браузеров
+    monkeypatch.setattr(product_parser.OzonProductParser, "cleanup", lambda self: None)
+    monkeypatch.setattr(seller_parser.OzonSellerParser, "cleanup", lambda self: None)
+    return AppManager(Settings())
+
+
+def run_target_mode(manager, links_count, target):
+    links = {f"https://www.ozon.ru/product/tovar-{90000 + i}/": "" for i in range(links_count)}
+    target_reached = threading.Event()
+    stop_signal = _StopSignal(manager.stop_event, target_reached)
+    qualified = []
+    lock = threading.Lock()
+    products_seen = []
+
+    def on_seller(seller):
+        with lock:
+            if len(qualified) >= target:
+                return
+            qualified.append(seller.seller_id)
+            if len(qualified) >= target:
+                target_reached.set()
+
+    products, sellers = manager._parse_until_target(
+        links, None, {}, products_seen.append, on_seller, stop_signal, ProgressReporter(None, None, "test"),
+    )
+    return products, sellers, qualified, products_seen
+
+
+def test_target_stops_both_pools_early(manager):
+    products, sellers, qualified, products_seen = run_target_mode(manager, links_count=1000, target=5)
+
+    assert len(qualified) == 5
+    assert len(set(qualified)) == 5
+    # Товары дальше не парсятся: цель достигнута задолго до конца списка
+    assert len(products_seen) < 1000
+    assert len(products) == len(products_seen)
+    # Пул продавцов создан один раз на запуск и закрыт: без пользователя 5 воркеров — 3 товарам, 2 продавцам
+    assert len(FakeSellerWorker.created) == 2
+    assert all(worker.closed for worker in FakeSellerWorker.created)
+    assert len(sellers) == sum(worker.parsed for worker in FakeSellerWorker.created)
+
+
+def test_pools_drain_when_target_not_reached(manager):
+    FakeProductWorker.sellers = 10
+    try:
+        products, sellers, qualified, products_seen = run_target_mode(manager, links_count=40, target=100)
+    finally:
+        FakeProductWorker.sellers = 50
+
+    assert len(products) == 40
+    # Каждый продавец парсится один раз, хотя встречается у нескольких товаров
+    assert sorted(seller.seller_id for seller in sellers) == sorted(f"s{i}" for i in range(10))
+    assert len(qualified) == 10
+    workers = FakeSellerWorker.created
+    assert workers and all(worker.closed for worker in workers)
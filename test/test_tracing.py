@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Тест спанов: привязка запуска к потокам и сводка p50/p95/p99 по фазам
+Запуск: python -m pytest test/test_tracing.py
+"""
+
+import concurrent.futures
+import json
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils import tracing
+from src.utils.warehouse import Warehouse
+
+
+def test_span_without_run_is_noop():
+    assert tracing.current_run() is None
+    with tracing.span('page.get'):
+        pass
+    tracing.sleep(0, 'retry.sleep')
+
+
+def test_worker_threads_inherit_run():
+    trace = tracing.RunTrace("test")
+
+    def work(n):
+        for _ in range(n):
+            with tracing.span('product.fetch'):
+                pass
+
+    with tracing.bind_run(trace):
+        with tracing.span('stage.products'):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+                list(executor.map(tracing.propagate(work), [10, 10, 10]))
+    assert tracing.current_run() is None
+
+    summary = trace.summary()
+    assert summary['product.fetch']['count'] == 30
+    assert summary['stage.products']['count'] == 1
+    main_thread = threading.get_ident()
+    assert all(s.thread_id != main_thread for s in trace.spans() if s.name == 'product.fetch')
+    assert tracing.format_summary(summary)[0].startswith('product.fetch:')
+    assert tracing.format_stages(summary).startswith('products ')
+
+
+def test_chrome_trace_has_track_per_thread(tmp_path):
+    trace = tracing.RunTrace("test")
+
+    def work(article):
+        with tracing.span('product.fetch', article=article):
+            tracing.sleep(0, 'retry.sleep')
+
+    with tracing.bind_run(trace):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix='product-worker') as executor:
+            list(executor.map(tracing.propagate(work), ["1", "2", "3", "4"]))
+
+    path = trace.write_chrome_trace(tmp_path / "traces" / "run.json")
+    data = json.loads(path.read_text(encoding="utf-8"))
+    spans = [event for event in data['traceEvents'] if event['ph'] == 'X']
+    tracks = {event['tid']: event['args']['name'] for event in data['traceEvents'] if event['name'] == 'thread_name'}
+    assert len(spans) == 8
+    assert all(event['tid'] in tracks for event in spans)
+    assert all(name.startswith('product-worker') for name in tracks.values())
+    assert {event['args']['article'] for event in spans if event['name'] == 'product.fetch'} == {"1", "2", "3", "4"}
+
+
+def test_percentiles_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert tracing._percentile(values, 50) == 50.0
+    assert tracing._percentile(values, 95) == 95.0
+    assert tracing._percentile(values, 99) == 99.0
+    assert tracing._percentile([3.0], 99) == 3.0
+
+
+def test_perf_saved_with_run(tmp_path):
+    warehouse = Warehouse(tmp_path / "warehouse.db")
+    run_id = warehouse.record_run("https://www.ozon.ru/category/a/", [], [])
+    assert warehouse.run_perf(run_id) is None
+    perf = {'page.get': {'count': 2, 'total': 3.0, 'p50': 1.0, 'p95': 2.0, 'p99': 2.0, 'max': 2.0}}
+    warehouse.save_run_perf(run_id, perf)
+    assert warehouse.run_perf(run_id) == perf
+    warehouse.close()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Тест исторического склада товаров и продавцов
+Запуск: python -m pytest test/test_warehouse.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.parsers.product_parser import ProductInfo
+from src.parsers.seller_parser import SellerInfo
+from src.utils.warehouse import Warehouse
+
+CATEGORY_A = "https://www.ozon.ru/category/a/"
+CATEGORY_B = "https://www.ozon.ru/category/b/"
+
+
+def make_seller(seller_id: str, orders: str, inn: str = "") -> SellerInfo:
+    return SellerInfo(seller_id=seller_id, company_name=f"ООО {seller_id}", inn=inn, orders_count=orders, success=True)
+
+
+def make_product(article: str, seller_id: str, price: int = 100) -> ProductInfo:
+    return ProductInfo(article=article, name=f"Товар {article}", seller_id=seller_id, price=price, success=True)
+
+
+def test_record_and_query(tmp_path):
+    warehouse = Warehouse(tmp_path / "warehouse.db")
+    run_a = warehouse.record_run(
+        CATEGORY_A,
+        [make_product("1", "s1"), make_product("2", "s2"), ProductInfo(article="3", error="fail")],
+        [make_seller("s1", "40,2 K", inn="7701"), make_seller("s2", "900"), SellerInfo(seller_id="s3")],
+        user_id="42",
+    )
+    warehouse.record_run(CATEGORY_B, [make_product("4", "s4")], [make_seller("s4", "1,6 M")])
+    assert run_a
+
+    big_in_a = warehouse.query_sellers(CATEGORY_A, min_orders=1000, seen_within_days=7)
+    assert [row["seller_id"] for row in big_in_a] == ["s1"]
+    assert big_in_a[0]["orders_count_value"] == 40_200
+
+    everywhere = warehouse.query_sellers(min_orders=500)
+    assert [row["seller_id"] for row in everywhere] == ["s4", "s1", "s2"]
+
+    assert warehouse.get_seller("s3") is None
+    assert warehouse.find_sellers_by_inn("7701")[0]["seller_id"] == "s1"
+    assert warehouse.recent_runs(CATEGORY_A)[0]["total_products"] == 2
+    warehouse.close()
+
+
+def test_upsert_keeps_first_seen_and_history(tmp_path):
+    warehouse = Warehouse(tmp_path / "warehouse.db")
+    warehouse.record_run(CATEGORY_A, [make_product("1", "s1", price=100)], [make_seller("s1", "100")])
+    first = warehouse.get_seller("s1")
+    time.sleep(0.01)
+    warehouse.record_run(CATEGORY_A, [make_product("1", "s1", price=90)], [make_seller("s1", "150")])
+    second = warehouse.get_seller("s1")
+
+    assert second["first_seen"] == first["first_seen"]
+    assert second["last_seen"] > first["last_seen"]
+    assert second["orders_count_value"] == 150
+    assert [row["orders_count_value"] for row in warehouse.seller_history("s1")] == [150, 100]
+    warehouse.close()
+
+
+def test_queries_use_indexes(tmp_path):
+    warehouse = Warehouse(tmp_path / "warehouse.db")
+    plan = " ".join(
+        row["detail"] for row in warehouse._fetch(
+            "EXPLAIN QUERY PLAN SELECT * FROM seller_sightings WHERE category_url = ? AND seen_at >= ?", ("x", 0)
+        )
+    )
+    assert "idx_seller_sightings_category" in plan
+    plan = " ".join(
+        row["detail"] for row in warehouse._fetch("EXPLAIN QUERY PLAN SELECT * FROM sellers WHERE inn = ?", ("1",))
+    )
+    assert "idx_sellers_inn" in plan
+    warehouse.close()
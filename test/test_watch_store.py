@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Тест наблюдений за категориями: расписание и снимок артикулов
+Запуск: python -m pytest test/test_watch_store.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.parsers.product_parser import extract_article
+from src.utils.watch_store import WatchStore
+
+CATEGORY = "https://www.ozon.ru/category/smartfony-15502/"
+
+
+def test_diff_returns_only_new_articles(tmp_path):
+    store = WatchStore(tmp_path / "settings.db")
+    watch_id = store.add_watch("1", CATEGORY, 60, 100)
+
+    assert store.diff_articles(watch_id, ["1", "2", "3"]) == {"1", "2", "3"}
+    store.mark_seen(watch_id, ["1", "2", "3"])
+    assert store.diff_articles(watch_id, ["2", "3", "4"]) == {"4"}
+    store.mark_seen(watch_id, ["4"])
+    # Товар, пропавший из листинга и вернувшийся, новым не считается
+    assert store.diff_articles(watch_id, ["1", "4"]) == set()
+    store.close()
+
+
+def test_failed_tick_leaves_articles_new(tmp_path):
+    store = WatchStore(tmp_path / "settings.db")
+    watch_id = store.add_watch("1", CATEGORY, 60, 100)
+    store.mark_seen(watch_id, ["1"])
+
+    # Запуск упал до завершения: снимок не пополнялся
+    assert store.diff_articles(watch_id, ["1", "2", "3"]) == {"2", "3"}
+    assert store.diff_articles(watch_id, ["1", "2", "3"]) == {"2", "3"}
+
+    # Следующий запуск успел обработать только один из новых товаров
+    store.mark_seen(watch_id, ["2"])
+    assert store.diff_articles(watch_id, ["1", "2", "3"]) == {"3"}
+    store.close()
+
+
+def test_schedule_and_remove(tmp_path):
+    store = WatchStore(tmp_path / "settings.db")
+    first = store.add_watch("1", CATEGORY, 60, 100)
+    second = store.add_watch("2", CATEGORY, 120, 50)
+    assert store.add_watch("1", CATEGORY, 30, 100) == first
+    assert store.get_watch(first).interval_minutes == 30
+
+    now = time.time()
+    assert {w.watch_id for w in store.due_watches(now)} == {first, second}
+    store.schedule(first, now + 3600)
+    assert [w.watch_id for w in store.due_watches(now)] == [second]
+    assert store.get_watch(first).last_run_at is not None
+
+    store.mark_seen(second, ["1"])
+    assert not store.remove_watch("1", second)
+    assert store.remove_watch("2", second)
+    assert [w.watch_id for w in store.list_watches()] == [first]
+    store.close()
+
+
+def test_extract_article():
+    assert extract_article("https://www.ozon.ru/product/smartfon-apple-iphone-15-1234567/?asb=1") == "1234567"
+    assert extract_article("https://www.ozon.ru/category/x/") == ""
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Тест webhook-режима бота: синтетические обновления отправляются на локальный HTTP-сервер
+Запуск: python -m pytest test/test_webhook.py
+"""
+
+import json
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.telegram import delivery
+from src.telegram.bot_manager import TelegramBotManager
+from src.utils.config_loader import WebhookConfig, load_webhook_config
+
+FAKE_TOKEN = "123456:TEST-webhook-token"
+SECRET = "test-secret"
+
+
+def make_message_update(update_id: int, user_id: int, text: str) -> dict:
+    """Минимальное обновление Telegram с текстовым сообщением"""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+def post_update(port: int, path: str, update: dict, secret: str = SECRET) -> int:
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}",
+        data=json.dumps(update).encode("utf-8"),
+        headers={
+            "Content-Type": "application/json",
+            "X-Telegram-Bot-Api-Secret-Token": secret,
+        },
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+@pytest.fixture
+def webhook_bot(monkeypatch):
+    # Бот регистрирует себя как бот доставки по умолчанию — после теста возвращаем прежний
+    monkeypatch.setattr(delivery, "_default_token", delivery._default_token)
+    monkeypatch.setattr(delivery, "_default_recipients", delivery._default_recipients)
+
+    # Порт 0 — свободный порт выбирает ОС; без URL webhook в Telegram не регистрируется
+    config = WebhookConfig(host="127.0.0.1", port=0, path="/telegram/webhook", secret=SECRET)
+    manager = TelegramBotManager(FAKE_TOKEN, [], None, webhook=config)
+
+    received = []
+
+    async def record_update(handler, event, data):
+        received.append(event.update_id)
+        # Дальше обработчики не вызываем: пользователь не авторизован, а сети нет
+        return None
+
+    manager.dp.update.outer_middleware(record_update)
+    assert manager.start(timeout=10), "Webhook сервер не запустился"
+    yield manager, received
+
+    manager.stop()
+    delivery.shutdown_delivery_services(timeout=5)
+
+
+def wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_webhook_receives_synthetic_updates(webhook_bot):
+    manager, received = webhook_bot
+    try:
+        assert manager.is_running
+        assert manager.webhook_port
+
+        for update_id in range(1, 6):
+            status = post_update(manager.webhook_port, manager.webhook.path, make_message_update(update_id, 42, "/start"))
+            assert status == 200
+
+        assert wait_for(lambda: len(received) == 5)
+        assert sorted(received) == [1, 2, 3, 4, 5]
+    finally:
+        manager.stop()
+
+    assert not manager.bot_thread.is_alive()
+
+
+def test_webhook_rejects_wrong_secret(webhook_bot):
+    manager, received = webhook_bot
+    status = post_update(manager.webhook_port, manager.webhook.path, make_message_update(1, 42, "/start"), secret="wrong")
+    assert status == 401
+    time.sleep(0.2)
+    assert received == []
+
+
+def test_webhook_config_defaults_to_polling():
+    assert load_webhook_config({}) is None
+    config = load_webhook_config({"TELEGRAM_MODE": "webhook", "TELEGRAM_WEBHOOK_PORT": "9000", "TELEGRAM_WEBHOOK_PATH": "hook"})
+    assert config.port == 9000
+    assert config.path == "/hook"
+
+
+if __name__ == "__main__":
+    test_webhook_receives_synthetic_updates()
+    test_webhook_rejects_wrong_secret()
+    test_webhook_config_defaults_to_polling()
+    print("✅ Webhook тесты пройдены")